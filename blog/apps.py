@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BlogConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "blog"
+
+    def ready(self):
+        # シグナルハンドラーを登録（SQLite の PRAGMA 設定を含む）
+        from . import signals, sqlite
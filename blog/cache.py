@@ -0,0 +1,73 @@
+"""公開記事の詳細キャッシュ
+
+API レスポンス用に変換した記事の辞書を Django キャッシュに保持する。
+記事の公開・非公開・移動・削除時にシグナルから無効化される。
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import BlogPage
+from .rendering import render_body
+
+CACHE_KEY_PREFIX = "blog:post:"
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def _cache_key(page_id: int) -> str:
+    return f"{CACHE_KEY_PREFIX}{page_id}"
+
+
+def serialize_post(post: BlogPage) -> dict:
+    """BlogPage を API レスポンス用の辞書に変換（事前レンダリング済みの本文を使用）"""
+    # バックフィル前のページのみ、その場でレンダリング
+    body = post.body_html if post.body_html or not post.body else render_body(post.body)
+
+    return {
+        "id": post.id,
+        "title": post.title,
+        "intro": post.intro,
+        "date": post.date.isoformat() if post.date else None,
+        "slug": post.slug,
+        "first_published_at": (
+            post.first_published_at.isoformat() if post.first_published_at else None
+        ),
+        "body": body,
+        "excerpt": post.excerpt,
+        "word_count": post.word_count,
+        "reading_time": post.reading_time,
+        "is_paid": post.is_paid,
+        "prev_post": post.prev_post,
+        "next_post": post.next_post,
+    }
+
+
+def get_cached_posts(page_ids) -> list[dict]:
+    """記事 ID の順に変換済みの記事を取得（キャッシュにない分だけ1クエリで読み込む）"""
+    page_ids = list(page_ids)
+    cached = cache.get_many([_cache_key(page_id) for page_id in page_ids])
+    posts = {
+        page_id: cached[_cache_key(page_id)]
+        for page_id in page_ids
+        if _cache_key(page_id) in cached
+    }
+
+    missing = [page_id for page_id in page_ids if page_id not in posts]
+    if missing:
+        loaded = {
+            page.id: serialize_post(page)
+            for page in BlogPage.objects.live().public().filter(id__in=missing)
+        }
+        cache.set_many(
+            {_cache_key(page_id): post for page_id, post in loaded.items()},
+            getattr(settings, "BLOG_POST_CACHE_TIMEOUT", DEFAULT_TIMEOUT),
+        )
+        posts.update(loaded)
+
+    # 読み込み中に非公開になった記事は除外
+    return [posts[page_id] for page_id in page_ids if page_id in posts]
+
+
+def invalidate_posts(page_ids):
+    """記事のキャッシュを無効化"""
+    cache.delete_many([_cache_key(page_id) for page_id in page_ids])
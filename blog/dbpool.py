@@ -0,0 +1,153 @@
+"""
+データベース接続プール（psycopg3 の psycopg_pool）の管理
+
+PostgreSQL バックエンドの ``OPTIONS["pool"]`` で有効にしたプールについて、
+ワーカー起動時の事前接続（プレウォーム）、fork 前のクローズ、利用状況の取得を行う。
+プールを使わないデータベース（SQLite など）は対象外で、何もしない。
+
+sync_to_async は既定（thread_sensitive=True）で全ての ORM 呼び出しを 1 本のスレッドで
+順に実行するため、プールを使う場合の読み取りは ``pooled_sync_to_async`` で
+最大接続数と同じ数のスレッドに分けて並行に実行する。
+"""
+
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+# 読み取り用のスレッドプール（start_read_executor() で作成するまでは None）
+_read_executor: ThreadPoolExecutor | None = None
+
+
+def pool_max_size() -> int:
+    """プールの最大接続数（DATABASE_CONNECTION_POOL_SIZE + MAX_OVERFLOW）"""
+    return getattr(settings, "DATABASE_CONNECTION_POOL_SIZE", 10) + getattr(
+        settings, "DATABASE_CONNECTION_MAX_OVERFLOW", 5
+    )
+
+
+def get_pools() -> dict:
+    """接続プールを使っているデータベースのエイリアスとプール"""
+    pools = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            pools[alias] = pool
+    return pools
+
+
+def prewarm_pools(timeout: float | None = None) -> dict[str, float]:
+    """プールを開き、最小接続数まで接続してから戻る（ワーカー起動時に呼ぶ）
+
+    戻り値はエイリアスごとの所要時間（秒）。接続できない場合も起動は止めず、
+    以降の要求時にプールが再接続を試みる。
+    """
+    if timeout is None:
+        timeout = getattr(settings, "DATABASE_CONNECTION_POOL_TIMEOUT", 10)
+    elapsed = {}
+    for alias, pool in get_pools().items():
+        start = time.monotonic()
+        try:
+            pool.open(wait=True, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Connection pool prewarm failed for {alias}: {e!s}")
+            continue
+        elapsed[alias] = time.monotonic() - start
+        logger.info(
+            f"Connection pool {alias} ready with {pool.min_size} connections "
+            f"in {elapsed[alias] * 1000:.0f} ms"
+        )
+    return elapsed
+
+
+def close_pools():
+    """全てのプールを閉じる（fork 前のマスターなど、接続を引き継がせたくない場合）"""
+    for alias in list(get_pools()):
+        connections[alias].close_pool()
+
+
+def start_read_executor() -> int:
+    """読み取り用のスレッドプールをプールの最大接続数と同じスレッド数で作成する
+
+    スレッド数が最大接続数を超えると、余ったスレッドは接続の空きを待つだけになるため
+    同じ数にそろえる。
+    """
+    global _read_executor
+    shutdown_read_executor()
+    workers = pool_max_size()
+    _read_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+    return workers
+
+
+def shutdown_read_executor():
+    """読み取り用のスレッドプールを終了する（実行中の処理は待つ）"""
+    global _read_executor
+    executor, _read_executor = _read_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _release_connections(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # スレッドが接続を持ち続けないよう、リクエストの終了時と同じく返却する
+            close_old_connections()
+
+    return wrapper
+
+
+def pooled_sync_to_async(func):
+    """sync_to_async の読み取り用の代わり
+
+    読み取り用のスレッドプールがあればそこで並行に実行し、なければ
+    （SQLite・テストなど）通常の sync_to_async と同じく 1 本のスレッドで実行する。
+    """
+    thread_sensitive = sync_to_async(func)
+    pooled = _release_connections(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        executor = _read_executor
+        if executor is None:
+            return await thread_sensitive(*args, **kwargs)
+        return await sync_to_async(pooled, thread_sensitive=False, executor=executor)(
+            *args, **kwargs
+        )
+
+    return wrapper
+
+
+def pool_stats() -> dict[str, dict]:
+    """プールごとの利用状況（使用中・待機中の接続数、待ち時間、タイムアウト数）"""
+    stats = {}
+    for alias, pool in get_pools().items():
+        raw = pool.get_stats()
+        requests = raw.get("requests_num", 0)
+        wait_ms = raw.get("requests_wait_ms", 0)
+        size = raw.get("pool_size", 0)
+        idle = raw.get("pool_available", 0)
+        stats[alias] = {
+            "min_size": raw.get("pool_min", pool.min_size),
+            "max_size": raw.get("pool_max", pool.max_size),
+            "size": size,
+            # 貸し出し中（接続処理中のものを含む）
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": raw.get("requests_waiting", 0),
+            "requests": requests,
+            "wait_ms_total": wait_ms,
+            "wait_ms_avg": wait_ms / requests if requests else 0.0,
+            # 待ち時間の上限切れ・待機列の上限超過
+            "timeouts": raw.get("requests_errors", 0),
+            "connections_lost": raw.get("connections_lost", 0),
+        }
+    return stats
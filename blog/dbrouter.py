@@ -0,0 +1,140 @@
+"""
+読み取り専用の API・匿名ユーザーのページ表示をリードレプリカへ振り分けるルーター
+
+レプリカを使うのは ``read_from_replica()`` の範囲内（記事 API のリクエストと、
+セッションを持たない GET/HEAD のページ表示）の読み取りだけで、書き込みや
+管理画面、それ以外の処理は常にプライマリを使う。
+
+編集者が記事を公開・更新した直後は、レプリカへの反映が遅れて古い内容を返したり、
+CDN のパージ後の再取得で古い内容がキャッシュされたりしないよう、
+DATABASE_REPLICA_STICKY_SECONDS の間は全ての読み取りをプライマリへ送る。
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_CACHE_KEY = "blog:db:primary-until"
+
+# このリクエストで読み取りに使うレプリカ（None はプライマリ）
+_read_alias: ContextVar[str | None] = ContextVar("blog_read_alias", default=None)
+# このプロセスで最後に公開を検知したときの期限（キャッシュの参照を省くため）
+_primary_until = 0.0
+
+
+def get_replicas() -> list[str]:
+    """設定済みのレプリカのエイリアス"""
+    return [
+        alias
+        for alias in getattr(settings, "DATABASE_REPLICAS", [])
+        if alias in connections.settings
+    ]
+
+
+def stick_to_primary(seconds: float | None = None):
+    """しばらくの間、全ての読み取りをプライマリへ送る（全ワーカーで共有）"""
+    global _primary_until
+    if seconds is None:
+        seconds = getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 5)
+    if not seconds or not get_replicas():
+        return
+    _primary_until = time.time() + seconds
+    try:
+        cache.set(STICKY_CACHE_KEY, _primary_until, timeout=seconds)
+    except Exception as e:
+        logger.warning(f"Failed to share sticky-primary window: {e!s}")
+
+
+def is_primary_sticky() -> bool:
+    """公開直後でプライマリから読むべき期間か"""
+    now = time.time()
+    if _primary_until > now:
+        return True
+    try:
+        return (cache.get(STICKY_CACHE_KEY) or 0) > now
+    except Exception as e:
+        logger.warning(f"Failed to read sticky-primary window: {e!s}")
+        # 判断できない場合は古いデータを返さないようプライマリを使う
+        return True
+
+
+def choose_replica() -> str | None:
+    """読み取りに使うレプリカを選ぶ（レプリカなし・公開直後は None）"""
+    replicas = get_replicas()
+    if not replicas or is_primary_sticky():
+        return None
+    return random.choice(replicas)
+
+
+def route_reads_to_replica() -> str | None:
+    """現在のコンテキスト（リクエスト）の読み取りをレプリカへ送る"""
+    alias = choose_replica()
+    _read_alias.set(alias)
+    return alias
+
+
+@contextmanager
+def read_from_replica():
+    """範囲内の読み取りをレプリカへ送る。1 つの範囲では同じレプリカを使う"""
+    token = _read_alias.set(choose_replica())
+    try:
+        yield _read_alias.get()
+    finally:
+        _read_alias.reset(token)
+
+
+def current_read_alias() -> str:
+    """現在のコンテキストで読み取りに使うデータベース"""
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS に追加して使うデータベースルーター"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカはプライマリの複製なので、どちらから読んだオブジェクトも関連付けられる
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # レプリカのスキーマはレプリケーションで反映される
+        if db in getattr(settings, "DATABASE_REPLICAS", []):
+            return False
+        return None
+
+
+class ReplicaReadMiddleware:
+    """セッションを持たない GET/HEAD のページ表示をレプリカから読む
+
+    ログイン状態の確認はセッションの読み取りが必要になるため、セッション Cookie の
+    有無で判断する（編集者は常にプライマリを使う）。
+    """
+
+    SAFE_METHODS = ("GET", "HEAD")
+    PRIMARY_PATHS = ("/admin/", "/django-admin/")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            request.method not in self.SAFE_METHODS
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+            or request.path.startswith(self.PRIMARY_PATHS)
+        ):
+            return self.get_response(request)
+        with read_from_replica():
+            return self.get_response(request)
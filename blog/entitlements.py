@@ -0,0 +1,107 @@
+"""
+有料記事の閲覧権限（購入記録と購入者ごとのキャッシュ）
+
+購入者は Cookie の匿名 ID（Checkout セッションの作成時に発行される）で識別する。
+「この購入者は記事 X を読めるか」は、購入者ごとの購入済み記事 ID の集合を
+Django キャッシュに保持して判定するため、閲覧時には DB へのクエリが発生しない。
+キャッシュにない場合のみ (buyer_id, article_id) インデックスで1クエリ読み込み、
+新しい購入を記録したときはコミット後にその購入者の集合を破棄する。
+
+購入記録はリードレプリカへの振り分け（blog/dbrouter.py）の範囲内でも常にプライマリから
+読む。購入直後に遅れているレプリカから読むと、購入前の集合がキャッシュされてしまう。
+"""
+
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, router, transaction
+
+from .models import Purchase
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "blog:entitlements:"
+DEFAULT_TIMEOUT = 60 * 60 * 24
+
+# Checkout で発行する購入者 ID の Cookie（設定 STRIPE_CHECKOUT["BUYER_COOKIE"]）
+BUYER_COOKIE = "blog_buyer"
+BUYER_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# 購入者ごとに変わるレスポンスを CDN・共有レスポンスキャッシュに載せない
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _cache_key(buyer_id: str) -> str:
+    return f"{CACHE_KEY_PREFIX}{buyer_id}"
+
+
+def get_buyer_cookie_name() -> str:
+    return getattr(settings, "STRIPE_CHECKOUT", {}).get("BUYER_COOKIE", BUYER_COOKIE)
+
+
+def get_buyer_id(cookies) -> str | None:
+    """Cookie から購入者 ID を取得（形式が正しくなければ None）"""
+    buyer_id = cookies.get(get_buyer_cookie_name(), "")
+    return buyer_id if BUYER_ID_PATTERN.match(buyer_id) else None
+
+
+def get_purchased_articles(buyer_id: str) -> frozenset[int]:
+    """購入者の購入済み記事 ID の集合（キャッシュにない場合のみ1クエリ）"""
+    key = _cache_key(buyer_id)
+    article_ids = cache.get(key)
+    if article_ids is None:
+        article_ids = frozenset(
+            Purchase.objects.using(router.db_for_write(Purchase))
+            .filter(buyer_id=buyer_id)
+            .values_list("article_id", flat=True)
+        )
+        cache.set(
+            key,
+            article_ids,
+            getattr(settings, "BLOG_ENTITLEMENT_CACHE_TIMEOUT", DEFAULT_TIMEOUT),
+        )
+    return article_ids
+
+
+def can_read(buyer_id: str | None, article_id: int, is_paid: bool) -> bool:
+    """購入者が記事の本文を読めるか（無料記事は誰でも読める）"""
+    if not is_paid:
+        return True
+    if not buyer_id:
+        return False
+    return article_id in get_purchased_articles(buyer_id)
+
+
+def invalidate_entitlements(buyer_id: str):
+    cache.delete(_cache_key(buyer_id))
+
+
+def record_purchase(
+    buyer_id: str,
+    article_id: int,
+    session_id: str,
+    amount: int = 0,
+    currency: str = "jpy",
+) -> bool:
+    """購入を記録し、新しい購入か（重複でないか）を返す"""
+    try:
+        with transaction.atomic():
+            _, created = Purchase.objects.get_or_create(
+                session_id=session_id,
+                defaults={
+                    "buyer_id": buyer_id,
+                    "article_id": article_id,
+                    "amount": amount,
+                    "currency": currency,
+                },
+            )
+    except IntegrityError:
+        # 同じセッションのイベントが同時に処理された
+        return False
+    if created:
+        # コミット前に破棄すると、購入前の集合が再びキャッシュされる可能性がある
+        transaction.on_commit(lambda: invalidate_entitlements(buyer_id))
+        logger.info(f"Purchase recorded: article {article_id} by buyer {buyer_id}")
+    return created
@@ -0,0 +1,141 @@
+"""ファセット（年月アーカイブ・タグ）のカウンターを差分で維持する"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import (
+    BlogPage,
+    BlogPageTag,
+    PostArchiveMonth,
+    PostFacetState,
+    TagFacetCount,
+)
+
+
+def _adjust_month(year: int, month: int, delta: int):
+    """ロールアップの件数を増減（行ロックは対象の1行のみ）"""
+    PostArchiveMonth.objects.get_or_create(year=year, month=month)
+    PostArchiveMonth.objects.filter(year=year, month=month).update(
+        count=F("count") + delta
+    )
+
+
+def _adjust_tags(tag_ids, delta: int):
+    """タグごとの件数を増減"""
+    if not tag_ids:
+        return
+    existing = set(
+        TagFacetCount.objects.filter(tag_id__in=tag_ids).values_list(
+            "tag_id", flat=True
+        )
+    )
+    TagFacetCount.objects.bulk_create(
+        [TagFacetCount(tag_id=tag_id) for tag_id in tag_ids if tag_id not in existing],
+        ignore_conflicts=True,
+    )
+    TagFacetCount.objects.filter(tag_id__in=tag_ids).update(count=F("count") + delta)
+
+
+def get_page_tag_ids(page_id: int) -> list[int]:
+    """中間テーブルから記事の現在のタグ ID を取得"""
+    return sorted(
+        BlogPageTag.objects.filter(content_object_id=page_id).values_list(
+            "tag_id", flat=True
+        )
+    )
+
+
+def counted_pages():
+    """カウンターの集計対象（差分更新と再構築で同じ条件を使う）"""
+    return BlogPage.objects.live().public().filter(date__isnull=False)
+
+
+def sync_post_facets(page: BlogPage):
+    """公開された記事をカウンターに反映（前回集計値との差分のみ更新）"""
+    # 閲覧制限のあるページは再構築でも数えないため、ここでも除外する
+    if not page.live or not counted_pages().filter(id=page.id).exists():
+        return remove_post_facets(page.id)
+
+    with transaction.atomic():
+        state = (
+            PostFacetState.objects.select_for_update().filter(page_id=page.id).first()
+        )
+        new_month = (page.date.year, page.date.month)
+        new_tags = set(get_page_tag_ids(page.id))
+
+        if state is None:
+            _adjust_month(*new_month, +1)
+            _adjust_tags(new_tags, +1)
+        else:
+            if (state.year, state.month) != new_month:
+                _adjust_month(state.year, state.month, -1)
+                _adjust_month(*new_month, +1)
+            old_tags = set(state.tag_ids)
+            _adjust_tags(old_tags - new_tags, -1)
+            _adjust_tags(new_tags - old_tags, +1)
+
+        PostFacetState.objects.update_or_create(
+            page_id=page.id,
+            defaults={
+                "year": new_month[0],
+                "month": new_month[1],
+                "tag_ids": sorted(new_tags),
+            },
+        )
+
+
+def remove_post_facets(page_id: int):
+    """非公開・削除された記事をカウンターから除外"""
+    with transaction.atomic():
+        state = (
+            PostFacetState.objects.select_for_update().filter(page_id=page_id).first()
+        )
+        if state is None:
+            return
+        _adjust_month(state.year, state.month, -1)
+        _adjust_tags(state.tag_ids, -1)
+        state.delete()
+
+
+def rebuild_post_facets() -> int:
+    """公開中の全記事からカウンターを再構築し、集計した記事数を返す"""
+    pages = counted_pages().values_list("id", "date")
+    page_tags = {}
+    for page_id, tag_id in BlogPageTag.objects.filter(
+        content_object__in=counted_pages()
+    ).values_list("content_object_id", "tag_id"):
+        page_tags.setdefault(page_id, []).append(tag_id)
+
+    states = [
+        PostFacetState(
+            page_id=page_id,
+            year=post_date.year,
+            month=post_date.month,
+            tag_ids=sorted(page_tags.get(page_id, [])),
+        )
+        for page_id, post_date in pages
+    ]
+    month_counts = Counter((state.year, state.month) for state in states)
+    tag_counts = Counter(tag_id for state in states for tag_id in state.tag_ids)
+
+    with transaction.atomic():
+        PostFacetState.objects.all().delete()
+        PostArchiveMonth.objects.all().delete()
+        TagFacetCount.objects.all().delete()
+        PostFacetState.objects.bulk_create(states, batch_size=1000)
+        PostArchiveMonth.objects.bulk_create(
+            [
+                PostArchiveMonth(year=year, month=month, count=count)
+                for (year, month), count in month_counts.items()
+            ]
+        )
+        TagFacetCount.objects.bulk_create(
+            [
+                TagFacetCount(tag_id=tag_id, count=count)
+                for tag_id, count in tag_counts.items()
+            ],
+            batch_size=1000,
+        )
+    return len(states)
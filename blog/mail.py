@@ -0,0 +1,212 @@
+"""
+メールの送信キュー
+
+購入完了メールなどはリクエスト・Webhook の処理中に SMTP で送らず、OutgoingEmail に
+保存してすぐに戻る（SMTP の接続・TLS・認証だけで数百ミリ秒〜数秒かかるため）。
+
+ワーカーは送信待ちのメールを BATCH_SIZE 件ずつ取り出し、1 バッチを 1 本の SMTP
+接続で送る。送信に失敗したメールは指数バックオフで再試行し、MAX_ATTEMPTS 回失敗すると
+failed になる。取り出しは Webhook の受信箱（blog/webhooks.py）と同じく条件付きの
+UPDATE で行うため、複数のプロセス（manage.py send_queued_mail）で動かしても
+同じメールを二重に送らない。
+"""
+
+import logging
+import random
+import smtplib
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .workers import BatchWorkerPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAIL_QUEUE = {
+    "WORKERS": 1,
+    # 1 本の SMTP 接続で送る件数
+    "BATCH_SIZE": 50,
+    # 送信待ちがないときの確認間隔（秒）。0 以下で自動起動しない
+    "POLL_INTERVAL": 2.0,
+    "MAX_ATTEMPTS": 6,
+    # 再試行の間隔（秒）: BACKOFF_BASE * 2 ** (試行回数 - 1)、BACKOFF_MAX まで
+    "BACKOFF_BASE": 30.0,
+    "BACKOFF_MAX": 3600.0,
+    # この時間を過ぎても送信中のメールは、ワーカーが停止したものとして取り直す
+    "CLAIM_TIMEOUT": 600.0,
+    # 送信済みのメールを残す日数
+    "RETENTION_DAYS": 30,
+}
+
+
+def get_mail_queue_settings() -> dict:
+    """設定 BLOG_MAIL_QUEUE を既定値とマージ"""
+    return {**DEFAULT_MAIL_QUEUE, **getattr(settings, "BLOG_MAIL_QUEUE", {})}
+
+
+def queue_mail(
+    subject: str, body: str, to: list[str], from_email: str | None = None
+) -> OutgoingEmail:
+    """メールを送信キューに保存し、コミット後にワーカーを起こす"""
+    email = OutgoingEmail.objects.create(
+        subject=subject[:255], body=body, to=list(to), from_email=from_email or ""
+    )
+    transaction.on_commit(mail_worker.wake)
+    return email
+
+
+def backoff_seconds(attempts: int, options: dict | None = None) -> float:
+    """attempts 回目の失敗後、次の試行までの秒数（同時の再試行が重ならないよう揺らす）"""
+    options = options or get_mail_queue_settings()
+    delay = min(
+        options["BACKOFF_BASE"] * 2 ** max(attempts - 1, 0), options["BACKOFF_MAX"]
+    )
+    return delay * random.uniform(0.8, 1.0)
+
+
+def claim_messages(
+    limit: int, now: datetime | None = None, options: dict | None = None
+) -> list[OutgoingEmail]:
+    """送信待ちのメールを取り出し、このワーカーの送信中にする"""
+    options = options or get_mail_queue_settings()
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=options["CLAIM_TIMEOUT"])
+    due = Q(status=OutgoingEmail.STATUS_PENDING, next_attempt_at__lte=now) | Q(
+        status=OutgoingEmail.STATUS_SENDING, claimed_at__lt=stale
+    )
+    ids = list(OutgoingEmail.objects.filter(due).values_list("id", flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # 他のワーカーが先に取り出したメールは条件に合わず更新されない
+    OutgoingEmail.objects.filter(due, id__in=ids).update(
+        status=OutgoingEmail.STATUS_SENDING, claimed_by=token, claimed_at=now
+    )
+    return list(
+        OutgoingEmail.objects.filter(
+            claimed_by=token, status=OutgoingEmail.STATUS_SENDING
+        )
+    )
+
+
+def _fail(email: OutgoingEmail, error: Exception, now: datetime, options: dict):
+    attempts = email.attempts + 1
+    if attempts >= options["MAX_ATTEMPTS"]:
+        status, next_attempt_at = OutgoingEmail.STATUS_FAILED, now
+        logger.error(f"Mail {email.id} failed after {attempts} attempts: {error!s}")
+    else:
+        status = OutgoingEmail.STATUS_PENDING
+        next_attempt_at = now + timedelta(seconds=backoff_seconds(attempts, options))
+        logger.warning(
+            f"Mail {email.id} failed (attempt {attempts}), "
+            f"retrying at {next_attempt_at:%H:%M:%S}: {error!s}"
+        )
+    OutgoingEmail.objects.filter(id=email.id, claimed_by=email.claimed_by).update(
+        status=status,
+        attempts=F("attempts") + 1,
+        next_attempt_at=next_attempt_at,
+        last_error=str(error)[:2000],
+        claimed_by="",
+        claimed_at=None,
+    )
+
+
+def send_batch(
+    limit: int | None = None, now: datetime | None = None
+) -> tuple[int, int]:
+    """送信待ちのメールを 1 バッチ送り、（送信数, 失敗数）を返す"""
+    options = get_mail_queue_settings()
+    now = now or timezone.now()
+    emails = claim_messages(limit or options["BATCH_SIZE"], now, options)
+    if not emails:
+        return 0, 0
+
+    # バッチ内のメールは同じ接続で送る（接続・TLS・認証は 1 回だけ）
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _fail(email, e, now, options)
+        return 0, len(emails)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=email.to,
+                connection=connection,
+            )
+            try:
+                if not connection.send_messages([message]):
+                    raise ValueError("No valid recipients")
+            except Exception as e:
+                _fail(email, e, now, options)
+                failed += 1
+                if not isinstance(e, smtplib.SMTPResponseException):
+                    # 応答がない（切断された）接続は開き直して残りのメールを送る
+                    connection.close()
+                    with suppress(Exception):
+                        connection.open()
+            else:
+                sent_ids.append(email.id)
+    finally:
+        connection.close()
+
+    # 送信済みの記録はバッチごとに 1 回（記録前に停止した場合は再送されうる）
+    OutgoingEmail.objects.filter(id__in=sent_ids).update(
+        status=OutgoingEmail.STATUS_SENT,
+        attempts=F("attempts") + 1,
+        sent_at=timezone.now(),
+        claimed_by="",
+        claimed_at=None,
+        last_error="",
+    )
+    return len(sent_ids), failed
+
+
+def send_pending(now: datetime | None = None) -> tuple[int, int]:
+    """送信待ちがなくなるまでバッチ送信を繰り返す（テスト・管理コマンド用）"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_batch(now=now)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
+
+
+def prune_mail(now: datetime | None = None) -> int:
+    """保存期間を過ぎた送信済みのメールを削除"""
+    days = get_mail_queue_settings()["RETENTION_DAYS"]
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.STATUS_SENT, sent_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+class MailWorker(BatchWorkerPool):
+    """送信キューのメールを送るワーカースレッド"""
+
+    thread_name = "mail-worker"
+
+    def get_settings(self) -> dict:
+        return get_mail_queue_settings()
+
+    def process_batch(self) -> tuple[int, int]:
+        return send_batch()
+
+
+mail_worker = MailWorker()
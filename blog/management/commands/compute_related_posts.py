@@ -0,0 +1,49 @@
+"""全記事の関連記事を TF-IDF で事前計算する"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.related import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_TOP_K,
+    build_index,
+    compute_all_related,
+)
+
+
+class Command(BaseCommand):
+    help = "Precompute top-k related posts for every live BlogPage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=DEFAULT_TOP_K,
+            help="Number of related posts stored per post",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of posts scored per similarity batch",
+        )
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        index = build_index()
+        self.stdout.write(
+            f"  Vectorized {len(index)} posts "
+            f"({len(index.vocabulary)} terms) in {time.time() - start_time:.3f}s"
+        )
+
+        computed = compute_all_related(
+            k=options["top_k"], batch_size=options["batch_size"], index=index
+        )
+        execution_time = time.time() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Computed related posts for {computed} posts "
+                f"in {execution_time:.3f} seconds"
+            )
+        )
@@ -0,0 +1,52 @@
+"""受信箱の Stripe Webhook イベントを処理する（Web ワーカーとは別プロセスで動かす場合）"""
+
+from django.core.management.base import BaseCommand
+
+from blog.models import StripeEvent
+from blog.webhooks import WebhookWorkerPool, process_pending, prune_events
+
+
+class Command(BaseCommand):
+    help = "Process queued Stripe webhook events, once or with a worker pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the events that are due now and exit",
+        )
+        parser.add_argument(
+            "--workers", type=int, help="Worker threads (default: settings)"
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete processed events older than RETENTION_DAYS first",
+        )
+
+    def handle(self, *args, **options):
+        if options["prune"]:
+            deleted = prune_events()
+            self.stdout.write(f"Pruned {deleted} processed events")
+
+        if options["once"]:
+            done, failed = process_pending()
+            failed_total = StripeEvent.objects.filter(
+                status=StripeEvent.STATUS_FAILED
+            ).count()
+            style = self.style.WARNING if failed else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f"Processed {done} events, {failed} failed "
+                    f"({failed_total} given up)"
+                )
+            )
+            return
+
+        pool = WebhookWorkerPool()
+        pool.start(options["workers"])
+        self.stdout.write("Processing Stripe events (Ctrl+C to stop)")
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
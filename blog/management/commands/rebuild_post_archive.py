@@ -0,0 +1,21 @@
+"""年月アーカイブのロールアップを全記事から再構築する"""
+
+from django.core.management.base import BaseCommand
+
+from blog.facets import rebuild_post_facets
+from blog.models import PostArchiveMonth
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the year/month post archive rollup from live BlogPages "
+        "(also rebuilds tag counts; same as rebuild_post_facets)"
+    )
+
+    def handle(self, *args, **options):
+        # アーカイブとタグのカウンターは同じ状態（PostFacetState）から作るため一緒に再構築する
+        counted = rebuild_post_facets()
+        months = PostArchiveMonth.objects.count()
+        self.stdout.write(
+            self.style.SUCCESS(f"Archive rebuilt: {counted} posts in {months} months")
+        )
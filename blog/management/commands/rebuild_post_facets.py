@@ -0,0 +1,20 @@
+"""年月アーカイブ・タグのファセットカウンターを全記事から再構築する"""
+
+from django.core.management.base import BaseCommand
+
+from blog.facets import rebuild_post_facets
+from blog.models import PostArchiveMonth, TagFacetCount
+
+
+class Command(BaseCommand):
+    help = "Rebuild the archive and tag facet counters from live BlogPages"
+
+    def handle(self, *args, **options):
+        counted = rebuild_post_facets()
+        months = PostArchiveMonth.objects.count()
+        tags = TagFacetCount.objects.count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Facets rebuilt: {counted} posts in {months} months, {tags} tags"
+            )
+        )
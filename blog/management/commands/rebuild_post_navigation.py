@@ -0,0 +1,13 @@
+"""全記事の前後記事リンクを再構築する"""
+
+from django.core.management.base import BaseCommand
+
+from blog.navigation import rebuild_post_navigation
+
+
+class Command(BaseCommand):
+    help = "Rebuild prev/next navigation links for every live BlogPage"
+
+    def handle(self, *args, **options):
+        linked = rebuild_post_navigation()
+        self.stdout.write(self.style.SUCCESS(f"Navigation rebuilt: {linked} posts"))
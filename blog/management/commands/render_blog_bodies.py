@@ -0,0 +1,91 @@
+"""BlogPage の事前レンダリングカラムを一括でバックフィルする"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.models import BlogPage
+from blog.rendering import RENDERED_FIELDS, render_batch
+
+
+def _init_worker():
+    """ワーカープロセスの初期化（spawn 起動時は Django を再セットアップ）"""
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+class Command(BaseCommand):
+    help = "Backfill pre-rendered body HTML, excerpt and reading time for BlogPages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes (1 renders in-process)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of pages rendered and written per batch",
+        )
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Only render pages whose body_html is empty",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        batch_size = max(1, options["batch_size"])
+
+        queryset = BlogPage.objects.order_by("pk")
+        if options["only_missing"]:
+            queryset = queryset.filter(body_html="").exclude(body="")
+        items = list(queryset.values_list("pk", "body"))
+        batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+        start_time = time.time()
+        rendered = 0
+
+        if workers == 1:
+            results = map(render_batch, batches)
+            rendered = self._write_results(results)
+        else:
+            # 親プロセスの DB 接続を子プロセスに引き継がない
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            ) as executor:
+                results = executor.map(render_batch, batches)
+                rendered = self._write_results(results)
+
+        execution_time = time.time() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {rendered} pages in {execution_time:.3f} seconds "
+                f"({workers} workers)"
+            )
+        )
+
+    def _write_results(self, results) -> int:
+        """レンダリング結果をバッチ単位で書き込む"""
+        rendered = 0
+        for batch in results:
+            pages = []
+            for page_id, fields in batch:
+                page = BlogPage(pk=page_id)
+                for field, value in fields.items():
+                    setattr(page, field, value)
+                pages.append(page)
+            BlogPage.objects.bulk_update(pages, RENDERED_FIELDS)
+            rendered += len(pages)
+            self.stdout.write(f"  {rendered} pages rendered")
+        return rendered
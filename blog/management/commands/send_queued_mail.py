@@ -0,0 +1,51 @@
+"""送信キューのメールを送る（Web ワーカーとは別プロセスで動かす場合）"""
+
+from django.core.management.base import BaseCommand
+
+from blog.mail import MailWorker, prune_mail, send_pending
+from blog.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = "Send queued mail, once or with a worker pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the messages that are due now and exit",
+        )
+        parser.add_argument(
+            "--workers", type=int, help="Worker threads (default: settings)"
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete sent messages older than RETENTION_DAYS first",
+        )
+
+    def handle(self, *args, **options):
+        if options["prune"]:
+            deleted = prune_mail()
+            self.stdout.write(f"Pruned {deleted} sent messages")
+
+        if options["once"]:
+            sent, failed = send_pending()
+            failed_total = OutgoingEmail.objects.filter(
+                status=OutgoingEmail.STATUS_FAILED
+            ).count()
+            style = self.style.WARNING if failed else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f"Sent {sent} messages, {failed} failed ({failed_total} given up)"
+                )
+            )
+            return
+
+        worker = MailWorker()
+        worker.start(options["workers"])
+        self.stdout.write("Sending queued mail (Ctrl+C to stop)")
+        try:
+            worker.join()
+        except KeyboardInterrupt:
+            worker.stop()
@@ -0,0 +1,58 @@
+"""SQLite の WAL をデータベース本体へ書き戻す（チェックポイント）"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from blog.sqlite import CHECKPOINT_MODES, checkpoint
+
+
+class Command(BaseCommand):
+    help = "Run a WAL checkpoint on a SQLite database, once or periodically"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="Database alias"
+        )
+        parser.add_argument(
+            "--mode",
+            type=str.upper,
+            default="PASSIVE",
+            choices=CHECKPOINT_MODES,
+            help="PASSIVE never blocks; TRUNCATE also shrinks the WAL file",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Repeat every N seconds until interrupted (0 runs once)",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError(f"{options['database']} is not a SQLite database")
+
+        mode = options["mode"].upper()
+        while True:
+            result = checkpoint(connection, mode)
+            if result["log"] < 0:
+                self.stdout.write(
+                    self.style.WARNING(f"Checkpoint {mode}: not in WAL mode")
+                )
+                return
+            # busy: 読み取り中の接続があり、全ては書き戻せなかった
+            busy = " (busy)" if result["busy"] else ""
+            style = self.style.WARNING if result["busy"] else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f"Checkpoint {mode}: {result['checkpointed']}/"
+                    f"{result['log']} WAL frames written back{busy}"
+                )
+            )
+            if not options["interval"]:
+                return
+            # 長時間動かすため、接続を持ち続けず毎回開き直す
+            connection.close()
+            time.sleep(options["interval"])
@@ -0,0 +1,23 @@
+"""有料記事の Stripe Product・Price を作成し、価格カタログを更新する"""
+
+from django.core.management.base import BaseCommand
+
+from blog.prices import sync_article_prices
+
+
+class Command(BaseCommand):
+    help = "Create Stripe products and prices for paid articles"
+
+    def handle(self, *args, **options):
+        # Stripe の API キー・API_BASE（ローカルのスタブ）は FastAPI 側と同じ設定を使う
+        from fastapi_app.app.utils.stripe_client import sync_stripe_client
+
+        counts = sync_article_prices(sync_stripe_client())
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Prices synced: {counts['prices']} created "
+                f"({counts['products']} new products), "
+                f"{counts['unchanged']} unchanged, {counts['deactivated']} deactivated"
+            )
+        )
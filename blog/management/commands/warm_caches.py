@@ -0,0 +1,89 @@
+"""記事一覧・人気記事・BlogIndexPage・件数系のキャッシュを事前に温める
+
+--url を指定しない場合、リクエストはこのコマンドのプロセス内で ASGI アプリケーションを
+直接呼び出すため、稼働中のサーバーのワーカーで温まるのはプロセス間で共有する
+キャッシュ（Redis など）だけ。ワーカーごとのキャッシュも温めるには --url を指定する。
+"""
+
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.warmup import build_warmup_paths, get_warmup_settings, warm_caches
+
+
+class Command(BaseCommand):
+    help = "Warm API and Wagtail page caches with bounded concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--list-pages", type=int, help="Listing pages to fetch")
+        parser.add_argument("--page-size", type=int, help="Posts per listing page")
+        parser.add_argument("--top-posts", type=int, help="Most-viewed posts to fetch")
+        parser.add_argument("--concurrency", type=int, help="Concurrent requests")
+        parser.add_argument("--budget", type=float, help="Time budget in seconds")
+        parser.add_argument("--host", help="Host header sent with the requests")
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server to warm over HTTP "
+            "(e.g. http://127.0.0.1:8000); default calls the app in this process",
+        )
+
+    def handle(self, *args, **options):
+        warmup = get_warmup_settings(
+            LIST_PAGES=options["list_pages"],
+            PAGE_SIZE=options["page_size"],
+            TOP_POSTS=options["top_posts"],
+            CONCURRENCY=options["concurrency"],
+            BUDGET_SECONDS=options["budget"],
+            HOST=options["host"],
+            URL=options["url"],
+        )
+        if warmup["URL"]:
+            app = None
+            # Host ヘッダーは --host を指定した場合のみ上書きする（既定は URL のホスト）
+            host = options["host"]
+        else:
+            # ASGI アプリケーションは Django の初期化後に読み込む
+            from main_asgi import app
+
+            host = warmup["HOST"]
+            backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+            if backend.endswith("LocMemCache"):
+                self.stderr.write(
+                    self.style.WARNING(
+                        "CACHES uses LocMemCache, which is per process: this only "
+                        "warms the command's own process. Pass --url to warm a "
+                        "running server."
+                    )
+                )
+        paths = build_warmup_paths(
+            warmup["LIST_PAGES"], warmup["PAGE_SIZE"], warmup["TOP_POSTS"]
+        )
+        self.stdout.write(
+            f"Warming {len(paths)} paths (concurrency={warmup['CONCURRENCY']}, "
+            f"budget={warmup['BUDGET_SECONDS']}s)"
+        )
+
+        def progress(done, total, path, status, elapsed):
+            self.stdout.write(f"  [{done}/{total}] {status} {path} ({elapsed:.3f}s)")
+
+        report = asyncio.run(
+            warm_caches(
+                app,
+                paths,
+                concurrency=warmup["CONCURRENCY"],
+                budget_seconds=warmup["BUDGET_SECONDS"],
+                host=host,
+                progress=progress,
+                url=warmup["URL"],
+            )
+        )
+
+        style = self.style.SUCCESS if not report.failed else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"Cache warmup: {report.succeeded} ok, {report.failed} failed, "
+                f"{report.skipped} skipped in {report.elapsed:.3f} seconds"
+            )
+        )
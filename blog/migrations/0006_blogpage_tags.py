@@ -0,0 +1,98 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:52
+
+import django.db.models.deletion
+import modelcluster.contrib.taggit
+import modelcluster.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("blog", "0005_post_archive_rollup"),
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="postfacetstate",
+            name="tag_ids",
+            field=models.JSONField(default=list),
+        ),
+        migrations.CreateModel(
+            name="BlogPageTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_object",
+                    modelcluster.fields.ParentalKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tagged_items",
+                        to="blog.blogpage",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_items",
+                        to="taggit.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="blogpage",
+            name="tags",
+            field=modelcluster.contrib.taggit.ClusterTaggableManager(
+                blank=True,
+                help_text="A comma-separated list of tags.",
+                through="blog.BlogPageTag",
+                to="taggit.Tag",
+                verbose_name="Tags",
+            ),
+        ),
+        migrations.CreateModel(
+            name="TagFacetCount",
+            fields=[
+                (
+                    "tag",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="taggit.tag",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-count"], name="blog_tagfac_count_e7425c_idx")
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="blogpagetag",
+            index=models.Index(
+                fields=["tag", "content_object"], name="blog_blogpa_tag_id_2e41ba_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="blogpagetag",
+            constraint=models.UniqueConstraint(
+                fields=("content_object", "tag"), name="blog_pagetag_page_tag_uniq"
+            ),
+        ),
+    ]
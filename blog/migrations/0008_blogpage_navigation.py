@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("blog", "0007_relatedpost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpage",
+            name="next_post",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="blogpage",
+            name="prev_post",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
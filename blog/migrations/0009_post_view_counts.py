@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("blog", "0008_blogpage_navigation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostViewCount",
+            fields=[
+                (
+                    "page_id",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("views", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PostViewBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("page_id", models.PositiveIntegerField()),
+                ("bucket", models.DateTimeField()),
+                ("views", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["bucket", "page_id", "views"],
+                        name="blog_postvi_bucket_7013cb_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("page_id", "bucket"),
+                        name="blog_viewbucket_page_bucket_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
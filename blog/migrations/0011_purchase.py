@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0010_stripe_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpage",
+            name="is_paid",
+            field=models.BooleanField(default=False, verbose_name="Paid article"),
+        ),
+        migrations.CreateModel(
+            name="Purchase",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("buyer_id", models.CharField(max_length=32)),
+                ("article_id", models.PositiveIntegerField()),
+                ("session_id", models.CharField(max_length=255, unique=True)),
+                ("amount", models.PositiveIntegerField(default=0)),
+                ("currency", models.CharField(default="jpy", max_length=3)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["buyer_id", "article_id"],
+                        name="blog_purcha_buyer_i_4fb8b6_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0011_purchase"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArticlePrice",
+            fields=[
+                (
+                    "page_id",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("amount", models.PositiveIntegerField()),
+                ("currency", models.CharField(default="jpy", max_length=3)),
+                ("stripe_product_id", models.CharField(max_length=255)),
+                ("stripe_price_id", models.CharField(blank=True, max_length=255)),
+                ("synced_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="blogpage",
+            name="price",
+            field=models.PositiveIntegerField(default=500, verbose_name="Price (JPY)"),
+        ),
+    ]
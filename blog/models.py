@@ -1,11 +1,21 @@
+from datetime import timedelta
 from typing import ClassVar
 
+from django.conf import settings
 from django.db import models
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from modelcluster.contrib.taggit import ClusterTaggableManager
+from modelcluster.fields import ParentalKey
+from taggit.models import Tag, TaggedItemBase
 from wagtail.admin.panels import FieldPanel
 from wagtail.fields import RichTextField
 from wagtail.models import Page
 from wagtail.search import index
 
+from .rendering import RENDERED_FIELDS, compute_rendered_fields
+
 
 class BlogIndexPage(Page):
     intro = RichTextField(blank=True)
@@ -14,6 +24,13 @@ class BlogIndexPage(Page):
 
     subpage_types: ClassVar[list[str]] = ["blog.BlogPage"]
 
+    def serve(self, request, *args, **kwargs):
+        from .purge import POST_LIST_KEY, blog_index_key, set_surrogate_keys
+
+        response = super().serve(request, *args, **kwargs)
+        # 記事の公開・非公開で一覧が変わるため post-list もパージ対象にする
+        return set_surrogate_keys(response, [blog_index_key(self.id), POST_LIST_KEY])
+
     def get_context(self, request):
         """パフォーマンス最適化: 子ページを効率的に取得"""
         context = super().get_context(request)
@@ -32,10 +49,44 @@ class BlogIndexPage(Page):
         return context
 
 
+class BlogPageTag(TaggedItemBase):
+    """BlogPage とタグの中間テーブル"""
+
+    content_object = ParentalKey(
+        "blog.BlogPage", related_name="tagged_items", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        constraints: ClassVar[list] = [
+            models.UniqueConstraint(
+                fields=["content_object", "tag"], name="blog_pagetag_page_tag_uniq"
+            ),
+        ]
+        # タグ→記事の絞り込み（AND/OR）を中間テーブルのインデックスのみで解決
+        indexes: ClassVar[list] = [
+            models.Index(fields=["tag", "content_object"]),
+        ]
+
+
 class BlogPage(Page):
     date = models.DateField("Post date", db_index=True)  # インデックス追加
     intro = models.CharField(max_length=250, db_index=True)  # インデックス追加
     body = RichTextField(blank=True)
+    # 有料記事は購入者にのみ本文を表示する（blog/entitlements.py）
+    is_paid = models.BooleanField("Paid article", default=False)
+    # 有料記事の価格。Stripe の Price は manage.py sync_stripe_prices で作成する
+    price = models.PositiveIntegerField("Price (JPY)", default=500)
+
+    # 保存時に事前計算される非正規化カラム（閲覧時のレンダリングを不要にする）
+    body_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False)
+    tags = ClusterTaggableManager(through=BlogPageTag, blank=True)
+
+    # 日付順で前後の公開記事へのリンク（{"id", "title", "url"}）。差分更新される
+    prev_post = models.JSONField(null=True, blank=True, editable=False)
+    next_post = models.JSONField(null=True, blank=True, editable=False)
 
     search_fields: ClassVar[list] = [
         *Page.search_fields,
@@ -48,6 +99,9 @@ class BlogPage(Page):
         FieldPanel("date"),
         FieldPanel("intro"),
         FieldPanel("body"),
+        FieldPanel("tags"),
+        FieldPanel("is_paid"),
+        FieldPanel("price"),
     ]
 
     parent_page_types: ClassVar[list[str]] = ["blog.BlogIndexPage"]
@@ -58,3 +112,378 @@ class BlogPage(Page):
             models.Index(fields=["-date"]),
             models.Index(fields=["intro", "date"]),
         ]
+
+    def save(self, *args, **kwargs):
+        """本文が保存される場合のみ事前レンダリングを更新"""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "body" in update_fields:
+            self.update_rendered_fields()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *RENDERED_FIELDS}
+        return super().save(*args, **kwargs)
+
+    def with_content_json(self, content):
+        """前後記事のリンクはリビジョンの値ではなく現在の値を維持"""
+        obj = super().with_content_json(content)
+        obj.prev_post = self.prev_post
+        obj.next_post = self.next_post
+        return obj
+
+    def update_rendered_fields(self):
+        """本文から HTML・抜粋・語数・読了時間を再計算"""
+        for field, value in compute_rendered_fields(self.body).items():
+            setattr(self, field, value)
+
+    def get_related_posts(self):
+        """事前計算済みの関連記事を順位順に取得（1クエリ）"""
+        return (
+            BlogPage.objects.live()
+            .public()
+            .filter(related_from__page=self)
+            .order_by("related_from__rank")
+            .defer("body", "body_html")
+        )
+
+    def serve(self, request, *args, **kwargs):
+        # 閲覧数はメモリ上で集計し、バックグラウンドで DB に書き出す
+        from .pageviews import record_view
+        from .purge import post_key, set_surrogate_keys
+
+        record_view(self.id)
+        response = super().serve(request, *args, **kwargs)
+        if self.is_paid:
+            # 購入者ごとに本文が変わるため CDN・共有キャッシュには載せない
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        # 関連記事が非公開になった場合もページをパージできるようキーに含める
+        # （評価結果はテンプレートの描画でもそのまま使われる）
+        related_posts = response.context_data["related_posts"]
+        return set_surrogate_keys(
+            response,
+            [post_key(self.id), *(post_key(post.id) for post in related_posts)],
+        )
+
+    def get_context(self, request, *args, **kwargs):
+        from .entitlements import can_read, get_buyer_id
+        from .prices import price_catalog
+
+        context = super().get_context(request, *args, **kwargs)
+        context["related_posts"] = self.get_related_posts()
+        # 事前計算済みのリンクのため追加クエリは発生しない
+        context["prev_post"] = self.prev_post
+        context["next_post"] = self.next_post
+        # 購入者ごとにキャッシュした購入済み記事の集合で判定（無料記事は判定しない）
+        context["can_read"] = can_read(
+            get_buyer_id(request.COOKIES) if self.is_paid else None,
+            self.id,
+            self.is_paid,
+        )
+        if not context["can_read"]:
+            # 購入ボタンには Checkout で課金する価格カタログの金額を表示する
+            context["price"] = price_catalog.lookup(self.id)
+        return context
+
+
+# 変更ログの記録からコミットまでにかかりうる秒数（これより新しい変更はまだ返さない）
+DEFAULT_CHANGE_FEED_SAFETY_SECONDS = 5.0
+
+
+class PostChangeQuerySet(models.QuerySet):
+    def settled_after(self, token: int):
+        """token より後の確定済みの変更（ID 順）
+
+        ID は INSERT 時に採番されるため、トランザクションが重なると ID の小さい変更が
+        後からコミットされうる。記録から BLOG_CHANGE_FEED_SAFETY_SECONDS 秒以内の
+        変更があれば、その ID より前までしか返さない（再開トークンが追い越さない）。
+        記録したトランザクションがこの秒数以内にコミットされる限り、変更は欠落しない。
+        """
+        changes = self.filter(id__gt=token)
+        seconds = getattr(
+            settings,
+            "BLOG_CHANGE_FEED_SAFETY_SECONDS",
+            DEFAULT_CHANGE_FEED_SAFETY_SECONDS,
+        )
+        if seconds > 0:
+            cutoff = timezone.now() - timedelta(seconds=seconds)
+            barrier = changes.filter(created_at__gt=cutoff).aggregate(
+                barrier=Min("id")
+            )["barrier"]
+            if barrier is not None:
+                changes = changes.filter(id__lt=barrier)
+        return changes.order_by("id")
+
+
+class PostChange(models.Model):
+    """BlogPage の変更ログ（差分同期 API 用）
+
+    主キーの ``id`` がそのまま再開トークンになるため、
+    ``id > since`` の主キー範囲スキャンだけで差分を取得できる。
+    ただし直近 BLOG_CHANGE_FEED_SAFETY_SECONDS 秒の変更は、コミット順が ID 順と
+    一致しない可能性があるため確定するまで返さない（``settled_after``）。
+    """
+
+    ACTION_UPSERT = "upsert"
+    ACTION_DELETE = "delete"
+    ACTION_CHOICES: ClassVar[list[tuple[str, str]]] = [
+        (ACTION_UPSERT, "Upsert"),
+        (ACTION_DELETE, "Delete"),
+    ]
+
+    # 削除後もイベントを残すため外部キーにはしない
+    page_id = models.PositiveIntegerField(db_index=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # settled_after で直近の変更（created_at > 現在時刻 - 確定待ち秒数）だけを引く
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = PostChangeQuerySet.as_manager()
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["id"]
+
+    def __str__(self):
+        return f"{self.action} page={self.page_id} token={self.id}"
+
+
+class PostArchiveMonth(models.Model):
+    """年月ごとの公開記事数のロールアップ（アーカイブナビゲーション用）"""
+
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["-year", "-month"]
+        constraints: ClassVar[list] = [
+            models.UniqueConstraint(
+                fields=["year", "month"], name="blog_archive_year_month_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}: {self.count}"
+
+
+class PostFacetState(models.Model):
+    """公開中の記事が現在どのファセットで集計されているかの記録
+
+    公開・日付変更時に前回の集計値との差分だけをロールアップに反映するために使う。
+    """
+
+    # 削除シグナル処理時にも参照できるよう外部キーにはしない
+    page_id = models.PositiveIntegerField(primary_key=True)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    tag_ids = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"page={self.page_id} {self.year}-{self.month:02d}"
+
+
+class TagFacetCount(models.Model):
+    """タグごとの公開記事数（ファセットカウンター）"""
+
+    tag = models.OneToOneField(
+        Tag, primary_key=True, on_delete=models.CASCADE, related_name="+"
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes: ClassVar[list] = [models.Index(fields=["-count"])]
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.count}"
+
+
+class RelatedPost(models.Model):
+    """事前計算された関連記事（TF-IDF コサイン類似度の上位 k 件）"""
+
+    page = models.ForeignKey(
+        BlogPage, on_delete=models.CASCADE, related_name="related_posts"
+    )
+    related = models.ForeignKey(
+        BlogPage, on_delete=models.CASCADE, related_name="related_from"
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["page", "rank"]
+        constraints: ClassVar[list] = [
+            models.UniqueConstraint(
+                fields=["page", "rank"], name="blog_relatedpost_page_rank_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.page_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class PostViewCount(models.Model):
+    """記事ごとの累計閲覧数（バッチ upsert で加算される）"""
+
+    # 削除済み記事の集計も破棄されるまで残せるよう外部キーにはしない
+    page_id = models.PositiveIntegerField(primary_key=True)
+    views = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"page={self.page_id}: {self.views}"
+
+
+class PostViewBucket(models.Model):
+    """1時間単位の閲覧数（24時間・7日間の人気記事ランキング用）"""
+
+    page_id = models.PositiveIntegerField()
+    bucket = models.DateTimeField()  # 時間の開始時刻（UTC）
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints: ClassVar[list] = [
+            models.UniqueConstraint(
+                fields=["page_id", "bucket"], name="blog_viewbucket_page_bucket_uniq"
+            ),
+        ]
+        # 期間での集計・古いバケットの削除用
+        indexes: ClassVar[list] = [
+            models.Index(fields=["bucket", "page_id", "views"]),
+        ]
+
+    def __str__(self):
+        return f"page={self.page_id} {self.bucket:%Y-%m-%d %H}:00: {self.views}"
+
+
+class StripeEvent(models.Model):
+    """受信した Stripe Webhook イベントの受信箱（inbox）
+
+    Webhook のエンドポイントは署名を検証して保存するだけで応答し、
+    処理はバックグラウンドのワーカーが行う（blog/webhooks.py）。
+    ``event_id`` の一意制約で Stripe の再送による重複を除く。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES: ClassVar[list[tuple[str, str]]] = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # 処理中のワーカーの識別子（同じイベントを複数のワーカーで処理しないため）
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["id"]
+        # 処理待ちのイベントを期限順に取り出す
+        indexes: ClassVar[list] = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
+class Purchase(models.Model):
+    """記事の購入記録（checkout.session.completed の Webhook から作成される）
+
+    購入者は Cookie の匿名 ID（buyer_id）で識別する。閲覧時の権限の判定は
+    購入者ごとにキャッシュした記事 ID の集合で行う（blog/entitlements.py）。
+    """
+
+    buyer_id = models.CharField(max_length=32)
+    # 購入記録は記事の削除後も残すため外部キーにはしない
+    article_id = models.PositiveIntegerField()
+    # Stripe の再送・重複イベントで二重に記録しない
+    session_id = models.CharField(max_length=255, unique=True)
+    amount = models.PositiveIntegerField(default=0)
+    currency = models.CharField(max_length=3, default="jpy")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["id"]
+        # 購入者の購入済み記事をインデックスのみで取得する
+        indexes: ClassVar[list] = [
+            models.Index(fields=["buyer_id", "article_id"]),
+        ]
+
+    def __str__(self):
+        return f"buyer={self.buyer_id} article={self.article_id} ({self.session_id})"
+
+
+class ArticlePrice(models.Model):
+    """有料記事の価格カタログ（Stripe の Product・Price の ID）
+
+    manage.py sync_stripe_prices が BlogPage.price から作成・更新し、Checkout では
+    メモリ上のカタログ（blog/prices.py）から Price の ID と金額を参照する。
+    """
+
+    # Stripe の Product は記事の削除後も残るため外部キーにはしない
+    page_id = models.PositiveIntegerField(primary_key=True)
+    amount = models.PositiveIntegerField()
+    currency = models.CharField(max_length=3, default="jpy")
+    stripe_product_id = models.CharField(max_length=255)
+    # 販売を停止した記事は空（Product は再開時に再利用する）
+    stripe_price_id = models.CharField(max_length=255, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"page={self.page_id}: {self.amount} {self.currency} ({self.stripe_price_id})"
+
+
+class OutgoingEmail(models.Model):
+    """送信待ちのメール（送信キュー）
+
+    リクエストや Webhook の処理中には保存するだけで、送信はバックグラウンドの
+    ワーカーが 1 バッチごとに 1 本の SMTP 接続を使い回して行う（blog/mail.py）。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES: ClassVar[list[tuple[str, str]]] = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # 送信中のワーカーの識別子（同じメールを複数のワーカーで送らないため）
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering: ClassVar[list[str]] = ["id"]
+        # 送信待ちのメールを期限順に取り出す
+        indexes: ClassVar[list] = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,114 @@
+"""日付順の前後記事リンクを差分で維持する
+
+各記事は ``(date, id)`` の順で直前・直後の公開記事へのリンクを
+``BlogPage.prev_post`` / ``next_post`` に保持する。記事の公開・非公開・日付変更時は
+その記事と、変更前後で隣接していた記事（最大5件）のリンクだけを再計算する。
+"""
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import BlogPage
+
+LINK_FIELDS = ("id", "title", "date", "url_path", "path", "depth")
+
+
+def _listed_pages():
+    """ナビゲーション対象（公開中かつ日付あり）の記事"""
+    return BlogPage.objects.live().public().filter(date__isnull=False)
+
+
+def make_link(page: BlogPage) -> dict:
+    """テンプレート・API で使うリンク情報"""
+    return {"id": page.id, "title": page.title, "url": page.get_url()}
+
+
+def find_neighbors(page: BlogPage) -> tuple[BlogPage | None, BlogPage | None]:
+    """``(date, id)`` 順で直前・直後の公開記事を取得"""
+    pages = _listed_pages().exclude(id=page.id).only(*LINK_FIELDS)
+    prev_page = (
+        pages.filter(Q(date__lt=page.date) | Q(date=page.date, id__lt=page.id))
+        .order_by("-date", "-id")
+        .first()
+    )
+    next_page = (
+        pages.filter(Q(date__gt=page.date) | Q(date=page.date, id__gt=page.id))
+        .order_by("date", "id")
+        .first()
+    )
+    return prev_page, next_page
+
+
+def _refresh_links(page_id: int):
+    """1記事分の前後リンクを再計算して保存"""
+    page = _listed_pages().filter(id=page_id).only(*LINK_FIELDS).first()
+    if page is None:
+        BlogPage.objects.filter(id=page_id).update(prev_post=None, next_post=None)
+        return
+    prev_page, next_page = find_neighbors(page)
+    BlogPage.objects.filter(id=page_id).update(
+        prev_post=make_link(prev_page) if prev_page else None,
+        next_post=make_link(next_page) if next_page else None,
+    )
+
+
+def _link_id(link) -> int | None:
+    return link["id"] if link else None
+
+
+def update_post_navigation(page: BlogPage) -> set[int]:
+    """記事の変更に伴い影響を受ける記事のリンクだけを更新し、更新した ID を返す
+
+    ``page`` の ``prev_post`` / ``next_post`` は変更前の値（リビジョン公開時も
+    ``with_content_json`` で維持される）として扱う。
+    """
+    affected = {page.id, _link_id(page.prev_post), _link_id(page.next_post)}
+
+    with transaction.atomic():
+        if page.live and page.date:
+            prev_page, next_page = find_neighbors(page)
+            affected.update(
+                neighbor.id for neighbor in (prev_page, next_page) if neighbor
+            )
+        affected.discard(None)
+        for page_id in sorted(affected):
+            _refresh_links(page_id)
+    return affected
+
+
+def update_links_to(page_ids) -> set[int]:
+    """URL が変わった記事と、その記事へのリンクを持つ前後の記事のリンクを更新
+
+    親の BlogIndexPage のスラッグ変更・移動で子孫の記事の URL が変わったときに使う。
+    更新した記事の ID を返す。
+    """
+    affected = set(page_ids)
+    for prev_post, next_post in BlogPage.objects.filter(id__in=page_ids).values_list(
+        "prev_post", "next_post"
+    ):
+        affected.update((_link_id(prev_post), _link_id(next_post)))
+    affected.discard(None)
+
+    with transaction.atomic():
+        for page_id in sorted(affected):
+            _refresh_links(page_id)
+    return affected
+
+
+def rebuild_post_navigation() -> int:
+    """全記事のリンクを一括で再構築し、リンクを設定した記事数を返す"""
+    pages = list(_listed_pages().only(*LINK_FIELDS).order_by("date", "id"))
+    links = [make_link(page) for page in pages]
+    for i, page in enumerate(pages):
+        page.prev_post = links[i - 1] if i > 0 else None
+        page.next_post = links[i + 1] if i + 1 < len(pages) else None
+
+    with transaction.atomic():
+        # 公開対象外になった記事に残っているリンクを消す
+        BlogPage.objects.filter(
+            Q(prev_post__isnull=False) | Q(next_post__isnull=False)
+        ).exclude(id__in=_listed_pages().values("id")).update(
+            prev_post=None, next_post=None
+        )
+        BlogPage.objects.bulk_update(pages, ["prev_post", "next_post"], batch_size=1000)
+    return len(pages)
@@ -0,0 +1,203 @@
+"""記事の閲覧数カウンター
+
+閲覧ごとに ``UPDATE ... SET views = views + 1`` を発行すると、人気記事の行ロックで
+リクエストが直列化してしまう。そこで閲覧はワーカー内のメモリ上で集計し、
+バックグラウンドスレッドが一定間隔で差分をまとめて upsert する。
+リクエスト処理側はロックを取って辞書を加算するだけで、DB にはアクセスしない。
+
+人気記事ランキング用に、閲覧数は1時間単位のバケットにも加算する。
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import BlogPage, PostViewBucket, PostViewCount
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 10  # 秒
+UPSERT_BATCH_SIZE = 500
+
+# ランキングの集計期間
+POPULAR_WINDOWS = {"24h": timedelta(hours=24), "7d": timedelta(days=7)}
+BUCKET_RETENTION = timedelta(days=8)
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """時刻を含む1時間バケットの開始時刻"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert_increments(table: str, key_columns: list[str], rows: list[tuple]):
+    """``views`` 列への加算を INSERT ... ON CONFLICT でまとめて反映"""
+    quote = connection.ops.quote_name
+    columns = [*key_columns, "views"]
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start : start + UPSERT_BATCH_SIZE]
+        sql = (
+            f"INSERT INTO {quote(table)} ({', '.join(map(quote, columns))}) "
+            f"VALUES {', '.join([placeholders] * len(batch))} "
+            f"ON CONFLICT ({', '.join(map(quote, key_columns))}) "
+            f"DO UPDATE SET {quote('views')} = "
+            f"{quote(table)}.{quote('views')} + excluded.{quote('views')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for row in batch for value in row])
+
+
+class ViewCounter:
+    """ワーカー内で閲覧数を集計し、定期的に DB へ書き出すカウンター"""
+
+    def __init__(self, flush_interval: float | None = None):
+        # None の場合は設定 BLOG_VIEW_FLUSH_INTERVAL を使う（0 以下で自動書き出しなし）
+        self._flush_interval = flush_interval
+        self._pending: Counter = Counter()  # (page_id, bucket) -> views
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def flush_interval(self) -> float:
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, "BLOG_VIEW_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+
+    def record(self, page_id: int, now: datetime | None = None):
+        """閲覧を1件記録（メモリ上の加算のみ）"""
+        key = (page_id, bucket_start(now or timezone.now()))
+        with self._lock:
+            self._pending[key] += 1
+        if self._thread is None and self.flush_interval > 0:
+            self.start()
+
+    def pending(self) -> int:
+        """未書き出しの閲覧数"""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self) -> int:
+        """集計済みの差分を DB に書き出し、書き出した閲覧数を返す"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+            if not pending:
+                return 0
+
+            totals = Counter()
+            for (page_id, _), views in pending.items():
+                totals[page_id] += views
+            adapt = connection.ops.adapt_datetimefield_value
+
+            try:
+                with transaction.atomic():
+                    _upsert_increments(
+                        PostViewCount._meta.db_table,
+                        ["page_id"],
+                        sorted(totals.items()),
+                    )
+                    _upsert_increments(
+                        PostViewBucket._meta.db_table,
+                        ["page_id", "bucket"],
+                        [
+                            (page_id, adapt(bucket), views)
+                            for (page_id, bucket), views in sorted(pending.items())
+                        ],
+                    )
+            except Exception:
+                # 書き出せなかった差分は次回に持ち越す
+                with self._lock:
+                    self._pending.update(pending)
+                raise
+            return sum(totals.values())
+
+    def start(self):
+        """定期書き出しスレッドを起動"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="post-view-flusher", daemon=True
+            )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """スレッドを止め、残りの差分を書き出す"""
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Post view flush failed on shutdown: {e!s}")
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+                prune_view_buckets()
+            except Exception as e:
+                logger.error(f"Post view flush failed: {e!s}")
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
+
+
+def record_view(page_id: int):
+    """記事の閲覧を記録（リクエスト処理をブロックしない）"""
+    view_counter.record(page_id)
+
+
+def prune_view_buckets(now: datetime | None = None) -> int:
+    """ランキングに使わなくなった古いバケットを削除"""
+    cutoff = bucket_start(now or timezone.now()) - BUCKET_RETENTION
+    deleted, _ = PostViewBucket.objects.filter(bucket__lt=cutoff).delete()
+    return deleted
+
+
+def get_popular_posts(window: str = "24h", limit: int = 10, now=None) -> list[dict]:
+    """指定期間の閲覧数が多い公開記事を取得"""
+    since = bucket_start(now or timezone.now()) - POPULAR_WINDOWS[window]
+    published = BlogPage.objects.live().public()
+    ranking = list(
+        PostViewBucket.objects.filter(
+            bucket__gt=since, page_id__in=published.values("id")
+        )
+        .values("page_id")
+        .annotate(total=Sum("views"))
+        .order_by("-total", "page_id")[:limit]
+    )
+    pages = published.only("id", "title", "slug", "url_path").in_bulk(
+        [row["page_id"] for row in ranking]
+    )
+
+    return [
+        {
+            "id": page.id,
+            "title": page.title,
+            "slug": page.slug,
+            "url": page.get_url(),
+            "views": row["total"],
+        }
+        for row in ranking
+        if (page := pages.get(row["page_id"])) is not None
+    ]
+
+
+def get_view_counts(page_ids) -> dict[int, int]:
+    """記事ごとの累計閲覧数を取得（書き出し済みの値）"""
+    return dict(
+        PostViewCount.objects.filter(page_id__in=page_ids).values_list(
+            "page_id", "views"
+        )
+    )
@@ -0,0 +1,166 @@
+"""
+有料記事の価格カタログ
+
+Checkout セッションの作成時に毎回 price_data・product_data を送るのではなく、
+記事ごとの Stripe の Product・Price を事前に作成し（manage.py sync_stripe_prices）、
+Checkout では Price の ID だけを送る。金額もカタログの値で検証するため、
+クライアントから送られた金額で課金されることはない。
+
+カタログ（ArticlePrice の全行）は各プロセスのメモリに保持し、REFRESH_INTERVAL ごとに
+読み直す。参照時にクエリは発生しない。
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import ArticlePrice, BlogPage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICE_CATALOG = {
+    "CURRENCY": "jpy",
+    # カタログを読み直す間隔（秒）。同期コマンドの結果は次の読み直しで反映される
+    "REFRESH_INTERVAL": 60.0,
+}
+
+
+def get_price_catalog_settings() -> dict:
+    """設定 BLOG_PRICE_CATALOG を既定値とマージ"""
+    return {**DEFAULT_PRICE_CATALOG, **getattr(settings, "BLOG_PRICE_CATALOG", {})}
+
+
+class PriceCatalog:
+    """記事 ID -> 販売中の ArticlePrice"""
+
+    def __init__(self):
+        self._prices: dict[int, ArticlePrice] | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def needs_refresh(self) -> bool:
+        if self._prices is None:
+            return True
+        interval = get_price_catalog_settings()["REFRESH_INTERVAL"]
+        return time.monotonic() - self._loaded_at >= interval
+
+    def refresh(self):
+        """全行を読み直して入れ替える（1クエリ）"""
+        with self._lock:
+            self._load()
+
+    def maybe_refresh(self):
+        """読み直しの間隔を過ぎていれば読み直す（他のスレッドが読み込み中なら待たない）"""
+        if not self.needs_refresh():
+            return
+        if self._prices is None:
+            # 初回は読み込みを待つ
+            with self._lock:
+                if self._prices is None:
+                    self._load()
+        elif self._lock.acquire(blocking=False):
+            try:
+                self._load()
+            finally:
+                self._lock.release()
+
+    def _load(self):
+        self._prices = {
+            price.page_id: price
+            for price in ArticlePrice.objects.exclude(stripe_price_id="")
+        }
+        self._loaded_at = time.monotonic()
+        logger.debug(f"Price catalog loaded: {len(self._prices)} articles")
+
+    def get(self, article_id: int) -> ArticlePrice | None:
+        """メモリ上のカタログから取得（読み込み前は None。クエリは発生しない）"""
+        return (self._prices or {}).get(article_id)
+
+    def lookup(self, article_id: int) -> ArticlePrice | None:
+        """必要なら読み直してから取得（同期のコードから使う）"""
+        self.maybe_refresh()
+        return self.get(article_id)
+
+    def reset(self):
+        self._prices = None
+
+
+price_catalog = PriceCatalog()
+
+
+def sync_article_prices(client) -> Counter:
+    """有料記事の Product・Price を Stripe に作成し、カタログに保存
+
+    作成済みで価格が変わっていない記事は Stripe を呼ばない。価格が変わった記事は
+    新しい Price を作成して古い Price を無効にする（Stripe の Price は金額を変更できない）。
+    client は同期メソッドを呼べる stripe.StripeClient。
+    """
+    currency = get_price_catalog_settings()["CURRENCY"]
+    rows = {row.page_id: row for row in ArticlePrice.objects.all()}
+    counts = Counter()
+
+    pages = BlogPage.objects.live().filter(is_paid=True).only("id", "title", "price")
+    for page in pages:
+        row = rows.pop(page.id, None)
+        if (
+            row is not None
+            and row.stripe_price_id
+            and (row.amount, row.currency) == (page.price, currency)
+        ):
+            counts["unchanged"] += 1
+            continue
+
+        product_id = row.stripe_product_id if row is not None else ""
+        if not product_id:
+            product = client.products.create(
+                params={
+                    "name": page.title[:100],
+                    "metadata": {"article_id": str(page.id)},
+                },
+                options={"idempotency_key": f"product-{page.id}"},
+            )
+            product_id = product.id
+            counts["products"] += 1
+
+        old_price_id = row.stripe_price_id if row is not None else ""
+        price = client.prices.create(
+            params={
+                "product": product_id,
+                "unit_amount": page.price,
+                "currency": currency,
+                "metadata": {"article_id": str(page.id)},
+            },
+            # 再実行しても同じ変更で Price を重複して作成しない
+            options={
+                "idempotency_key": (
+                    f"price-{page.id}-{old_price_id or 'new'}-{page.price}-{currency}"
+                )
+            },
+        )
+        ArticlePrice.objects.update_or_create(
+            page_id=page.id,
+            defaults={
+                "amount": page.price,
+                "currency": currency,
+                "stripe_product_id": product_id,
+                "stripe_price_id": price.id,
+            },
+        )
+        counts["prices"] += 1
+        # カタログを新しい Price に切り替えてから古い Price を無効にする
+        if old_price_id:
+            client.prices.update(old_price_id, params={"active": False})
+
+    # 無料になった・非公開になった記事は販売を停止する
+    for row in rows.values():
+        if row.stripe_price_id:
+            client.prices.update(row.stripe_price_id, params={"active": False})
+            row.stripe_price_id = ""
+            row.save(update_fields=["stripe_price_id", "synced_at"])
+            counts["deactivated"] += 1
+
+    price_catalog.reset()
+    return counts
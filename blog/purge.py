@@ -0,0 +1,155 @@
+"""CDN・リバースプロキシ向けのサロゲートキー付与とパージ
+
+レスポンスに ``Surrogate-Key``（Fastly・Varnish xkey 形式、空白区切り）と
+``Cache-Tag``（Cloudflare 形式、カンマ区切り）を付与し、記事の公開・非公開時は
+影響するキーだけをパージする。パージの送信先は設定 BLOG_CACHE_PURGER で差し替えられる。
+"""
+
+import json
+import logging
+import threading
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+POST_LIST_KEY = "post-list"
+DEFAULT_MAX_AGE = 60 * 60 * 24
+
+
+def post_key(page_id: int) -> str:
+    return f"post-{page_id}"
+
+
+def blog_index_key(page_id: int) -> str:
+    return f"blog-index-{page_id}"
+
+
+def set_surrogate_keys(response, keys):
+    """レスポンスにサロゲートキーと CDN 用のキャッシュ期間を設定"""
+    keys = sorted(set(keys))
+    if not keys:
+        return response
+    response.headers["Surrogate-Key"] = " ".join(keys)
+    response.headers["Cache-Tag"] = ",".join(keys)
+    max_age = getattr(settings, "BLOG_SURROGATE_MAX_AGE", DEFAULT_MAX_AGE)
+    if max_age:
+        # CDN のみが解釈し、ブラウザのキャッシュ期間には影響しない
+        response.headers["Surrogate-Control"] = f"max-age={max_age}"
+    return response
+
+
+class BasePurger(ABC):
+    """パージ送信のインターフェース"""
+
+    @abstractmethod
+    def purge(self, keys):
+        """サロゲートキーを指定してパージを要求"""
+
+
+class LocalPurger(BasePurger):
+    """パージ要求をメモリに記録するだけのローカル実装（開発・テスト用）"""
+
+    def __init__(self):
+        self.purged: list[set[str]] = []
+        self._lock = threading.Lock()
+
+    def purge(self, keys):
+        keys = set(keys)
+        with self._lock:
+            self.purged.append(keys)
+        logger.debug(f"Purge requested: {' '.join(sorted(keys))}")
+
+    @property
+    def purged_keys(self) -> set[str]:
+        """これまでにパージされたキーの集合"""
+        with self._lock:
+            return set().union(*self.purged)
+
+    def clear(self):
+        with self._lock:
+            self.purged.clear()
+
+
+class HTTPPurger(BasePurger):
+    """HTTP でパージ API を呼び出す実装
+
+    キーは ``Surrogate-Key`` ヘッダー（空白区切り）と JSON 本文
+    ``{"surrogate_keys": [...], "tags": [...]}`` の両方で送るため、
+    Fastly・Varnish（xkey）・Cloudflare 互換のエンドポイントに合わせて使える。
+    送信はバックグラウンドスレッドで行い、公開処理を待たせない。
+    """
+
+    def __init__(self, url, headers=None, method="POST", timeout=5.0, batch_size=256):
+        self.url = url
+        self.headers = headers or {}
+        self.method = method
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cache-purge"
+        )
+
+    def purge(self, keys):
+        keys = sorted(set(keys))
+        for start in range(0, len(keys), self.batch_size):
+            self._executor.submit(self._send, keys[start : start + self.batch_size])
+
+    def _send(self, keys):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"surrogate_keys": keys, "tags": keys}).encode(),
+            method=self.method,
+            headers={
+                **self.headers,
+                "Content-Type": "application/json",
+                "Surrogate-Key": " ".join(keys),
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                logger.info(f"Purged {len(keys)} keys: HTTP {response.status}")
+        except Exception as e:
+            logger.error(f"Cache purge failed for {' '.join(keys)}: {e!s}")
+
+    def wait(self):
+        """送信待ちのパージ要求が完了するまで待つ"""
+        self._executor.submit(lambda: None).result()
+
+
+_purger: BasePurger | None = None
+_purger_lock = threading.Lock()
+
+
+def get_purger() -> BasePurger:
+    """設定 BLOG_CACHE_PURGER のパージ実装を返す"""
+    global _purger
+    if _purger is None:
+        with _purger_lock:
+            if _purger is None:
+                config = getattr(
+                    settings,
+                    "BLOG_CACHE_PURGER",
+                    {"BACKEND": "blog.purge.LocalPurger"},
+                )
+                backend = import_string(config["BACKEND"])
+                _purger = backend(**config.get("OPTIONS", {}))
+    return _purger
+
+
+def reset_purger():
+    """パージ実装を破棄（設定変更後に再生成する）"""
+    global _purger
+    with _purger_lock:
+        _purger = None
+
+
+def purge_keys(keys):
+    """サロゲートキーをパージ"""
+    keys = set(keys)
+    if keys:
+        get_purger().purge(keys)
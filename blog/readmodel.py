@@ -0,0 +1,376 @@
+"""公開記事メタデータの列指向リードモデル
+
+一覧・絞り込みのたびに ``wagtailcore_page`` へ treebeard + live/public の
+クエリを発行する代わりに、公開記事の ID・日付・公開日時・親ページ・タグを
+NumPy 配列としてプロセス内に保持し、並び替え・絞り込み・ページングを
+ベクトル演算で行う。本文などの行データは詳細キャッシュから取得する。
+
+公開状態の変化は変更フィード（PostChange）をポーリングして取り込むため、
+複数ワーカーでもそれぞれのリードモデルが追従する。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from wagtail.models import Page
+
+from .models import BlogPage, BlogPageTag, PostChange
+
+logger = logging.getLogger(__name__)
+
+# 公開日時がない記事のソートキー
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+DEFAULT_REFRESH_INTERVAL = 1.0  # 秒
+
+# 1回のポーリングで取り込む変更の上限（超えた場合は全件を再構築）
+MAX_DELTA_CHANGES = 5000
+
+# 差分の記事数がこれ以下なら並び替え配列を再ソートせず挿入位置の二分探索で更新
+MAX_MERGE_ROWS = 32
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """ある時点のリードモデル（読み取り専用。更新時は丸ごと差し替える）"""
+
+    ids: np.ndarray  # int64
+    dates: np.ndarray  # int64（date.toordinal()）
+    published: np.ndarray  # int64（first_published_at のマイクロ秒）
+    parents: np.ndarray  # int64（親 BlogIndexPage の ID）
+    tags: np.ndarray  # uint64 (ワード数, 記事数) のタグビットセット
+    tag_bits: dict  # タグの slug -> ビット位置
+    orders: dict  # 並び順 -> 行の並び替え配列
+    token: int  # 取り込み済みの PostChange ID
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _sort_orders(ids, dates, published) -> dict:
+    """並び順ごとの行の並び替え配列を作る（同順位は ID 順）"""
+    ascending = np.lexsort((ids, published, dates))
+    return {
+        "-date": ascending[::-1].copy(),
+        "date": ascending,
+        "published": np.lexsort((ids, published))[::-1].copy(),
+    }
+
+
+def _merge_order(kept_order, columns, new_rows) -> np.ndarray:
+    """昇順の並び替え配列に新しい行を挿入（columns は優先度の高い順のソートキー）"""
+    new_rows = new_rows[np.lexsort(tuple(col[new_rows] for col in reversed(columns)))]
+    sorted_columns = [col[kept_order] for col in columns]
+    positions = []
+    for row in new_rows:
+        low, high = 0, len(kept_order)
+        for col, sorted_col in zip(columns, sorted_columns, strict=True):
+            segment = sorted_col[low:high]
+            value = col[row]
+            low, high = (
+                low + int(np.searchsorted(segment, value, "left")),
+                low + int(np.searchsorted(segment, value, "right")),
+            )
+        positions.append(low)
+    return np.insert(kept_order, positions, new_rows)
+
+
+def _merge_orders(orders: dict, keep, ids, dates, published) -> dict:
+    """残った行の順序を保ったまま、末尾に追加された行を並び替え配列に挿入"""
+    new_rows = np.arange(int(keep.sum()), len(ids))
+    if len(new_rows) > MAX_MERGE_ROWS:
+        return _sort_orders(ids, dates, published)
+
+    # 旧スナップショットの行番号 -> 新しい行番号
+    remap = np.cumsum(keep) - 1
+
+    def kept(order):
+        return remap[order[keep[order]]]
+
+    ascending = _merge_order(kept(orders["date"]), (dates, published, ids), new_rows)
+    by_published = _merge_order(
+        kept(orders["published"][::-1]), (published, ids), new_rows
+    )
+    return {
+        "-date": ascending[::-1].copy(),
+        "date": ascending,
+        "published": by_published[::-1].copy(),
+    }
+
+
+def _tag_matrix(page_tags: list, tag_bits: dict) -> np.ndarray:
+    """記事ごとのタグ slug のリストからビットセット行列を作る
+
+    ワードごとに記事方向へ連続した配列にし、絞り込みで必要なワードだけを走査する。
+    """
+    for slugs in page_tags:
+        for slug in slugs:
+            tag_bits.setdefault(slug, len(tag_bits))
+    words = max(1, -(-len(tag_bits) // 64))
+    matrix = np.zeros((words, len(page_tags)), dtype=np.uint64)
+    rows, bits = [], []
+    for row, slugs in enumerate(page_tags):
+        for slug in slugs:
+            rows.append(row)
+            bits.append(tag_bits[slug])
+    if rows:
+        rows = np.asarray(rows, dtype=np.int64)
+        bits = np.asarray(bits, dtype=np.int64)
+        values = np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64))
+        np.bitwise_or.at(matrix, (bits // 64, rows), values)
+    return matrix
+
+
+def build_snapshot(
+    ids, dates, published, parents, page_tags, token=0, tag_bits=None
+) -> Snapshot:
+    """列データからスナップショットを作る"""
+    ids = np.asarray(ids, dtype=np.int64)
+    dates = np.asarray(dates, dtype=np.int64)
+    published = np.asarray(published, dtype=np.int64)
+    tag_bits = dict(tag_bits or {})
+    return Snapshot(
+        ids=ids,
+        dates=dates,
+        published=published,
+        parents=np.asarray(parents, dtype=np.int64),
+        tags=_tag_matrix(page_tags, tag_bits),
+        tag_bits=tag_bits,
+        orders=_sort_orders(ids, dates, published),
+        token=token,
+    )
+
+
+def _widen(matrix: np.ndarray, words: int) -> np.ndarray:
+    if matrix.shape[0] >= words:
+        return matrix
+    extra = np.zeros((words - matrix.shape[0], matrix.shape[1]), dtype=np.uint64)
+    return np.vstack([matrix, extra])
+
+
+def apply_delta(snapshot: Snapshot, page_ids, columns: dict, token: int) -> Snapshot:
+    """変更された記事の行を差し替えたスナップショットを作る
+
+    ``columns`` は ``load_columns(page_ids)`` の結果（公開中の記事のみ）。
+    """
+    keep = ~np.isin(snapshot.ids, np.fromiter(page_ids, dtype=np.int64))
+    tag_bits = dict(snapshot.tag_bits)
+    new_tags = _tag_matrix(columns["page_tags"], tag_bits)
+    words = max(snapshot.tags.shape[0], new_tags.shape[0])
+
+    ids = np.concatenate([snapshot.ids[keep], columns["ids"]])
+    dates = np.concatenate([snapshot.dates[keep], columns["dates"]])
+    published = np.concatenate([snapshot.published[keep], columns["published"]])
+    return Snapshot(
+        ids=ids,
+        dates=dates,
+        published=published,
+        parents=np.concatenate([snapshot.parents[keep], columns["parents"]]),
+        tags=np.hstack(
+            [_widen(snapshot.tags[:, keep], words), _widen(new_tags, words)]
+        ),
+        tag_bits=tag_bits,
+        orders=_merge_orders(snapshot.orders, keep, ids, dates, published),
+        token=token,
+    )
+
+
+def load_columns(page_ids=None) -> dict:
+    """公開中の記事の列データを DB から読み込む（page_ids 指定時はその記事のみ）"""
+    queryset = BlogPage.objects.live().public()
+    if page_ids is not None:
+        queryset = queryset.filter(id__in=list(page_ids))
+    rows = list(
+        queryset.order_by("id").values_list("id", "date", "first_published_at", "path")
+    )
+
+    parent_paths = {path[: -Page.steplen] for *_, path in rows}
+    parent_ids = dict(
+        Page.objects.filter(path__in=parent_paths).values_list("path", "id")
+    )
+    tags_by_page: dict[int, list[str]] = {}
+    for page_id, slug in BlogPageTag.objects.filter(
+        content_object__in=queryset
+    ).values_list("content_object_id", "tag__slug"):
+        tags_by_page.setdefault(page_id, []).append(slug)
+
+    return {
+        "ids": np.array([row[0] for row in rows], dtype=np.int64),
+        "dates": np.array(
+            [row[1].toordinal() if row[1] else 0 for row in rows], dtype=np.int64
+        ),
+        "published": np.array(
+            [
+                int(row[2].timestamp() * 1_000_000) if row[2] else NO_TIMESTAMP
+                for row in rows
+            ],
+            dtype=np.int64,
+        ),
+        "parents": np.array(
+            [parent_ids.get(row[3][: -Page.steplen], 0) for row in rows],
+            dtype=np.int64,
+        ),
+        "page_tags": [tags_by_page.get(row[0], []) for row in rows],
+    }
+
+
+class PostReadModel:
+    """リードモデルの構築・差分適用・クエリ"""
+
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._snapshot: Snapshot | None = None
+        # 構築・差分適用は直列化し、読み取りはロックなしでスナップショットを参照する
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+
+    @property
+    def snapshot(self) -> Snapshot:
+        if self._snapshot is None:
+            self.build()
+        return self._snapshot
+
+    def build(self) -> Snapshot:
+        """全公開記事からスナップショットを構築"""
+        with self._lock:
+            # 構築中・未確定の変更は次回以降のポーリングで取り込まれる
+            token = (
+                PostChange.objects.settled_after(0).aggregate(token=Max("id"))["token"]
+                or 0
+            )
+            columns = load_columns()
+            self._snapshot = build_snapshot(
+                columns["ids"],
+                columns["dates"],
+                columns["published"],
+                columns["parents"],
+                columns["page_tags"],
+                token=token,
+            )
+            self._last_refresh = time.monotonic()
+            logger.info(f"Post read model built: {len(self._snapshot)} posts")
+            return self._snapshot
+
+    def refresh(self) -> int:
+        """変更フィードの新しいイベントを取り込み、取り込んだ件数を返す"""
+        with self._lock:
+            snapshot = self.snapshot
+            self._last_refresh = time.monotonic()
+            changes = list(
+                PostChange.objects.settled_after(snapshot.token).values_list(
+                    "id", "page_id"
+                )[: MAX_DELTA_CHANGES + 1]
+            )
+            if not changes:
+                return 0
+            if len(changes) > MAX_DELTA_CHANGES:
+                self.build()
+                return len(changes)
+
+            page_ids = {page_id for _, page_id in changes}
+            self._snapshot = apply_delta(
+                snapshot, page_ids, load_columns(page_ids), changes[-1][0]
+            )
+            return len(changes)
+
+    def maybe_refresh(self):
+        """前回のポーリングから一定時間経過していれば差分を取り込む"""
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        # 他のスレッドが取り込み中であれば現在のスナップショットで応答する
+        if self._lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+
+    def query(
+        self,
+        date_from: date = None,
+        date_to: date = None,
+        parent: int = None,
+        tags: list[str] = None,
+        tag_mode: str = "any",
+        order: str = "-date",
+        offset: int = 0,
+        limit: int = 20,
+    ) -> tuple[list[int], int]:
+        """条件に合う記事 ID のページと総件数を返す"""
+        snapshot = self.snapshot
+        order_rows = snapshot.orders[order]
+        if not (date_from or date_to or parent is not None or tags):
+            page = order_rows[offset : offset + limit]
+            return snapshot.ids[page].tolist(), len(snapshot)
+
+        mask = np.ones(len(snapshot), dtype=bool)
+        if date_from:
+            mask &= snapshot.dates >= date_from.toordinal()
+        if date_to:
+            mask &= snapshot.dates <= date_to.toordinal()
+        if parent is not None:
+            mask &= snapshot.parents == parent
+        if tags:
+            bits = [snapshot.tag_bits.get(slug) for slug in set(tags)]
+            if tag_mode == "all" and None in bits:
+                return [], 0
+            bits = [bit for bit in bits if bit is not None]
+            if not bits:
+                return [], 0
+            wanted: dict[int, int] = {}
+            for bit in bits:
+                wanted[bit // 64] = wanted.get(bit // 64, 0) | (1 << (bit % 64))
+            matched = None
+            for word, word_bits in wanted.items():
+                word_bits = np.uint64(word_bits)
+                hits = snapshot.tags[word] & word_bits
+                hits = hits == word_bits if tag_mode == "all" else hits != 0
+                if matched is None:
+                    matched = hits
+                elif tag_mode == "all":
+                    matched &= hits
+                else:
+                    matched |= hits
+            mask &= matched
+
+        rows = order_rows[mask[order_rows]]
+        page = rows[offset : offset + limit]
+        return snapshot.ids[page].tolist(), len(rows)
+
+
+_read_model: PostReadModel | None = None
+_read_model_lock = threading.Lock()
+
+
+def get_read_model() -> PostReadModel | None:
+    """有効な場合はリードモデルを返す（初回呼び出し時に構築）"""
+    global _read_model
+    if not getattr(settings, "BLOG_READ_MODEL_ENABLED", False):
+        return None
+    if _read_model is None:
+        with _read_model_lock:
+            if _read_model is None:
+                model = PostReadModel(
+                    getattr(
+                        settings,
+                        "BLOG_READ_MODEL_REFRESH_INTERVAL",
+                        DEFAULT_REFRESH_INTERVAL,
+                    )
+                )
+                model.build()
+                _read_model = model
+    else:
+        _read_model.maybe_refresh()
+    return _read_model
+
+
+def reset_read_model():
+    """リードモデルを破棄（次回呼び出し時に再構築）"""
+    global _read_model
+    with _read_model_lock:
+        _read_model = None
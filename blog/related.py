@@ -0,0 +1,390 @@
+"""関連記事の事前計算エンジン
+
+BlogPage のタイトル・導入文・本文を TF-IDF でベクトル化し、コサイン類似度の
+上位 k 件を RelatedPost テーブルに保存する。ベクトルは NumPy 配列による
+CSR（記事→語）/ CSC（語→記事）形式で保持し、類似度はバッチ単位で
+転置インデックスを走査して計算する（N×N の密行列は作らない）。
+
+インデックスは各プロセスのメモリに保持し、公開・非公開のたびに変更フィード
+（PostChange）で変わった記事の行だけを差し替える（語彙・IDF は全体の構築時の値を
+使い、REBUILD_AFTER_CHANGES 件の差し替えごとに全体を構築し直す）。
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max, Min
+
+from .models import BlogPage, PostChange, RelatedPost
+from .rendering import extract_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 5
+DEFAULT_BATCH_SIZE = 64
+# 差分で差し替えた記事数がこれを超えたら全体を構築し直す（IDF を最新にする）
+REBUILD_AFTER_CHANGES = 1000
+# 一度の差分で取り込む変更イベントの上限（超えたら全体を構築し直す）
+MAX_DELTA_CHANGES = 500
+
+# タイトルは本文より重く扱う
+TITLE_WEIGHT = 3
+
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_LATIN_WORD_RE = re.compile(r"[a-z0-9]{2,}")
+
+
+def tokenize(text: str) -> list[str]:
+    """英数字は単語、日本語は文字 bigram に分割"""
+    text = text.lower()
+    tokens = _LATIN_WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def document_text(title: str, intro: str, body_html: str) -> str:
+    """ベクトル化対象のテキストを組み立てる"""
+    return " ".join([title] * TITLE_WEIGHT + [intro or "", extract_text(body_html)])
+
+
+class TfidfIndex:
+    """L2 正規化済み TF-IDF ベクトルの疎行列インデックス"""
+
+    def __init__(self, ids, csr, csc, vocabulary, idf, token=0, changes=0):
+        self.ids = ids
+        self.csr_indptr, self.csr_indices, self.csr_data = csr
+        self.csc_indptr, self.csc_indices, self.csc_data = csc
+        self.vocabulary = vocabulary
+        self.idf = idf
+        # 取り込み済みの PostChange ID と、全体の構築後に差し替えた記事数
+        self.token = token
+        self.changes = changes
+        self.row_of = {int(page_id): row for row, page_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_documents(
+        cls, ids: list[int], texts: list[str], token: int = 0
+    ) -> "TfidfIndex":
+        vocabulary: dict[str, int] = {}
+        doc_rows, term_cols, counts = [], [], []
+        for row, text in enumerate(texts):
+            term_counts: dict[int, int] = {}
+            for term in tokenize(text):
+                col = vocabulary.setdefault(term, len(vocabulary))
+                term_counts[col] = term_counts.get(col, 0) + 1
+            doc_rows.extend([row] * len(term_counts))
+            term_cols.extend(term_counts.keys())
+            counts.extend(term_counts.values())
+
+        n_docs, n_terms = len(texts), len(vocabulary)
+        rows = np.asarray(doc_rows, dtype=np.int64)
+        cols = np.asarray(term_cols, dtype=np.int64)
+        tf = np.asarray(counts, dtype=np.float32)
+
+        # サブリニア TF × スムージング付き IDF
+        df = np.bincount(cols, minlength=n_terms)
+        idf = np.log((1 + n_docs) / (1 + df)).astype(np.float32) + 1
+        weights = (1 + np.log(tf)) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=n_docs))
+        weights = (weights / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+
+        csr = cls._compress(rows, cols, weights, n_docs)
+        csc = cls._compress(cols, rows, weights, n_terms)
+        return cls(np.asarray(ids, dtype=np.int64), csr, csc, vocabulary, idf, token)
+
+    def replace_documents(
+        self, documents: dict[int, str | None], token: int | None = None
+    ) -> "TfidfIndex":
+        """指定した記事の行だけを差し替えた新しいインデックスを返す（None は削除）
+
+        他の記事のベクトルは計算し直さない。語彙・IDF は構築時の値を使い、
+        未知の語は出現 1 記事として扱う。
+        """
+        n_docs = len(self.ids)
+        rows = np.repeat(np.arange(n_docs), np.diff(self.csr_indptr))
+        keep = ~np.isin(self.ids, np.fromiter(documents, dtype=np.int64))
+        new_row = np.cumsum(keep) - 1
+        kept = keep[rows]
+
+        ids = [self.ids[keep]]
+        out_rows = [new_row[rows[kept]]]
+        out_cols = [self.csr_indices[kept]]
+        out_data = [self.csr_data[kept]]
+
+        vocabulary = dict(self.vocabulary)
+        idf = self.idf
+        next_row = int(keep.sum())
+        unseen_idf = np.float32(np.log((1 + n_docs) / 2) + 1)
+        for page_id, text in documents.items():
+            if text is None:
+                continue
+            term_counts = Counter(
+                vocabulary.setdefault(term, len(vocabulary)) for term in tokenize(text)
+            )
+            if len(vocabulary) > len(idf):
+                idf = np.concatenate(
+                    [idf, np.full(len(vocabulary) - len(idf), unseen_idf)]
+                )
+            cols = np.fromiter(term_counts.keys(), dtype=np.int64)
+            tf = np.fromiter(term_counts.values(), dtype=np.float32)
+            weights = (1 + np.log(tf)) * idf[cols]
+            weights /= max(float(np.sqrt((weights**2).sum())), 1e-12)
+
+            ids.append(np.asarray([page_id], dtype=np.int64))
+            out_rows.append(np.full(len(cols), next_row, dtype=np.int64))
+            out_cols.append(cols)
+            out_data.append(weights.astype(np.float32))
+            next_row += 1
+
+        rows = np.concatenate(out_rows)
+        cols = np.concatenate(out_cols)
+        data = np.concatenate(out_data)
+        return TfidfIndex(
+            np.concatenate(ids),
+            self._compress(rows, cols, data, next_row),
+            self._compress(cols, rows, data, len(vocabulary)),
+            vocabulary,
+            idf,
+            token=self.token if token is None else token,
+            changes=self.changes + len(documents),
+        )
+
+    @staticmethod
+    def _compress(major, minor, data, size):
+        """(major, minor, data) の三つ組を圧縮形式に変換"""
+        order = np.argsort(major, kind="stable")
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(major, minlength=size), out=indptr[1:])
+        return indptr, minor[order], data[order]
+
+    @staticmethod
+    def _expand_ranges(starts, lengths):
+        """可変長の範囲 [start, start + length) を連結したインデックス配列を作る"""
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + (np.arange(total) - offsets)
+
+    def similarities(self, rows) -> np.ndarray:
+        """指定した行と全記事のコサイン類似度（len(rows) × N）を計算"""
+        rows = np.asarray(rows, dtype=np.int64)
+        n_docs = len(self.ids)
+
+        # クエリ記事の語と重み
+        q_lengths = self.csr_indptr[rows + 1] - self.csr_indptr[rows]
+        q_pos = self._expand_ranges(self.csr_indptr[rows], q_lengths)
+        q_batch = np.repeat(np.arange(len(rows)), q_lengths)
+        q_terms = self.csr_indices[q_pos]
+        q_weights = self.csr_data[q_pos]
+
+        # 各語の転置リスト（語→記事）を展開して重みを加算
+        p_lengths = self.csc_indptr[q_terms + 1] - self.csc_indptr[q_terms]
+        p_pos = self._expand_ranges(self.csc_indptr[q_terms], p_lengths)
+        targets = np.repeat(q_batch * n_docs, p_lengths) + self.csc_indices[p_pos]
+        scores = np.repeat(q_weights, p_lengths) * self.csc_data[p_pos]
+
+        sims = np.bincount(targets, weights=scores, minlength=len(rows) * n_docs)
+        return sims.reshape(len(rows), n_docs)
+
+    def top_k(self, rows, k: int = DEFAULT_TOP_K) -> dict[int, list[tuple]]:
+        """指定した行の上位 k 件の関連記事を返す"""
+        rows = np.asarray(rows, dtype=np.int64)
+        sims = self.similarities(rows)
+        sims[np.arange(len(rows)), rows] = -1  # 自分自身を除外
+
+        k = min(k, len(self.ids) - 1)
+        results = {}
+        for i, row in enumerate(rows):
+            if k <= 0:
+                results[int(self.ids[row])] = []
+                continue
+            candidates = np.argpartition(-sims[i], k - 1)[:k]
+            candidates = candidates[np.argsort(-sims[i][candidates], kind="stable")]
+            results[int(self.ids[row])] = [
+                (int(self.ids[col]), float(sims[i][col]))
+                for col in candidates
+                if sims[i][col] > 0
+            ]
+        return results
+
+
+def build_index() -> TfidfIndex:
+    """公開中の全記事からインデックスを構築"""
+    # 構築中・未確定の変更は次回の差分で取り込む
+    token = PostChange.objects.settled_after(0).aggregate(token=Max("id"))["token"]
+    pages = list(
+        BlogPage.objects.live()
+        .public()
+        .order_by("id")
+        .values_list("id", "title", "intro", "body_html")
+    )
+    ids = [page[0] for page in pages]
+    texts = [document_text(title, intro, body) for _, title, intro, body in pages]
+    return TfidfIndex.from_documents(ids, texts, token=token or 0)
+
+
+# プロセス内で保持するインデックス（差分更新は 1 スレッドずつ）
+_index: TfidfIndex | None = None
+_index_lock = threading.RLock()
+
+
+def get_index(page_ids=()) -> TfidfIndex:
+    """保持しているインデックスに変更フィードと指定記事の現在の内容を反映して返す
+
+    指定記事は変更イベントの記録前（同じプロセスでの公開直後）でも読み直す。
+    """
+    global _index
+    with _index_lock:
+        if _index is None or _index.changes >= REBUILD_AFTER_CHANGES:
+            _index = build_index()
+        changes = list(
+            PostChange.objects.settled_after(_index.token).values_list("id", "page_id")[
+                : MAX_DELTA_CHANGES + 1
+            ]
+        )
+        if len(changes) > MAX_DELTA_CHANGES:
+            _index = build_index()
+            changes = []
+
+        changed = {page_id for _, page_id in changes} | set(page_ids)
+        if changed:
+            documents = dict.fromkeys(changed)
+            for page_id, title, intro, body in (
+                BlogPage.objects.live()
+                .public()
+                .filter(id__in=changed)
+                .values_list("id", "title", "intro", "body_html")
+            ):
+                documents[page_id] = document_text(title, intro, body)
+            token = changes[-1][0] if changes else _index.token
+            _index = _index.replace_documents(documents, token=token)
+        return _index
+
+
+def reset_index(index: TfidfIndex | None = None):
+    """保持しているインデックスを置き換える（None で次回に全体を構築）"""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def _save_related(results: dict[int, list[tuple]]):
+    """指定記事の関連記事行を置き換える"""
+    with transaction.atomic():
+        RelatedPost.objects.filter(page_id__in=results.keys()).delete()
+        RelatedPost.objects.bulk_create(
+            [
+                RelatedPost(
+                    page_id=page_id, related_id=related_id, rank=rank, score=score
+                )
+                for page_id, related in results.items()
+                for rank, (related_id, score) in enumerate(related)
+            ],
+            batch_size=1000,
+        )
+
+
+def compute_all_related(
+    k: int = DEFAULT_TOP_K, batch_size: int = DEFAULT_BATCH_SIZE, index=None
+) -> int:
+    """全記事の関連記事を再計算し、処理した記事数を返す"""
+    if index is None:
+        index = build_index()
+        reset_index(index)
+    rows = np.arange(len(index))
+    results = {}
+    for start in range(0, len(rows), batch_size):
+        results.update(index.top_k(rows[start : start + batch_size], k=k))
+
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        _save_related(results)
+    return len(results)
+
+
+def update_related_for(
+    page_id: int, k: int = DEFAULT_TOP_K, batch_size: int = DEFAULT_BATCH_SIZE
+) -> set[int]:
+    """公開・非公開になった記事に関係する記事の関連記事だけを再計算
+
+    再計算対象は、対象記事自身と、現在の上位 k 件に対象記事を含む記事、
+    および対象記事との類似度が現在の k 位のスコアを上回る記事。
+    """
+    # 全記事のベクトル化はせず、保持しているインデックスの行を差し替える
+    index = get_index([page_id])
+
+    # 現在の上位 k 件に対象記事を含む記事
+    affected = set(
+        RelatedPost.objects.filter(related_id=page_id).values_list("page_id", flat=True)
+    )
+
+    row = index.row_of.get(page_id)
+    if row is None:
+        # 非公開・削除された記事は自身の関連記事も不要
+        RelatedPost.objects.filter(page_id=page_id).delete()
+    else:
+        affected.add(page_id)
+        sims = index.similarities([row])[0]
+        candidates = {
+            int(index.ids[col]): sims[col] for col in np.flatnonzero(sims > 0)
+        }
+        # k 位のスコアは類似度が 0 より大きい記事の分だけ取得する
+        thresholds = {
+            item["page_id"]: (item["min_score"], item["n"])
+            for item in RelatedPost.objects.filter(page_id__in=candidates)
+            .values("page_id")
+            .annotate(min_score=Min("score"), n=Count("id"))
+        }
+        for other_id, score in candidates.items():
+            min_score, n = thresholds.get(other_id, (0.0, 0))
+            if n < k or score > min_score:
+                affected.add(other_id)
+
+    rows = np.asarray(
+        sorted(index.row_of[pid] for pid in affected if pid in index.row_of),
+        dtype=np.int64,
+    )
+    results = {}
+    for start in range(0, len(rows), batch_size):
+        results.update(index.top_k(rows[start : start + batch_size], k=k))
+    _save_related(results)
+    return affected
+
+
+# 公開処理のリクエストを待たせないためのバックグラウンド実行
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="related-posts")
+_pending: set[int] = set()
+_pending_lock = threading.Lock()
+
+
+def _run_update(page_id: int):
+    with _pending_lock:
+        _pending.discard(page_id)
+    try:
+        update_related_for(page_id)
+    except Exception as e:
+        logger.error(f"Related posts update failed for page {page_id}: {e!s}")
+    finally:
+        close_old_connections()
+
+
+def schedule_related_update(page_id: int):
+    """関連記事の差分再計算をバックグラウンドでキューに追加（重複は1回にまとめる）"""
+    with _pending_lock:
+        if page_id in _pending:
+            return
+        _pending.add(page_id)
+    _executor.submit(_run_update, page_id)
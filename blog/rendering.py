@@ -0,0 +1,78 @@
+"""BlogPage 本文の事前レンダリングユーティリティ
+
+リッチテキストの展開（ページ・ドキュメントリンクの解決を含む）は保存時に
+一度だけ行い、結果を BlogPage の非正規化カラムに保存する。
+"""
+
+import html
+import math
+import re
+
+from django.utils.html import strip_tags
+from wagtail.rich_text import RichText, expand_db_html
+
+# 保存時に再計算されるカラム
+RENDERED_FIELDS = ("body_html", "excerpt", "word_count", "reading_time")
+
+EXCERPT_LENGTH = 200
+
+# 日本語は1文字、英数字は1単語を1語として数える
+WORDS_PER_MINUTE = 400
+
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f"
+_WORD_RE = re.compile(rf"[{_CJK}]|[^\s{_CJK}]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def render_body(body) -> str:
+    """リッチテキストを表示用 HTML に展開（``richtext`` フィルターと同じ出力）"""
+    if not body:
+        return ""
+    if isinstance(body, RichText):
+        body = body.source
+    return expand_db_html(str(body))
+
+
+def extract_text(body_html: str) -> str:
+    """HTML からプレーンテキストを抽出"""
+    # ブロック要素の境界で単語が連結されないよう、タグを空白に置き換える
+    text = strip_tags(body_html.replace("<", " <"))
+    return _WHITESPACE_RE.sub(" ", html.unescape(text)).strip()
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """プレーンテキストから抜粋を作成"""
+    if len(text) <= length:
+        return text
+    return text[: length - 1].rstrip() + "…"
+
+
+def count_words(text: str) -> int:
+    """語数を数える（日本語は文字単位）"""
+    return len(_WORD_RE.findall(text))
+
+
+def estimate_reading_time(word_count: int) -> int:
+    """読了時間（分）を見積もる"""
+    if word_count <= 0:
+        return 0
+    return math.ceil(word_count / WORDS_PER_MINUTE)
+
+
+def compute_rendered_fields(body) -> dict:
+    """本文から非正規化カラムの値を計算"""
+    body_html = render_body(body)
+    text = extract_text(body_html)
+    word_count = count_words(text)
+
+    return {
+        "body_html": body_html,
+        "excerpt": make_excerpt(text),
+        "word_count": word_count,
+        "reading_time": estimate_reading_time(word_count),
+    }
+
+
+def render_batch(items: list[tuple[int, str]]) -> list[tuple[int, dict]]:
+    """(page_id, body) のバッチをレンダリング（プロセスプールのワーカー用）"""
+    return [(page_id, compute_rendered_fields(body)) for page_id, body in items]
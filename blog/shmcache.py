@@ -0,0 +1,350 @@
+"""同一ホストのワーカー間で共有するレスポンスキャッシュ
+
+uvicorn を複数ワーカーで動かすと、各プロセスがそれぞれ同じレスポンスを
+生成・保持することになる。ここでは名前付き共有メモリ（POSIX shm）上に
+エンコード済みのレスポンスをそのまま置き、全ワーカーから読めるようにする。
+
+メモリ配置::
+
+    [ヘッダー 64B][スロット表][データ領域（サイズクラスごとの固定長チャンク）]
+
+- 読み込みはロックを取らない。各スロットのシーケンス番号（seqlock）を
+  コピーの前後で比較し、書き込み中・上書き済みのデータは読み捨てる。
+  デシリアライズは行わず、共有メモリから bytes への1回のコピーのみ。
+- 書き込みはプロセス間ロック（flock）の下で行い、サイズクラス内で
+  最も長く使われていないスロット（LRU）を再利用する。
+- 無効化はヘッダーの世代番号を1つ進めるだけで、全エントリが即座に失効する。
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_CACHE = {
+    "ENABLED": False,
+    "NAME": "blog-response-cache",
+    # (チャンクサイズ, スロット数) のサイズクラス。合計約 40MB
+    "CLASSES": [(8 * 1024, 1024), (64 * 1024, 256), (512 * 1024, 32)],
+    "TTL": 30,
+    "PATHS": ["/api/posts/"],
+    # 監視・デバッグ用のエンドポイントは常に現在の状態を返す
+    "EXCLUDE": ["/api/posts/stats", "/api/posts/health", "/api/posts/debug"],
+}
+
+HEADER_SIZE = 64
+HEADER_LAYOUT = 0
+HEADER_GENERATION = 1
+
+# スロット表のレコード（NumPy は共有キャッシュを有効にしたプロセスでのみ読み込む）
+SLOT_FIELDS = [
+    ("seq", "<u8"),
+    ("hash", "<u8"),
+    ("generation", "<u8"),
+    ("expires", "<f8"),
+    ("last_used", "<f8"),
+    ("key_length", "<u4"),
+    ("length", "<u4"),
+]
+
+# 書き込みと競合した読み込みの再試行回数
+READ_RETRIES = 3
+
+
+def _hash_key(key: bytes) -> int:
+    """プロセス間で一致するキーのハッシュ（組み込みの hash() はプロセスごとに異なる）"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+def _align(size: int, alignment: int = 64) -> int:
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _open_shared_memory(name: str, size: int) -> SharedMemory:
+    """共有メモリを作成、または既存のものに接続する
+
+    最後に終了したワーカーが領域を削除しないよう、resource_tracker の管理から外す。
+    """
+    kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+    try:
+        shm = SharedMemory(name=name, create=True, size=size, **kwargs)
+    except FileExistsError:
+        for _ in range(50):
+            try:
+                shm = SharedMemory(name=name, **kwargs)
+            except ValueError:
+                # 作成側がサイズを確定する前（長さ 0）に接続した
+                time.sleep(0.01)
+                continue
+            if shm.size >= size:
+                break
+            shm.close()
+            time.sleep(0.01)
+        else:
+            raise RuntimeError(f"Shared cache {name!r} has an incompatible size")
+    if not kwargs:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedResponseCache:
+    """共有メモリ上のバイト列キャッシュ（キーは文字列）"""
+
+    def __init__(self, name: str, classes, ttl: float = DEFAULT_SHARED_CACHE["TTL"]):
+        import numpy as np
+
+        self.name = name
+        self.ttl = ttl
+        self.classes = [(int(size), int(count)) for size, count in classes]
+        self.hits = 0
+        self.misses = 0
+        self._thread_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = None
+        self._lock_pid = None
+
+        slot_dtype = np.dtype(SLOT_FIELDS)
+        slot_count = sum(count for _, count in self.classes)
+        table_size = _align(slot_count * slot_dtype.itemsize)
+        offsets, self._class_ranges = [], []
+        position = HEADER_SIZE + table_size
+        for size, count in self.classes:
+            start = len(offsets)
+            for _ in range(count):
+                offsets.append(position)
+                position += size
+            self._class_ranges.append((size, start, len(offsets)))
+        self.size = position
+        self._offsets = offsets
+        self._layout = _hash_key(repr(self.classes).encode())
+
+        self._shm = _open_shared_memory(name, self.size)
+        self._buf = self._shm.buf
+        self._header = np.ndarray((HEADER_SIZE // 8,), "<u8", self._buf, 0)
+        self._slots = np.ndarray((slot_count,), slot_dtype, self._buf, HEADER_SIZE)
+        # フィールドごとのビュー（共有メモリを直接参照する）
+        self._seq = self._slots["seq"]
+        self._hash = self._slots["hash"]
+        self._generation = self._slots["generation"]
+        self._expires = self._slots["expires"]
+        self._last_used = self._slots["last_used"]
+        self._key_length = self._slots["key_length"]
+        self._length = self._slots["length"]
+
+        layout = int(self._header[HEADER_LAYOUT])
+        if layout not in (0, self._layout):
+            self.close()
+            raise RuntimeError(f"Shared cache {name!r} was created with other classes")
+
+    @property
+    def max_size(self) -> int:
+        """格納できるキーと値の合計の最大バイト数"""
+        return self.classes[-1][0] if self.classes else 0
+
+    @property
+    def generation(self) -> int:
+        return int(self._header[HEADER_GENERATION])
+
+    @contextmanager
+    def _write_lock(self):
+        """プロセス間の書き込みロック（fork 後は別のロックファイル記述子を開き直す）"""
+        with self._thread_lock:
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(self._lock_path, "a+b")  # noqa: SIM115
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                if not self._header[HEADER_LAYOUT]:
+                    self._header[HEADER_LAYOUT] = self._layout
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> bytes | None:
+        """キャッシュされた値を取得（ロックなし）"""
+        import numpy as np
+
+        key_bytes = key.encode()
+        key_hash = _hash_key(key_bytes)
+        generation = self._header[HEADER_GENERATION]
+        now = time.monotonic()
+
+        for index in np.flatnonzero(self._hash == key_hash):
+            for _ in range(READ_RETRIES):
+                seq = int(self._seq[index])
+                if seq & 1:
+                    continue  # 書き込み中
+                if (
+                    self._hash[index] != key_hash
+                    or self._generation[index] != generation
+                    or self._expires[index] < now
+                ):
+                    break
+                start = self._offsets[index]
+                split = start + int(self._key_length[index])
+                stored_key = bytes(self._buf[start:split])
+                value = bytes(self._buf[split : start + int(self._length[index])])
+                if int(self._seq[index]) != seq:
+                    continue  # コピー中に上書きされた
+                if stored_key != key_bytes:
+                    break  # ハッシュの衝突
+                self._last_used[index] = now
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> bool:
+        """値を格納（大きすぎる値は格納せず False を返す）
+
+        ``generation`` には値の生成を始めた時点の世代番号を渡す。生成中に無効化された
+        場合、古い値は格納した時点で失効済みになる。
+        """
+        import numpy as np
+
+        key_bytes = key.encode()
+        length = len(key_bytes) + len(value)
+        size_class = next(
+            ((start, end) for size, start, end in self._class_ranges if size >= length),
+            None,
+        )
+        if size_class is None:
+            return False
+        start, end = size_class
+        key_hash = _hash_key(key_bytes)
+        now = time.monotonic()
+
+        with self._write_lock():
+            current = int(self._header[HEADER_GENERATION])
+            if generation is None:
+                generation = current
+            # 同じキーの既存エントリは（別のサイズクラスにあっても）置き換える
+            existing = np.flatnonzero(self._hash == key_hash)
+            same_class = existing[(existing >= start) & (existing < end)]
+            for index in existing:
+                if index not in same_class:
+                    self._update_slot(index, hash=0)
+
+            if len(same_class):
+                index = int(same_class[0])
+            else:
+                # 失効済みのスロットを優先し、なければ最も長く使われていないスロット
+                last_used = self._last_used[start:end].copy()
+                stale = (self._generation[start:end] != current) | (
+                    self._expires[start:end] < now
+                )
+                last_used[stale] = -1.0
+                index = start + int(np.argmin(last_used))
+
+            offset = self._offsets[index]
+            self._update_slot(
+                index,
+                hash=key_hash,
+                generation=generation,
+                expires=now + (self.ttl if ttl is None else ttl),
+                last_used=now,
+                key_length=len(key_bytes),
+                length=length,
+                data=(offset, key_bytes + value),
+            )
+        return True
+
+    def _update_slot(self, index, data=None, **fields):
+        """シーケンス番号を奇数にしてからスロットを書き換える（書き込みロック内で呼ぶ）"""
+        self._seq[index] += 1
+        for name, value in fields.items():
+            self._slots[name][index] = value
+        if data is not None:
+            offset, payload = data
+            self._buf[offset : offset + len(payload)] = payload
+        self._seq[index] += 1
+
+    def invalidate(self):
+        """世代番号を進めて全エントリを失効させる"""
+        with self._write_lock():
+            self._header[HEADER_GENERATION] += 1
+        logger.debug(f"Shared cache invalidated: generation {self.generation}")
+
+    def close(self, unlink: bool = False):
+        """共有メモリを切り離す（``unlink=True`` で領域自体を削除）"""
+        # NumPy のビューが残っていると mmap を閉じられない
+        self._header = self._slots = None
+        self._seq = self._hash = self._generation = None
+        self._expires = self._last_used = self._key_length = self._length = None
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            if sys.version_info < (3, 13):
+                # unlink() が登録解除するため、一度登録し直す
+                resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+_shared_cache: SharedResponseCache | None = None
+_shared_cache_failed = False
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache_settings() -> dict:
+    """設定 BLOG_SHARED_CACHE を既定値とマージ"""
+    return {**DEFAULT_SHARED_CACHE, **getattr(settings, "BLOG_SHARED_CACHE", {})}
+
+
+def get_shared_cache() -> SharedResponseCache | None:
+    """共有レスポンスキャッシュ（無効・接続できない場合は None）"""
+    global _shared_cache, _shared_cache_failed
+    options = get_shared_cache_settings()
+    if not options["ENABLED"] or _shared_cache_failed:
+        return None
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None and not _shared_cache_failed:
+                try:
+                    _shared_cache = SharedResponseCache(
+                        options["NAME"], options["CLASSES"], ttl=options["TTL"]
+                    )
+                except Exception as e:
+                    # 接続に失敗した場合はキャッシュなしで動作を続ける
+                    _shared_cache_failed = True
+                    logger.error(f"Shared cache unavailable: {e!s}")
+    return _shared_cache
+
+
+def reset_shared_cache(unlink: bool = False):
+    """共有メモリから切り離す（設定変更後に接続し直す）"""
+    global _shared_cache, _shared_cache_failed
+    with _shared_cache_lock:
+        if _shared_cache is not None:
+            _shared_cache.close(unlink=unlink)
+        _shared_cache = None
+        _shared_cache_failed = False
+
+
+def invalidate_shared_cache():
+    """有効な場合のみ共有レスポンスキャッシュを無効化"""
+    if not get_shared_cache_settings()["ENABLED"]:
+        return
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.invalidate()
@@ -0,0 +1,153 @@
+"""BlogPage の公開・非公開・移動・削除シグナルハンドラー"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from wagtail.models import Page
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from .cache import invalidate_posts
+from .dbrouter import stick_to_primary
+from .facets import remove_post_facets, sync_post_facets
+from .models import BlogIndexPage, BlogPage, PostChange
+from .navigation import update_links_to, update_post_navigation
+from .purge import POST_LIST_KEY, blog_index_key, post_key, purge_keys
+from .shmcache import invalidate_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_related_posts(page_id: int):
+    """コミット後に関連記事の差分再計算をバックグラウンドで実行"""
+    if not getattr(settings, "RELATED_POSTS_AUTO_UPDATE", True):
+        return
+
+    def _schedule():
+        # NumPy の読み込みは最初の公開時まで遅延させる
+        from .related import schedule_related_update
+
+        schedule_related_update(page_id)
+
+    transaction.on_commit(_schedule)
+
+
+def get_parent_id(page) -> int | None:
+    """親ページの ID（削除処理中でも参照できるよう path から引く）"""
+    return (
+        Page.objects.filter(path=page.path[: -Page.steplen])
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def invalidate_posts_on_commit(page_ids, parent_ids=()):
+    """コミット後に記事の詳細キャッシュ・共有レスポンスキャッシュ・CDN のキャッシュを破棄
+
+    コミット前に破棄すると、更新前の値が再びキャッシュされる可能性がある。
+    リードレプリカを使う場合は、しばらく読み取りをプライマリへ送る。
+    """
+    page_ids = set(page_ids)
+    keys = {POST_LIST_KEY, *(post_key(page_id) for page_id in page_ids)}
+    keys.update(blog_index_key(parent_id) for parent_id in parent_ids if parent_id)
+
+    def _invalidate():
+        # レプリカに反映されるまでは、パージ後の再取得も含めてプライマリから読む
+        stick_to_primary()
+        invalidate_posts(page_ids)
+        invalidate_shared_cache()
+        purge_keys(keys)
+
+    transaction.on_commit(_invalidate)
+
+
+def record_change(page_id: int, action: str) -> PostChange:
+    """変更ログにイベントを1件追加"""
+    change = PostChange.objects.create(page_id=page_id, action=action)
+    logger.debug(f"Post change recorded: {change}")
+    return change
+
+
+@receiver(page_published, sender=BlogPage)
+def on_blog_page_published(sender, instance, **kwargs):
+    record_change(instance.id, PostChange.ACTION_UPSERT)
+    sync_post_facets(instance)
+    # 前後リンクが変わった記事もキャッシュを破棄
+    invalidate_posts_on_commit(
+        update_post_navigation(instance), [get_parent_id(instance)]
+    )
+    schedule_related_posts(instance.id)
+
+
+@receiver(page_unpublished, sender=BlogPage)
+def on_blog_page_unpublished(sender, instance, **kwargs):
+    record_change(instance.id, PostChange.ACTION_DELETE)
+    remove_post_facets(instance.id)
+    # 前後リンクが変わった記事もキャッシュを破棄
+    invalidate_posts_on_commit(
+        update_post_navigation(instance), [get_parent_id(instance)]
+    )
+    schedule_related_posts(instance.id)
+
+
+@receiver(post_page_move, sender=BlogPage)
+def on_blog_page_moved(
+    sender, instance, parent_page_before, parent_page_after, **kwargs
+):
+    # URL やツリー上の位置が変わるため upsert として通知
+    if instance.live:
+        record_change(instance.id, PostChange.ACTION_UPSERT)
+        # 前後の記事が持つリンクの URL を更新し、移動前後の一覧ページも破棄
+        invalidate_posts_on_commit(
+            update_post_navigation(instance),
+            [parent_page_before.id, parent_page_after.id],
+        )
+
+
+def refresh_blog_index_posts(index_page: BlogIndexPage):
+    """BlogIndexPage の URL が変わったとき、配下の記事の URL を含むデータを更新"""
+    post_ids = list(
+        BlogPage.objects.live().descendant_of(index_page).values_list("id", flat=True)
+    )
+    if not post_ids:
+        return
+    with transaction.atomic():
+        # 記事の URL が変わるため upsert として通知
+        PostChange.objects.bulk_create(
+            [
+                PostChange(page_id=page_id, action=PostChange.ACTION_UPSERT)
+                for page_id in post_ids
+            ]
+        )
+        # 配下の記事と、それらへのリンクを持つ前後の記事のリンクを更新
+        invalidate_posts_on_commit(update_links_to(post_ids), [index_page.id])
+
+
+@receiver(page_slug_changed, sender=BlogIndexPage)
+def on_blog_index_slug_changed(sender, instance, **kwargs):
+    # Wagtail がコミット後に送るため、子孫の url_path は更新済み
+    refresh_blog_index_posts(instance)
+
+
+@receiver(post_page_move, sender=BlogIndexPage)
+def on_blog_index_moved(sender, instance, url_path_before, url_path_after, **kwargs):
+    if url_path_before != url_path_after:
+        refresh_blog_index_posts(instance)
+
+
+@receiver(post_delete, sender=BlogPage)
+def on_blog_page_deleted(sender, instance, **kwargs):
+    record_change(instance.id, PostChange.ACTION_DELETE)
+    remove_post_facets(instance.id)
+    # 前後リンクが変わった記事もキャッシュを破棄
+    invalidate_posts_on_commit(
+        update_post_navigation(instance), [get_parent_id(instance)]
+    )
+    schedule_related_posts(instance.id)
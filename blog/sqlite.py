@@ -0,0 +1,87 @@
+"""
+単一ノード構成向けの SQLite の接続設定（PRAGMA）
+
+接続の作成時（connection_created シグナル）に WAL モードなどの PRAGMA を設定する。
+WAL モードでは読み取りと書き込みが互いを待たないため、管理画面で記事を公開している
+間もページ表示や API の読み取りが止まらない。
+
+WAL のファイルはチェックポイントで本体へ書き戻される。SQLite も自動で行うが、
+読み取りが続くと書き戻しきれずに大きくなるため、manage.py sqlite_checkpoint を
+定期的に実行する。
+"""
+
+import logging
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PROFILE = {
+    "ENABLED": True,
+    "JOURNAL_MODE": "WAL",
+    # WAL では NORMAL でもデータベースは壊れない（電源断時に直前のコミットが失われうる）
+    "SYNCHRONOUS": "NORMAL",
+    "MMAP_SIZE": 256 * 1024 * 1024,
+    # 負の値は KiB 単位（64 MiB）
+    "CACHE_SIZE": -64 * 1024,
+    "TEMP_STORE": "MEMORY",
+    # ロック解除を待つ最大ミリ秒
+    "BUSY_TIMEOUT": 20_000,
+}
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def get_sqlite_profile_settings() -> dict:
+    """設定 BLOG_SQLITE_PROFILE を既定値とマージ"""
+    return {**DEFAULT_SQLITE_PROFILE, **getattr(settings, "BLOG_SQLITE_PROFILE", {})}
+
+
+def profile_pragmas(profile: dict) -> list[str]:
+    """設定から実行する PRAGMA 文を組み立てる"""
+    pragmas = [
+        ("journal_mode", profile["JOURNAL_MODE"]),
+        ("synchronous", profile["SYNCHRONOUS"]),
+        ("mmap_size", profile["MMAP_SIZE"]),
+        ("cache_size", profile["CACHE_SIZE"]),
+        ("temp_store", profile["TEMP_STORE"]),
+        ("busy_timeout", profile["BUSY_TIMEOUT"]),
+    ]
+    return [f"PRAGMA {name}={value}" for name, value in pragmas if value is not None]
+
+
+def apply_sqlite_profile(connection, profile: dict | None = None) -> bool:
+    """SQLite の接続に PRAGMA を設定する（対象外の接続では何もしない）"""
+    if connection.vendor != "sqlite":
+        return False
+    profile = profile or get_sqlite_profile_settings()
+    if not profile["ENABLED"]:
+        return False
+    if connection.is_in_memory_db():
+        # テスト用のインメモリ DB では journal_mode=WAL が使えないため対象外
+        return False
+    with connection.cursor() as cursor:
+        for pragma in profile_pragmas(profile):
+            cursor.execute(pragma)
+    return True
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    try:
+        apply_sqlite_profile(connection)
+    except Exception as e:
+        logger.warning(f"Failed to apply SQLite profile to {connection.alias}: {e!s}")
+
+
+def checkpoint(connection, mode: str = "PASSIVE") -> dict:
+    """WAL のチェックポイントを実行し、結果（busy・WAL のページ数・書き戻したページ数）を返す"""
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+        busy, log_frames, checkpointed = cursor.fetchone()
+    return {"busy": bool(busy), "log": log_frames, "checkpointed": checkpointed}
@@ -0,0 +1,214 @@
+"""デプロイ・再起動直後のキャッシュウォームアップ
+
+記事一覧の先頭ページ、閲覧数上位の記事詳細、BlogIndexPage、件数系エンドポイントに
+リクエストを送り、各種キャッシュ（記事詳細キャッシュ・リードモデル・テンプレートや
+サイトルートのキャッシュ）を事前に温める。同時実行数と所要時間の上限は設定で変更できる。
+
+ASGI アプリケーションを直接呼び出す場合に温まるのは、呼び出したプロセスのキャッシュと
+プロセス間で共有するキャッシュ（Redis など）だけ。稼働中のサーバーのワーカーを温めるには
+URL を指定して HTTP でリクエストを送る。
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from .models import BlogIndexPage, BlogPage, PostViewCount
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP = {
+    "ON_STARTUP": False,
+    "LIST_PAGES": 5,
+    "PAGE_SIZE": 20,
+    "TOP_POSTS": 20,
+    "CONCURRENCY": 4,
+    "BUDGET_SECONDS": 30.0,
+    "HOST": "localhost",
+    # 稼働中のサーバーのベース URL（例: "http://127.0.0.1:8000"）。None は ASGI を直接呼ぶ
+    "URL": None,
+}
+
+# 件数・ファセットを返すエンドポイント
+COUNT_PATHS = ("/api/posts/health", "/api/posts/archive", "/api/posts/tags")
+
+
+def get_warmup_settings(**overrides) -> dict:
+    """設定 BLOG_CACHE_WARMUP を既定値とマージ（None の上書きは無視）"""
+    options = {**DEFAULT_WARMUP, **getattr(settings, "BLOG_CACHE_WARMUP", {})}
+    options.update(
+        {key: value for key, value in overrides.items() if value is not None}
+    )
+    return options
+
+
+@dataclass
+class WarmupReport:
+    """ウォームアップの結果"""
+
+    requested: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    failures: list = field(default_factory=list)
+
+
+def get_top_post_ids(limit: int) -> list[int]:
+    """累計閲覧数の多い公開記事（閲覧データが足りない分は新しい記事で補う）"""
+    published = BlogPage.objects.live().public()
+    page_ids = list(
+        PostViewCount.objects.filter(page_id__in=published.values("id"))
+        .order_by("-views", "page_id")
+        .values_list("page_id", flat=True)[:limit]
+    )
+    if len(page_ids) < limit:
+        page_ids += list(
+            published.exclude(id__in=page_ids)
+            .order_by("-date", "-first_published_at")
+            .values_list("id", flat=True)[: limit - len(page_ids)]
+        )
+    return page_ids
+
+
+def build_warmup_paths(list_pages: int, page_size: int, top_posts: int) -> list[str]:
+    """ウォームアップ対象のパスを優先度順に組み立てる"""
+    paths = [*COUNT_PATHS]
+    paths += [
+        f"/api/posts/?limit={page_size}&offset={page * page_size}"
+        for page in range(list_pages)
+    ]
+    for index_page in BlogIndexPage.objects.live().public().only("id", "url_path"):
+        url = index_page.get_url()
+        if url:
+            paths.append(urlsplit(url).path)
+    paths += [f"/api/posts/{page_id}" for page_id in get_top_post_ids(top_posts)]
+    return paths
+
+
+async def asgi_get(app, path: str, host: str) -> int:
+    """ASGI アプリケーションに GET リクエストを送り、ステータスコードを返す"""
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", host.encode()), (b"user-agent", b"cache-warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": (host, 80),
+    }
+    status = 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # レスポンス送信後に切断を通知
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def http_get(client, path: str) -> int:
+    """稼働中のサーバーに GET リクエストを送り、ステータスコードを返す"""
+    response = await client.get(path)
+    return response.status_code
+
+
+async def warm_caches(
+    app,
+    paths: list[str],
+    concurrency: int = DEFAULT_WARMUP["CONCURRENCY"],
+    budget_seconds: float = DEFAULT_WARMUP["BUDGET_SECONDS"],
+    host: str | None = DEFAULT_WARMUP["HOST"],
+    progress: Callable | None = None,
+    url: str | None = None,
+) -> WarmupReport:
+    """同時実行数と時間の上限内でパスを順にリクエストする
+
+    ``url`` を指定すると ``app`` の代わりに、そのサーバーへ HTTP でリクエストを送る
+    （``host`` が None なら Host ヘッダーは URL から決まる）。
+    時間切れになった時点で未処理のパスはスキップし、実行中のリクエストは中断する。
+    """
+    client = None
+    if url is not None:
+        import httpx
+
+        headers = {"user-agent": "cache-warmup"}
+        if host:
+            headers["host"] = host
+        client = httpx.AsyncClient(
+            base_url=url, headers=headers, timeout=budget_seconds
+        )
+    report = WarmupReport(requested=len(paths))
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    started = time.monotonic()
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            request_start = time.monotonic()
+            try:
+                if client is not None:
+                    status = await http_get(client, path)
+                else:
+                    status = await asgi_get(app, path, host)
+            except Exception as e:
+                status = 0
+                logger.warning(f"Cache warmup failed for {path}: {e!s}")
+            if 200 <= status < 400:
+                report.succeeded += 1
+            else:
+                report.failed += 1
+                report.failures.append((path, status))
+            if progress is not None:
+                progress(
+                    done=report.succeeded + report.failed,
+                    total=report.requested,
+                    path=path,
+                    status=status,
+                    elapsed=time.monotonic() - request_start,
+                )
+
+    workers = [
+        asyncio.create_task(worker())
+        for _ in range(max(1, min(concurrency, len(paths))))
+    ]
+    try:
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=budget_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        if client is not None:
+            await client.aclose()
+
+    report.skipped = report.requested - report.succeeded - report.failed
+    report.elapsed = time.monotonic() - started
+    logger.info(
+        f"Cache warmup finished: {report.succeeded}/{report.requested} ok, "
+        f"{report.failed} failed, {report.skipped} skipped in {report.elapsed:.2f}s"
+    )
+    return report
@@ -0,0 +1,278 @@
+"""
+Stripe Webhook イベントの受信箱（inbox）とバックグラウンド処理
+
+Webhook のエンドポイントは署名を検証したイベントを StripeEvent に保存して
+すぐに 200 を返す（同じイベント ID の再送は一意制約で除かれる）。購入記録の保存や
+メール送信などの処理はワーカーのスレッドがまとめて行うため、処理が遅くても
+Stripe の再送が積み重ならない。
+
+ワーカーは処理待ちのイベントを BATCH_SIZE 件ずつ取り出し、イベントの種類ごとの
+ハンドラー（register_handler で登録）を呼ぶ。失敗したイベントは指数バックオフで
+再試行し、MAX_ATTEMPTS 回失敗すると failed になる。取り出しは条件付きの UPDATE で
+行うため、複数のスレッド・プロセス（manage.py process_stripe_events）で動かしても
+同じイベントを二重に処理しない。
+"""
+
+import logging
+import random
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .entitlements import record_purchase
+from .mail import queue_mail
+from .models import BlogPage, StripeEvent
+from .workers import BatchWorkerPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEBHOOK_INBOX = {
+    "WORKERS": 2,
+    "BATCH_SIZE": 100,
+    # 処理待ちがないときの確認間隔（秒）。0 以下で自動起動しない
+    "POLL_INTERVAL": 1.0,
+    "MAX_ATTEMPTS": 8,
+    # 再試行の間隔（秒）: BACKOFF_BASE * 2 ** (試行回数 - 1)、BACKOFF_MAX まで
+    "BACKOFF_BASE": 2.0,
+    "BACKOFF_MAX": 600.0,
+    # この時間を過ぎても処理中のイベントは、ワーカーが停止したものとして取り直す
+    "CLAIM_TIMEOUT": 300.0,
+    # 処理済みのイベントを残す日数（Stripe の再送期間より長くする）
+    "RETENTION_DAYS": 30,
+}
+
+# 再利用する Checkout セッションのキャッシュキー（fastapi_app/app/utils/checkout.py）
+CHECKOUT_CACHE_KEY_PREFIX = "payments:checkout:"
+
+# イベントの種類 -> ハンドラー
+HANDLERS: dict[str, Callable[[dict], None]] = {}
+
+
+def get_webhook_inbox_settings() -> dict:
+    """設定 STRIPE_WEBHOOK_INBOX を既定値とマージ"""
+    return {**DEFAULT_WEBHOOK_INBOX, **getattr(settings, "STRIPE_WEBHOOK_INBOX", {})}
+
+
+def register_handler(event_type: str):
+    """イベントの種類のハンドラーを登録するデコレーター（ハンドラーは冪等にする）"""
+
+    def decorator(func):
+        HANDLERS[event_type] = func
+        return func
+
+    return decorator
+
+
+def store_event(event: dict) -> bool:
+    """検証済みのイベントを保存し、新しいイベントか（重複でないか）を返す"""
+    # stripe.Event は dict のサブクラスなので、そのまま JSON として保存できる
+    try:
+        _, created = StripeEvent.objects.get_or_create(
+            event_id=event["id"],
+            defaults={"event_type": event["type"], "payload": event},
+        )
+    except IntegrityError:
+        # 同時に届いた再送が先に保存された
+        return False
+    return created
+
+
+def backoff_seconds(attempts: int, options: dict | None = None) -> float:
+    """attempts 回目の失敗後、次の試行までの秒数（同時の再試行が重ならないよう揺らす）"""
+    options = options or get_webhook_inbox_settings()
+    delay = min(
+        options["BACKOFF_BASE"] * 2 ** max(attempts - 1, 0), options["BACKOFF_MAX"]
+    )
+    return delay * random.uniform(0.8, 1.0)
+
+
+def claim_events(
+    limit: int, now: datetime | None = None, options: dict | None = None
+) -> list[StripeEvent]:
+    """処理待ちのイベントを取り出し、このワーカーの処理中にする"""
+    options = options or get_webhook_inbox_settings()
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=options["CLAIM_TIMEOUT"])
+    due = Q(status=StripeEvent.STATUS_PENDING, next_attempt_at__lte=now) | Q(
+        status=StripeEvent.STATUS_PROCESSING, claimed_at__lt=stale
+    )
+    ids = list(StripeEvent.objects.filter(due).values_list("id", flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # 他のワーカーが先に取り出したイベントは条件に合わず更新されない
+    StripeEvent.objects.filter(due, id__in=ids).update(
+        status=StripeEvent.STATUS_PROCESSING, claimed_by=token, claimed_at=now
+    )
+    return list(
+        StripeEvent.objects.filter(
+            claimed_by=token, status=StripeEvent.STATUS_PROCESSING
+        )
+    )
+
+
+def _fail(event: StripeEvent, error: Exception, now: datetime, options: dict):
+    attempts = event.attempts + 1
+    if attempts >= options["MAX_ATTEMPTS"]:
+        status, next_attempt_at = StripeEvent.STATUS_FAILED, now
+        logger.error(
+            f"Stripe event {event.event_id} failed after {attempts} attempts: {error!s}"
+        )
+    else:
+        status = StripeEvent.STATUS_PENDING
+        next_attempt_at = now + timedelta(seconds=backoff_seconds(attempts, options))
+        logger.warning(
+            f"Stripe event {event.event_id} failed (attempt {attempts}), "
+            f"retrying at {next_attempt_at:%H:%M:%S}: {error!s}"
+        )
+    StripeEvent.objects.filter(id=event.id, claimed_by=event.claimed_by).update(
+        status=status,
+        attempts=F("attempts") + 1,
+        next_attempt_at=next_attempt_at,
+        last_error=str(error)[:2000],
+        claimed_by="",
+        claimed_at=None,
+    )
+
+
+def process_batch(
+    limit: int | None = None, now: datetime | None = None
+) -> tuple[int, int]:
+    """処理待ちのイベントを 1 バッチ処理し、（成功数, 失敗数）を返す"""
+    options = get_webhook_inbox_settings()
+    now = now or timezone.now()
+    events = claim_events(limit or options["BATCH_SIZE"], now, options)
+    done = failed = 0
+    for event in events:
+        handler = HANDLERS.get(event.event_type)
+        try:
+            # ハンドラーの書き込みと完了の記録を同じトランザクションで確定させる
+            with transaction.atomic():
+                if handler is not None:
+                    handler(event.payload)
+                StripeEvent.objects.filter(id=event.id).update(
+                    status=StripeEvent.STATUS_DONE,
+                    attempts=F("attempts") + 1,
+                    processed_at=timezone.now(),
+                    claimed_by="",
+                    claimed_at=None,
+                    last_error="",
+                )
+        except Exception as e:
+            _fail(event, e, now, options)
+            failed += 1
+        else:
+            done += 1
+    return done, failed
+
+
+def process_pending(now: datetime | None = None) -> tuple[int, int]:
+    """処理待ちがなくなるまでバッチ処理を繰り返す（テスト・管理コマンド用）"""
+    total_done = total_failed = 0
+    while True:
+        done, failed = process_batch(now=now)
+        if not done and not failed:
+            return total_done, total_failed
+        total_done += done
+        total_failed += failed
+
+
+def prune_events(now: datetime | None = None) -> int:
+    """保存期間を過ぎた処理済みのイベントを削除"""
+    days = get_webhook_inbox_settings()["RETENTION_DAYS"]
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = StripeEvent.objects.filter(
+        status=StripeEvent.STATUS_DONE, processed_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+class WebhookWorkerPool(BatchWorkerPool):
+    """受信箱のイベントを処理するワーカースレッドのプール"""
+
+    thread_name = "stripe-webhook-worker"
+
+    def get_settings(self) -> dict:
+        return get_webhook_inbox_settings()
+
+    def process_batch(self) -> tuple[int, int]:
+        return process_batch()
+
+
+worker_pool = WebhookWorkerPool()
+
+
+def enqueue_event(event: dict) -> bool:
+    """イベントを受信箱に保存してワーカーを起こす。新しいイベントか（重複でないか）を返す"""
+    created = store_event(event)
+    if created:
+        worker_pool.wake()
+    return created
+
+
+@register_handler("checkout.session.completed")
+@register_handler("checkout.session.async_payment_succeeded")
+def handle_checkout_completed(event: dict):
+    session = event["data"]["object"]
+    metadata = session.get("metadata") or {}
+    logger.info(
+        f"購入完了: 記事ID {metadata.get('article_id')}, セッションID {session['id']}"
+    )
+    # 支払い済みのセッションは再利用しない
+    _forget_checkout_session(metadata.get("checkout_key"))
+    # 後払いの支払い方法は async_payment_succeeded で確定する
+    if session.get("payment_status") == "unpaid":
+        return
+    buyer_id, article_id = metadata.get("buyer_id"), metadata.get("article_id")
+    if not buyer_id or not str(article_id or "").isdigit():
+        logger.warning(f"購入者・記事が不明なセッション: {session['id']}")
+        return
+    created = record_purchase(
+        buyer_id,
+        int(article_id),
+        session["id"],
+        amount=session.get("amount_total") or 0,
+        currency=session.get("currency") or "jpy",
+    )
+    email = (session.get("customer_details") or {}).get("email")
+    if created and email:
+        # 購入の記録と同じトランザクションで送信キューに保存する
+        _queue_purchase_mail(email, int(article_id), session.get("amount_total"))
+
+
+def _queue_purchase_mail(email: str, article_id: int, amount: int | None):
+    title = (
+        BlogPage.objects.filter(id=article_id).values_list("title", flat=True).first()
+    )
+    lines = ["ご購入ありがとうございます。", ""]
+    if title:
+        lines.append(f"記事: {title}")
+    if amount:
+        lines.append(f"金額: {amount:,}円")
+    queue_mail("【購入完了】ご購入ありがとうございます", "\n".join(lines), [email])
+
+
+@register_handler("checkout.session.expired")
+def handle_checkout_expired(event: dict):
+    session = event["data"]["object"]
+    _forget_checkout_session((session.get("metadata") or {}).get("checkout_key"))
+
+
+@register_handler("payment_intent.succeeded")
+def handle_payment_intent_succeeded(event: dict):
+    payment_intent = event["data"]["object"]
+    article_id = (payment_intent.get("metadata") or {}).get("article_id")
+    logger.info(
+        f"決済成功: 記事ID {article_id}, Payment Intent ID {payment_intent['id']}"
+    )
+
+
+def _forget_checkout_session(key: str | None):
+    if key:
+        cache.delete(f"{CHECKOUT_CACHE_KEY_PREFIX}{key}")
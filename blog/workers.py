@@ -0,0 +1,111 @@
+"""
+DB のキューをバッチで処理するワーカースレッドのプール
+
+Stripe Webhook の受信箱（blog/webhooks.py）とメールの送信キュー（blog/mail.py）で
+共通の実装。サブクラスで設定と 1 バッチの処理を定義する。
+"""
+
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorkerPool(ABC):
+    """処理待ちがある間はバッチ処理を続け、なければ POLL_INTERVAL ごとに確認する
+
+    バッチの処理が例外で失敗し続ける間（DB に接続できないなど）は、確認の間隔を
+    ERROR_BACKOFF_MAX 秒まで倍々に延ばす。
+    """
+
+    thread_name = "batch-worker"
+    ERROR_BACKOFF_MAX = 60.0
+
+    def __init__(self):
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    @abstractmethod
+    def get_settings(self) -> dict:
+        """WORKERS・POLL_INTERVAL を含む設定"""
+
+    @abstractmethod
+    def process_batch(self) -> tuple[int, int]:
+        """1 バッチを処理し、（成功数, 失敗数）を返す"""
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, workers: int | None = None):
+        """ワーカースレッドを起動"""
+        with self._lock:
+            if self.running:
+                return
+            self._stopped.clear()
+            count = workers or self.get_settings()["WORKERS"]
+            self._threads = [
+                threading.Thread(
+                    target=self._run, name=f"{self.thread_name}-{n}", daemon=True
+                )
+                for n in range(count)
+            ]
+            for thread in self._threads:
+                thread.start()
+        atexit.register(self.stop)
+
+    def wake(self):
+        """新しい行を保存したときに呼ぶ（必要ならワーカーを起動）"""
+        if not self.running and self.get_settings()["POLL_INTERVAL"] > 0:
+            self.start()
+        self._wakeup.set()
+
+    def join(self):
+        """ワーカースレッドの終了を待つ"""
+        for thread in list(self._threads):
+            thread.join()
+
+    def stop(self, timeout: float = 5.0):
+        """処理中のバッチが終わるのを待ってスレッドを止める"""
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def poll_interval(self) -> float:
+        return max(self.get_settings()["POLL_INTERVAL"], 0.1)
+
+    def error_delay(self, errors: int) -> float:
+        """連続 errors 回失敗した後、次に処理を試みるまでの秒数"""
+        return min(self.poll_interval() * 2 ** (errors - 1), self.ERROR_BACKOFF_MAX)
+
+    def _run(self):
+        errors = 0
+        while not self._stopped.is_set():
+            try:
+                done, failed = self.process_batch()
+            except Exception as e:
+                errors += 1
+                delay = self.error_delay(errors)
+                logger.error(
+                    f"{self.thread_name} failed ({errors} in a row), "
+                    f"retrying in {delay:.1f}s: {e!s}"
+                )
+                # 新しい行の通知では起こさず、停止の指示だけを待つ
+                self._stopped.wait(delay)
+                continue
+            finally:
+                close_old_connections()
+            errors = 0
+            if done or failed:
+                # 処理待ちが残っている可能性があるため、すぐに次のバッチへ
+                continue
+            self._wakeup.wait(self.poll_interval())
+            self._wakeup.clear()
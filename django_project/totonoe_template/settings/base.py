@@ -102,8 +102,20 @@ WSGI_APPLICATION = (
 # }
 
 # Database connection pool settings (for production)
+# プールは常に POOL_SIZE 本を保持し、混雑時は MAX_OVERFLOW 本まで追加で接続する
 DATABASE_CONNECTION_POOL_SIZE = 10
 DATABASE_CONNECTION_MAX_OVERFLOW = 5
+# 接続の空きを待つ最大秒数（超えた要求はタイムアウトとして集計）
+DATABASE_CONNECTION_POOL_TIMEOUT = 10
+# 使われていない追加分の接続を閉じるまでの秒数と、接続を作り直すまでの秒数
+DATABASE_CONNECTION_POOL_MAX_IDLE = 300
+DATABASE_CONNECTION_POOL_MAX_LIFETIME = 1800
+
+# リードレプリカ（DATABASES のエイリアス）。記事 API と匿名ユーザーのページ表示の
+# 読み取りに使う（DATABASE_ROUTERS に blog.dbrouter.ReplicaRouter が必要）
+DATABASE_REPLICAS = []
+# 記事の公開・更新後、全ての読み取りをプライマリへ送る秒数（レプリケーション遅延対策）
+DATABASE_REPLICA_STICKY_SECONDS = 5
 
 # Database optimization settings
 DATABASE_CONN_MAX_AGE = 60  # Connection pooling
@@ -112,6 +124,11 @@ DATABASE_OPTIONS = {
     "isolation_level": None,  # SQLite autocommit mode
 }
 
+# SQLite の接続ごとの PRAGMA（単一ノード構成向け、インメモリ DB は対象外）
+# 既定値（WAL・synchronous=NORMAL など）は blog/sqlite.py の DEFAULT_SQLITE_PROFILE。
+# 変更するキーだけを指定する（例: {"SYNCHRONOUS": "FULL"}）
+BLOG_SQLITE_PROFILE = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -162,3 +179,65 @@ WAGTAIL_SITE_NAME = "totonoe_template"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Blog settings
+# 記事の公開・非公開時に関連記事をバックグラウンドで差分再計算する
+RELATED_POSTS_AUTO_UPDATE = True
+
+# 閲覧数をメモリ上で集計して DB に書き出す間隔（秒）。0 以下で自動書き出しなし
+BLOG_VIEW_FLUSH_INTERVAL = 10
+
+# 記事一覧・絞り込みをプロセス内の列指向リードモデルで処理する（NumPy が必要）
+BLOG_READ_MODEL_ENABLED = False
+# 変更フィードをポーリングしてリードモデルに差分を取り込む間隔（秒）
+BLOG_READ_MODEL_REFRESH_INTERVAL = 1.0
+# 記事詳細キャッシュの有効期間（秒）。記事の更新時はシグナルで無効化される
+BLOG_POST_CACHE_TIMEOUT = 60 * 60
+# 購入者ごとの購入済み記事 ID のキャッシュ期間（秒）。新しい購入の記録時に無効化される
+BLOG_ENTITLEMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# デプロイ・再起動直後のキャッシュウォームアップ（python manage.py warm_caches と共通）
+# 既定値（ON_STARTUP=False・CONCURRENCY・BUDGET_SECONDS など）は blog/warmup.py の
+# DEFAULT_WARMUP。変更するキーだけを指定する（例: {"ON_STARTUP": True}）
+BLOG_CACHE_WARMUP = {}
+
+# CDN・リバースプロキシ向けのサロゲートキー（Surrogate-Key / Cache-Tag）とパージ
+# 既定はパージ要求を記録するだけのローカル実装
+BLOG_CACHE_PURGER = {"BACKEND": "blog.purge.LocalPurger"}
+# CDN 上のキャッシュ期間（Surrogate-Control: max-age）。0 でヘッダーを付与しない
+BLOG_SURROGATE_MAX_AGE = 60 * 60 * 24
+
+# 同一ホストのワーカー間で共有するレスポンスキャッシュ（POSIX 共有メモリ）
+# 記事の更新時は世代番号を進めて全エントリを失効させる。既定値（無効・サイズクラスなど）は
+# blog/shmcache.py の DEFAULT_SHARED_CACHE。変更するキーだけを指定する（例: {"ENABLED": True}）
+BLOG_SHARED_CACHE = {}
+
+# API レスポンスの圧縮。既定値（最小サイズ・Content-Type の許可リスト・方式の優先順位など）は
+# fastapi_app/app/utils/compression.py の DEFAULT_COMPRESSION。変更するキーだけを指定する。
+# br・zstd は brotli・zstandard（extra "compression"）がインストールされている場合のみ使用する。
+# text/html と Cookie を設定するレスポンスは BREACH 対策のため圧縮しない
+BLOG_COMPRESSION = {}
+
+# Stripe API の呼び出し。既定値（CALL_TIMEOUT・MAX_CONNECTIONS など）は
+# fastapi_app/app/utils/stripe_client.py の DEFAULT_STRIPE_CLIENT。変更するキーだけを指定する
+STRIPE_CLIENT = {}
+
+# Checkout セッションの再利用。既定値（SESSION_TTL・IDEMPOTENCY_WINDOW など）は
+# fastapi_app/app/utils/checkout.py の DEFAULT_STRIPE_CHECKOUT。変更するキーだけを指定する
+STRIPE_CHECKOUT = {}
+
+# 有料記事の価格カタログ。既定値（CURRENCY・REFRESH_INTERVAL）は blog/prices.py の
+# DEFAULT_PRICE_CATALOG。Stripe の Product・Price は python manage.py sync_stripe_prices で作成する
+BLOG_PRICE_CATALOG = {}
+
+# Stripe Webhook の受信箱とワーカー。既定値（WORKERS・POLL_INTERVAL・再試行の間隔など）は
+# blog/webhooks.py の DEFAULT_WEBHOOK_INBOX。変更するキーだけを指定する
+STRIPE_WEBHOOK_INBOX = {}
+
+# メールの送信キュー。既定値（BATCH_SIZE・POLL_INTERVAL・再試行の間隔など）は
+# blog/mail.py の DEFAULT_MAIL_QUEUE。変更するキーだけを指定する
+BLOG_MAIL_QUEUE = {}
+
+# main_asgi のルーターで振り分け前に呼ぶフック（例: "myapp.hooks.maintenance"）
+# async def hook(scope) が ASGI アプリケーションを返すと、そのアプリで処理する
+ASGI_PRE_ROUTING_HOOK = None
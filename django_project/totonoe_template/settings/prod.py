@@ -37,6 +37,13 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 3600  # 1時間
 
 # データベース設定（本番環境）
+# psycopg3 の接続プールを使用（psycopg[pool] が必要）
+DATABASE_CONNECTION_POOL_SIZE = int(
+    os.getenv("DB_POOL_SIZE", str(DATABASE_CONNECTION_POOL_SIZE))
+)
+DATABASE_CONNECTION_MAX_OVERFLOW = int(
+    os.getenv("DB_POOL_MAX_OVERFLOW", str(DATABASE_CONNECTION_MAX_OVERFLOW))
+)
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -45,12 +52,46 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        # プール使用時は接続の持続（CONN_MAX_AGE）をプール側で管理する
+        "CONN_MAX_AGE": 0,
+        # プールから取り出すたびに接続が生きているか確認
+        "CONN_HEALTH_CHECKS": True,
         "OPTIONS": {
             "sslmode": "require",
+            "pool": {
+                "min_size": DATABASE_CONNECTION_POOL_SIZE,
+                "max_size": DATABASE_CONNECTION_POOL_SIZE
+                + DATABASE_CONNECTION_MAX_OVERFLOW,
+                "timeout": DATABASE_CONNECTION_POOL_TIMEOUT,
+                "max_idle": DATABASE_CONNECTION_POOL_MAX_IDLE,
+                "max_lifetime": DATABASE_CONNECTION_POOL_MAX_LIFETIME,
+                "name": "default",
+            },
         },
     }
 }
 
+# リードレプリカ（環境変数 DB_REPLICA_HOSTS にカンマ区切りで指定）
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))
+):
+    alias = f"replica{index + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "OPTIONS": {
+            **DATABASES["default"]["OPTIONS"],
+            "pool": {**DATABASES["default"]["OPTIONS"]["pool"], "name": alias},
+        },
+        # テストではプライマリのテスト用 DB をそのまま使う
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["blog.dbrouter.ReplicaRouter"]
+
 # Static files（本番環境）
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "django_project" / "staticfiles"  # 開発環境と統一
@@ -130,3 +171,33 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # 静的ファイル配信用
 ] + MIDDLEWARE
+
+# 匿名ユーザーのページ表示をリードレプリカから読む
+if DATABASE_REPLICAS:
+    MIDDLEWARE += ["blog.dbrouter.ReplicaReadMiddleware"]
+
+# 記事一覧のリードモデル（環境変数で有効化）
+BLOG_READ_MODEL_ENABLED = (
+    os.getenv("BLOG_READ_MODEL_ENABLED", "False").lower() == "true"
+)
+
+# CDN のパージ API（環境変数 CACHE_PURGE_URL が設定されている場合のみ）
+if os.getenv("CACHE_PURGE_URL"):
+    BLOG_CACHE_PURGER = {
+        "BACKEND": "blog.purge.HTTPPurger",
+        "OPTIONS": {
+            "url": os.getenv("CACHE_PURGE_URL"),
+            "headers": (
+                {"Authorization": f"Bearer {os.getenv('CACHE_PURGE_TOKEN')}"}
+                if os.getenv("CACHE_PURGE_TOKEN")
+                else {}
+            ),
+        },
+    }
+
+# ワーカー間の共有レスポンスキャッシュ（環境変数で有効化）
+BLOG_SHARED_CACHE = {
+    **BLOG_SHARED_CACHE,
+    "ENABLED": os.getenv("BLOG_SHARED_CACHE_ENABLED", "False").lower() == "true",
+    "NAME": os.getenv("BLOG_SHARED_CACHE_NAME", "blog-response-cache"),
+}
@@ -6,6 +6,8 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 
 from .routers import payments, posts  # payments ルーターを追加
+from .utils.compression import CompressionMiddleware
+from .utils.response_cache import SharedCacheMiddleware
 
 # FastAPI アプリケーションのインスタンス作成
 app = FastAPI(
@@ -20,6 +22,14 @@ app = FastAPI(
     ),  # 本番環境では無効化
 )
 
+# レスポンス圧縮（設定 BLOG_COMPRESSION）。共有キャッシュの内側に置き、
+# 圧縮済みの本文をキャッシュする
+app.add_middleware(CompressionMiddleware)
+
+# ワーカー間で共有するレスポンスキャッシュ（設定 BLOG_SHARED_CACHE で有効化）
+# CORS などリクエストごとのヘッダーはキャッシュしないよう内側に置く
+app.add_middleware(SharedCacheMiddleware)
+
 # セキュリティミドルウェア: 信頼できるホストのみ許可（テスト環境以外）
 if os.getenv("TESTING", "False").lower() != "true":
     app.add_middleware(
@@ -3,21 +3,27 @@ import os
 import time
 from collections import defaultdict
 
-import stripe
-from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException, Request
+from asgiref.sync import sync_to_async
+from fastapi import APIRouter, HTTPException, Request, Response
 
-from ..schemas.payment import CheckoutSessionRequest, CheckoutSessionResponse
+from blog.webhooks import enqueue_event
 
-# 環境変数を読み込み
-load_dotenv()
+from ..schemas.payment import CheckoutSessionRequest, CheckoutSessionResponse
+from ..utils.checkout import (
+    checkout_key,
+    checkout_window,
+    get_article_price,
+    get_buyer_id,
+    get_checkout_session,
+    idempotency_key,
+    remember_checkout_session,
+    set_buyer_cookie,
+)
+from ..utils.stripe_client import call_stripe, get_stripe
 
 # ログ設定
 logger = logging.getLogger(__name__)
 
-# Stripe API キーを設定
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
@@ -62,7 +68,7 @@ def rate_limit_check(
 
 @router.post("/create-checkout-session", response_model=CheckoutSessionResponse)
 async def create_checkout_session(
-    request_data: CheckoutSessionRequest, request: Request
+    request_data: CheckoutSessionRequest, request: Request, response: Response
 ):
     """Stripe Checkout セッションを作成"""
 
@@ -88,31 +94,59 @@ async def create_checkout_session(
         if parsed.hostname not in allowed_domains:
             raise HTTPException(status_code=400, detail="Invalid redirect URL")
 
+    # 金額はクライアントの値ではなく価格カタログ（Stripe の Price）の値で課金する
+    price = await get_article_price(request_data.article_id)
+    if price is None:
+        raise HTTPException(status_code=404, detail="Article not for sale")
+    if request_data.amount != price.amount:
+        # 表示中の価格が古い（価格が変更された）
+        raise HTTPException(status_code=400, detail="Price mismatch")
+
+    # 同じ記事・購入者・金額の期限内のセッションがあれば再利用
+    buyer_id, new_buyer = get_buyer_id(request)
+    if new_buyer:
+        set_buyer_cookie(response, buyer_id)
+    key = checkout_key(request_data.article_id, buyer_id, request_data.amount)
+    existing = await get_checkout_session(key)
+    if existing is not None:
+        logger.info(
+            f"Checkout session reused: {existing['session_id']} "
+            f"for article {request_data.article_id}"
+        )
+        return CheckoutSessionResponse(
+            session_id=existing["session_id"],
+            checkout_url=existing["checkout_url"],
+            reused=True,
+        )
+
+    window = checkout_window(key)
+    # 要求ごとに変わる値（クライアントの IP など）は含めない。同じ時間枠・同じパラメータの
+    # 要求だけが Stripe で 1 つのセッションにまとめられる
+    params = {
+        "payment_method_types": ["card"],
+        # 事前に作成した Price を参照する（manage.py sync_stripe_prices）
+        "line_items": [{"price": price.stripe_price_id, "quantity": 1}],
+        "mode": "payment",
+        "success_url": request_data.success_url,
+        "cancel_url": request_data.cancel_url,
+        "metadata": {
+            "article_id": str(request_data.article_id),
+            "buyer_id": buyer_id,
+            "checkout_key": key,
+        },
+        "expires_at": window["expires_at"],  # 約30分で期限切れ
+    }
+    stripe = get_stripe()
     try:
-        # Stripe Checkout セッションを作成
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "jpy",
-                        "product_data": {
-                            "name": request_data.article_title[:100],  # 長さ制限
-                            "description": f"記事ID: {request_data.article_id} の購入",
-                        },
-                        "unit_amount": request_data.amount,
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
-            success_url=request_data.success_url,
-            cancel_url=request_data.cancel_url,
-            metadata={
-                "article_id": str(request_data.article_id),
-                "client_ip": request.client.host,
-            },
-            expires_at=int(time.time()) + 1800,  # 30分で期限切れ
+        # Stripe Checkout セッションを作成（イベントループを止めないよう非同期で呼ぶ）
+        session = await call_stripe(
+            "checkout.sessions.create",
+            params=params,
+            # 同時に届いた要求・再試行で重複して作成しない
+            options={"idempotency_key": idempotency_key(window, params)},
+        )
+        await remember_checkout_session(
+            key, session.id, session.url, window["expires_at"]
         )
 
         logger.info(
@@ -122,6 +156,12 @@ async def create_checkout_session(
 
         return CheckoutSessionResponse(session_id=session.id, checkout_url=session.url)
 
+    except TimeoutError:
+        logger.error("Stripe call timed out in create_checkout_session")
+        raise HTTPException(status_code=504, detail="Payment provider timeout")
+    except stripe.error.APIConnectionError as e:
+        logger.error(f"Stripe connection error: {e!s}")
+        raise HTTPException(status_code=502, detail="Payment provider unavailable")
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error: {e!s}")
         raise HTTPException(status_code=400, detail="Payment processing error")
@@ -133,6 +173,7 @@ async def create_checkout_session(
 @router.post("/webhook")
 async def stripe_webhook(request: Request):
     """Stripe Webhook エンドポイント"""
+    stripe = get_stripe()
     try:
         payload = await request.body()
         sig_header = request.headers.get("stripe-signature")
@@ -152,27 +193,16 @@ async def stripe_webhook(request: Request):
             logger.warning(f"Invalid signature: {e!s}")
             raise HTTPException(status_code=400, detail="Invalid signature")
 
-        # イベントタイプに応じて処理
-        if event["type"] == "checkout.session.completed":
-            session = event["data"]["object"]
-            article_id = session.get("metadata", {}).get("article_id")
-
-            # TODO: ここで購入完了処理を実装
-            # - データベースに購入記録を保存
-            # - ユーザーに購入完了メールを送信
-            # - 記事へのアクセス権限を付与
-
-            logger.info(f"購入完了: 記事ID {article_id}, セッションID {session['id']}")
-
-        elif event["type"] == "payment_intent.succeeded":
-            payment_intent = event["data"]["object"]
-            article_id = payment_intent.get("metadata", {}).get("article_id")
+        if not event.get("id") or not event.get("type"):
+            raise HTTPException(status_code=400, detail="Invalid payload")
 
-            logger.info(
-                f"決済成功: 記事ID {article_id}, Payment Intent ID {payment_intent['id']}"
-            )
+        # 受信箱に保存してすぐに応答する（処理は blog.webhooks のワーカーが行う）
+        # 同じイベント ID の再送は保存されない
+        created = await sync_to_async(enqueue_event)(event)
+        if not created:
+            logger.info(f"Duplicate Stripe event ignored: {event['id']}")
 
-        return {"status": "success"}
+        return {"status": "success", "duplicate": not created}
 
     except HTTPException:
         raise
@@ -187,9 +217,10 @@ async def test_stripe_connection():
     if os.getenv("DEBUG", "False").lower() != "true":
         raise HTTPException(status_code=404, detail="Not found")
 
+    stripe = get_stripe()
     try:
         # アカウント情報を取得してテスト
-        account = stripe.Account.retrieve()
+        account = await call_stripe("accounts.retrieve_current")
         return {
             "status": "success",
             "account_id": account.id,
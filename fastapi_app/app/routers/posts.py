@@ -3,11 +3,13 @@
 import logging
 import os
 import time
+from datetime import date
+from typing import Annotated
 
 import django
 from asgiref.sync import sync_to_async
 from django.conf import settings
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 # Django設定の初期化
 if not settings.configured:
@@ -16,12 +18,52 @@ if not settings.configured:
     )
     django.setup()
 
-from blog.models import BlogPage
+from django.db.models import Count, F
+from taggit.models import Tag
+from wagtail.models import Page
+
+from blog import pageviews
+from blog.cache import get_cached_posts, serialize_post
+from blog.dbpool import pool_stats, pooled_sync_to_async
+from blog.dbrouter import route_reads_to_replica
+from blog.entitlements import PRIVATE_CACHE_CONTROL, can_read, get_buyer_id
+from blog.models import (
+    BlogIndexPage,
+    BlogPage,
+    BlogPageTag,
+    PostArchiveMonth,
+    PostChange,
+    TagFacetCount,
+)
+from blog.purge import POST_LIST_KEY, post_key, set_surrogate_keys
+from blog.shmcache import get_shared_cache, invalidate_shared_cache
+
+from ..schemas.post import (
+    ArchiveSchema,
+    CacheClearSchema,
+    PopularPostListSchema,
+    PostChangeListSchema,
+    PostListSchema,
+    PostSchema,
+    PostStatsSchema,
+    RelatedPostListSchema,
+    TagFacetListSchema,
+)
+
+
+async def use_read_replica():
+    """このリクエストの読み取りをリードレプリカへ送る（書き込みは常にプライマリ）
+
+    async の依存関係はエンドポイントと同じコンテキストで実行され、sync_to_async で
+    実行する ORM の処理にも引き継がれる。
+    """
+    route_reads_to_replica()
 
-from ..schemas.post import CacheClearSchema, PostListSchema, PostSchema, PostStatsSchema
 
 # ルーターの作成
-router = APIRouter(prefix="/posts", tags=["posts"])
+router = APIRouter(
+    prefix="/posts", tags=["posts"], dependencies=[Depends(use_read_replica)]
+)
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
@@ -70,7 +112,7 @@ async def health_check():
     """ヘルスチェックエンドポイント"""
     try:
 
-        @sync_to_async
+        @pooled_sync_to_async
         def get_total_posts():
             return BlogPage.objects.live().public().count()
 
@@ -79,6 +121,7 @@ async def health_check():
         return {
             "status": "healthy",
             "total_posts": total_posts,
+            "database_pool": await sync_to_async(pool_stats)(),
             "timestamp": time.time(),
         }
     except Exception as e:
@@ -86,81 +129,192 @@ async def health_check():
         return {"status": "unhealthy", "error": str(e)}
 
 
+def get_read_model():
+    """有効な場合のみリードモデルを返す（無効時は NumPy を読み込まない）"""
+    if not getattr(settings, "BLOG_READ_MODEL_ENABLED", False):
+        return None
+    from blog.readmodel import get_read_model as _get_read_model
+
+    return _get_read_model()
+
+
 async def get_blog_pages_count():
     """ブログページ数を非同期で取得"""
 
-    @sync_to_async
+    @pooled_sync_to_async
     def _get_count():
         return BlogPage.objects.live().public().count()
 
     return await _get_count()
 
 
-async def get_blog_pages_list(limit: int = 20, offset: int = 0, search: str = None):
-    """ブログページ一覧を非同期で取得"""
+# order パラメータと並び順の対応（いずれもインデックスで解決できる組み合わせ）
+POST_ORDERINGS = {
+    "-date": ("-date", "-first_published_at"),
+    "date": ("date", "first_published_at"),
+    "published": ("-first_published_at",),
+}
+
 
-    @sync_to_async
+def build_blog_pages_queryset(
+    search: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    parent: int = None,
+    tags: list[str] = None,
+    tag_mode: str = "any",
+):
+    """フィルターを適用したブログページのクエリセットを構築"""
+    queryset = BlogPage.objects.live().public()
+    # 簡単な検索機能（実際の検索実装は省略）
+    if search:
+        queryset = queryset.filter(title__icontains=search)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if parent is not None:
+        parent_page = (
+            BlogIndexPage.objects.filter(id=parent).values_list("path", "depth").first()
+        )
+        if parent_page is None:
+            return queryset.none()
+        path, depth = parent_page
+        # treebeard の path は子ページで親の path + steplen 文字になるため、
+        # LIKE ではなく path の一意インデックスに対する範囲スキャンで絞り込む
+        queryset = queryset.filter(
+            path__range=(
+                path + Page.alphabet[0] * Page.steplen,
+                path + Page.alphabet[-1] * Page.steplen,
+            ),
+            depth=depth + 1,
+        )
+    if tags:
+        slugs = set(tags)
+        tag_ids = list(Tag.objects.filter(slug__in=slugs).values_list("id", flat=True))
+        if not tag_ids or (tag_mode == "all" and len(tag_ids) < len(slugs)):
+            return queryset.none()
+        # 中間テーブルの (tag, content_object) インデックスのみで記事 ID を解決し、
+        # JOIN + DISTINCT を避ける
+        page_ids = BlogPageTag.objects.filter(tag_id__in=tag_ids)
+        if tag_mode == "all" and len(tag_ids) > 1:
+            page_ids = (
+                page_ids.values("content_object_id")
+                .annotate(matched=Count("tag_id"))
+                .filter(matched=len(tag_ids))
+            )
+        queryset = queryset.filter(id__in=page_ids.values("content_object_id"))
+    return queryset
+
+
+async def get_blog_pages_list(
+    limit: int = 20,
+    offset: int = 0,
+    search: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    order: str = "-date",
+    parent: int = None,
+    tags: list[str] = None,
+    tag_mode: str = "any",
+):
+    """ブログページ一覧（API 用の辞書）と総件数を非同期で取得"""
+
+    @pooled_sync_to_async
     def _get_pages():
-        queryset = (
-            BlogPage.objects.live().public().order_by("-date", "-first_published_at")
+        # タイトル検索以外はリードモデルで絞り込み、行は詳細キャッシュから取得
+        read_model = get_read_model() if not search else None
+        if read_model is not None:
+            page_ids, total_count = read_model.query(
+                date_from=date_from,
+                date_to=date_to,
+                parent=parent,
+                tags=tags,
+                tag_mode=tag_mode,
+                order=order,
+                offset=offset,
+                limit=limit,
+            )
+            return get_cached_posts(page_ids), total_count
+
+        queryset = build_blog_pages_queryset(
+            search=search,
+            date_from=date_from,
+            date_to=date_to,
+            parent=parent,
+            tags=tags,
+            tag_mode=tag_mode,
         )
-        # 簡単な検索機能（実際の検索実装は省略）
-        if search:
-            queryset = queryset.filter(title__icontains=search)
-        return list(queryset[offset : offset + limit])
+        total_count = queryset.count()
+        pages = queryset.order_by(*POST_ORDERINGS[order])[offset : offset + limit]
+        return [serialize_post(page) for page in pages], total_count
 
     return await _get_pages()
 
 
+def lock_post(post: dict) -> dict:
+    """有料記事の本文を除いた辞書（キャッシュの辞書は変更しない）"""
+    return {**post, "body": "", "locked": True}
+
+
 async def get_blog_page_by_id(post_id: int):
-    """IDでブログページを非同期で取得"""
+    """IDでブログ記事（API 用の辞書）を詳細キャッシュ経由で非同期で取得"""
 
-    @sync_to_async
+    @pooled_sync_to_async
     def _get_page():
-        try:
-            return BlogPage.objects.live().public().get(id=post_id)
-        except BlogPage.DoesNotExist:
-            return None
+        posts = get_cached_posts([post_id])
+        return posts[0] if posts else None
 
     return await _get_page()
 
 
 @router.get("/", response_model=PostListSchema)
 async def get_posts(
-    limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    search: str = Query(None, description="Search query"),
+    response: Response,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    search: Annotated[str | None, Query(description="Search query")] = None,
+    date_from: Annotated[
+        date | None, Query(description="Posts dated on or after")
+    ] = None,
+    date_to: Annotated[
+        date | None, Query(description="Posts dated on or before")
+    ] = None,
+    order: Annotated[str, Query(pattern="^(date|-date|published)$")] = "-date",
+    parent: Annotated[int | None, Query(description="Parent BlogIndexPage ID")] = None,
+    tag: Annotated[list[str] | None, Query(description="Tag slugs")] = None,
+    tag_mode: Annotated[str, Query(pattern="^(any|all)$")] = "any",
 ):
     """ブログ記事一覧を取得"""
     try:
         start_time = time.time()
 
         # 記事一覧とカウントを取得
-        posts = await get_blog_pages_list(limit=limit, offset=offset, search=search)
-        total_count = await get_blog_pages_count()
-
-        # PostSchemaに変換
-        post_data = []
-        for post in posts:
-            post_data.append(
-                {
-                    "id": post.id,
-                    "title": post.title,
-                    "intro": post.intro,
-                    "date": post.date.isoformat() if post.date else None,
-                    "slug": post.slug,
-                    "first_published_at": (
-                        post.first_published_at.isoformat()
-                        if post.first_published_at
-                        else None
-                    ),
-                    "body": str(post.body) if post.body else "",
-                }
-            )
+        post_data, total_count = await get_blog_pages_list(
+            limit=limit,
+            offset=offset,
+            search=search,
+            date_from=date_from,
+            date_to=date_to,
+            order=order,
+            parent=parent,
+            tags=tag,
+            tag_mode=tag_mode,
+        )
 
         execution_time = time.time() - start_time
         logger.info(f"get_posts executed in {execution_time:.3f} seconds")
 
+        # 一覧は購入者によらず共有されるため、有料記事の本文は含めない
+        post_data = [
+            lock_post(post) if post.get("is_paid") else post for post in post_data
+        ]
+
+        # 一覧に含まれる記事の更新でもパージされるようキーを付与
+        set_surrogate_keys(
+            response, [POST_LIST_KEY, *(post_key(post["id"]) for post in post_data)]
+        )
+
         return {
             "posts": post_data,
             "pagination": {
@@ -182,11 +336,17 @@ async def get_posts_stats():
     """ブログ記事の統計情報を取得"""
     try:
         total_posts = await get_blog_pages_count()
+        # 共有レスポンスキャッシュの統計（このワーカーでの件数）
+        shared_cache = get_shared_cache()
 
         return {
             "total_posts": total_posts,
-            "cache": {"hits": 0, "misses": 0},  # キャッシュ統計は簡易実装
+            "cache": {
+                "hits": shared_cache.hits if shared_cache else 0,
+                "misses": shared_cache.misses if shared_cache else 0,
+            },
             "performance": {"avg_response_time": 0.1},
+            "database_pool": await sync_to_async(pool_stats)(),
         }
     except Exception as e:
         logger.error(f"Error in get_posts_stats: {e!s}")
@@ -197,15 +357,124 @@ async def get_posts_stats():
 async def clear_cache():
     """キャッシュをクリア"""
     try:
-        # 実際のキャッシュクリア処理（簡易実装）
+        # 全ワーカーの共有レスポンスキャッシュを失効させる
+        await sync_to_async(invalidate_shared_cache)()
         return {"message": "Cache cleared successfully"}
     except Exception as e:
         logger.error(f"Error in clear_cache: {e!s}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+async def get_post_changes_since(since: int, limit: int):
+    """再開トークン以降の変更イベントを非同期で取得"""
+
+    @pooled_sync_to_async
+    def _get_changes():
+        # 主キーの範囲スキャンのみ（limit + 1 件で続きの有無を判定）
+        return list(PostChange.objects.settled_after(since)[: limit + 1])
+
+    return await _get_changes()
+
+
+@router.get("/changes", response_model=PostChangeListSchema)
+async def get_post_changes(
+    response: Response,
+    since: int = Query(0, ge=0, description="Resume token"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """差分同期用の変更フィードを取得"""
+    try:
+        changes = await get_post_changes_since(since=since, limit=limit)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        set_surrogate_keys(response, [POST_LIST_KEY])
+        return {
+            "changes": [
+                {
+                    "token": change.id,
+                    "post_id": change.page_id,
+                    "action": change.action,
+                    "changed_at": change.created_at.isoformat(),
+                }
+                for change in changes
+            ],
+            "next_token": changes[-1].id if changes else since,
+            "has_more": has_more,
+        }
+    except Exception as e:
+        logger.error(f"Error in get_post_changes: {e!s}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def get_archive_months():
+    """年月アーカイブのロールアップを非同期で取得"""
+
+    @pooled_sync_to_async
+    def _get_months():
+        return list(
+            PostArchiveMonth.objects.filter(count__gt=0).values(
+                "year", "month", "count"
+            )
+        )
+
+    return await _get_months()
+
+
+@router.get("/archive", response_model=ArchiveSchema)
+async def get_posts_archive(response: Response):
+    """年月ごとの記事数を取得（ロールアップテーブルのみを参照）"""
+    try:
+        archive = await get_archive_months()
+        set_surrogate_keys(response, [POST_LIST_KEY])
+        return {"archive": archive}
+    except Exception as e:
+        logger.error(f"Error in get_posts_archive: {e!s}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def get_tag_facets():
+    """タグごとの記事数を非同期で取得"""
+
+    @pooled_sync_to_async
+    def _get_facets():
+        return list(
+            TagFacetCount.objects.filter(count__gt=0)
+            .order_by("-count", "tag__name")
+            .values("count", name=F("tag__name"), slug=F("tag__slug"))
+        )
+
+    return await _get_facets()
+
+
+@router.get("/tags", response_model=TagFacetListSchema)
+async def get_posts_tags(response: Response):
+    """タグ一覧と記事数を取得（カウンターテーブルのみを参照）"""
+    try:
+        tags = await get_tag_facets()
+        set_surrogate_keys(response, [POST_LIST_KEY])
+        return {"tags": tags}
+    except Exception as e:
+        logger.error(f"Error in get_posts_tags: {e!s}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/popular", response_model=PopularPostListSchema)
+async def get_posts_popular(
+    window: str = Query("24h", pattern="^(24h|7d)$", description="集計期間"),
+    limit: int = Query(10, ge=1, le=50, description="取得件数"),
+):
+    """直近24時間・7日間の閲覧数ランキングを取得（時間単位のバケットから集計）"""
+    try:
+        posts = await pooled_sync_to_async(pageviews.get_popular_posts)(window, limit)
+        return {"window": window, "posts": posts}
+    except Exception as e:
+        logger.error(f"Error in get_posts_popular: {e!s}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/{post_id}", response_model=PostSchema)
-async def get_post(post_id: int):
+async def get_post(post_id: int, request: Request, response: Response):
     """特定のブログ記事を取得"""
     try:
         post = await get_blog_page_by_id(post_id)
@@ -213,19 +482,58 @@ async def get_post(post_id: int):
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
 
-        return PostSchema(
-            id=post.id,
-            title=post.title,
-            intro=post.intro,
-            date=post.date.isoformat() if post.date else None,
-            slug=post.slug,
-            first_published_at=(
-                post.first_published_at.isoformat() if post.first_published_at else None
-            ),
-            body=str(post.body) if post.body else "",
-        )
+        if post.get("is_paid"):
+            # 購入者ごとにキャッシュした購入済み記事の集合で判定する
+            buyer_id = get_buyer_id(request.cookies)
+            if not buyer_id or not await pooled_sync_to_async(can_read)(
+                buyer_id, post_id, True
+            ):
+                post = lock_post(post)
+            # 購入者ごとに本文が変わるため CDN・共有キャッシュには載せない
+            response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+            response.headers["Vary"] = "Cookie"
+        else:
+            set_surrogate_keys(response, [post_key(post_id)])
+        return PostSchema(**post)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in get_post: {e!s}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def get_related_blog_pages(post_id: int):
+    """事前計算済みの関連記事を非同期で取得"""
+
+    @pooled_sync_to_async
+    def _get_related():
+        return list(
+            BlogPage.objects.live()
+            .public()
+            .filter(related_from__page_id=post_id)
+            .order_by("related_from__rank")
+            .values("id", "title", "intro", "date", "slug")
+        )
+
+    return await _get_related()
+
+
+@router.get("/{post_id}/related", response_model=RelatedPostListSchema)
+async def get_post_related(post_id: int, response: Response):
+    """特定のブログ記事の関連記事を取得"""
+    try:
+        related = await get_related_blog_pages(post_id)
+
+        set_surrogate_keys(
+            response, [post_key(post_id), *(post_key(item["id"]) for item in related)]
+        )
+        return {
+            "post_id": post_id,
+            "related": [
+                {**item, "date": item["date"].isoformat() if item["date"] else None}
+                for item in related
+            ],
+        }
+    except Exception as e:
+        logger.error(f"Error in get_post_related: {e!s}")
+        raise HTTPException(status_code=500, detail="Internal server error")
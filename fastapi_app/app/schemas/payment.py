@@ -33,6 +33,7 @@ class CheckoutSessionResponse(BaseModel):
 
     session_id: str
     checkout_url: str
+    reused: bool = False  # 作成済みのセッションを返した場合は True
 
 
 class WebhookEvent(BaseModel):
@@ -11,6 +11,18 @@ class PostBase(BaseModel):
     slug: str
     first_published_at: str | None = None  # ISO format string
     body: str
+    excerpt: str = ""
+    word_count: int = 0
+    reading_time: int = 0  # 分
+    is_paid: bool = False  # 有料記事（購入者以外には本文を返さない）
+
+
+class PostLinkSchema(BaseModel):
+    """前後記事へのリンク用スキーマ"""
+
+    id: int
+    title: str
+    url: str | None = None
 
 
 class PostSchema(PostBase):
@@ -18,6 +30,10 @@ class PostSchema(PostBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+    prev_post: PostLinkSchema | None = None  # 日付順で1つ前（古い）の記事
+    next_post: PostLinkSchema | None = None  # 日付順で1つ後（新しい）の記事
+    locked: bool = False  # 未購入の有料記事（body は空）
+
 
 class PostListItemSchema(BaseModel):
     """ブログ記事一覧の個別アイテム用スキーマ"""
@@ -29,6 +45,10 @@ class PostListItemSchema(BaseModel):
     slug: str
     first_published_at: str | None = None  # ISO format string
     body: str
+    excerpt: str = ""
+    word_count: int = 0
+    reading_time: int = 0  # 分
+    is_paid: bool = False  # 有料記事の body は一覧では常に空
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -73,15 +93,112 @@ class PerformanceStatsSchema(BaseModel):
     avg_response_time: float
 
 
+class PoolStatsSchema(BaseModel):
+    """DB 接続プールの利用状況スキーマ"""
+
+    min_size: int
+    max_size: int
+    size: int
+    in_use: int
+    idle: int
+    waiting: int
+    requests: int
+    wait_ms_total: int
+    wait_ms_avg: float
+    timeouts: int
+    connections_lost: int
+
+
 class PostStatsSchema(BaseModel):
     """投稿統計情報スキーマ"""
 
     total_posts: int
     cache: CacheStatsSchema
     performance: PerformanceStatsSchema
+    # DB エイリアスごとの接続プール（プール未使用の場合は空）
+    database_pool: dict[str, PoolStatsSchema] = {}
 
 
 class CacheClearSchema(BaseModel):
     """キャッシュクリア結果スキーマ"""
 
     message: str
+
+
+class PostChangeSchema(BaseModel):
+    """変更フィードの個別イベントスキーマ"""
+
+    token: int
+    post_id: int
+    action: str  # "upsert" または "delete"
+    changed_at: str  # ISO format string
+
+
+class PostChangeListSchema(BaseModel):
+    """変更フィードレスポンス用スキーマ"""
+
+    changes: list[PostChangeSchema]
+    next_token: int  # 次回の since に渡す再開トークン
+    has_more: bool
+
+
+class ArchiveMonthSchema(BaseModel):
+    """年月アーカイブの個別項目スキーマ"""
+
+    year: int
+    month: int
+    count: int
+
+
+class ArchiveSchema(BaseModel):
+    """年月アーカイブレスポンス用スキーマ"""
+
+    archive: list[ArchiveMonthSchema]
+
+
+class TagFacetSchema(BaseModel):
+    """タグファセットの個別項目スキーマ"""
+
+    name: str
+    slug: str
+    count: int
+
+
+class TagFacetListSchema(BaseModel):
+    """タグファセットレスポンス用スキーマ"""
+
+    tags: list[TagFacetSchema]
+
+
+class PopularPostSchema(BaseModel):
+    """人気記事の個別項目スキーマ"""
+
+    id: int
+    title: str
+    slug: str
+    url: str | None = None
+    views: int
+
+
+class PopularPostListSchema(BaseModel):
+    """人気記事ランキングレスポンス用スキーマ"""
+
+    window: str
+    posts: list[PopularPostSchema]
+
+
+class RelatedPostSchema(BaseModel):
+    """関連記事の個別項目スキーマ"""
+
+    id: int
+    title: str
+    intro: str
+    date: str | None = None  # ISO format string
+    slug: str
+
+
+class RelatedPostListSchema(BaseModel):
+    """関連記事レスポンス用スキーマ"""
+
+    post_id: int
+    related: list[RelatedPostSchema]
@@ -0,0 +1,126 @@
+"""
+Stripe Checkout セッションの再利用
+
+購入ボタンのダブルクリックや再試行のたびに Checkout セッションを作らないよう、
+（記事 ID・購入者・金額）ごとに作成済みのセッションを Django キャッシュに保持し、
+期限（expires_at）まで同じセッションを返す。
+
+購入者は Cookie の匿名 ID で識別する。セッションの作成時には同じキーと時間枠から
+求めた idempotency_key を送るため、キャッシュに載る前に同時に届いた要求や
+ネットワークエラー後の再試行も Stripe 側で同じセッションにまとめられる。
+"""
+
+import hashlib
+import json
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+# Cookie の購入者 ID は有料記事の閲覧権限の判定でも使う
+from blog.entitlements import BUYER_COOKIE
+from blog.entitlements import get_buyer_id as get_buyer_id_from_cookies
+from blog.prices import price_catalog
+
+# 支払い完了・期限切れの Webhook の処理（blog/webhooks.py）で削除される
+from blog.webhooks import CHECKOUT_CACHE_KEY_PREFIX as CACHE_KEY_PREFIX
+
+DEFAULT_STRIPE_CHECKOUT = {
+    # セッションの有効期間（Stripe の下限は 30 分）
+    "SESSION_TTL": 1800,
+    # 残りがこれより短いセッションは再利用せず作り直す
+    "REUSE_MIN_REMAINING": 120,
+    # idempotency_key と expires_at をそろえる時間枠（秒）
+    "IDEMPOTENCY_WINDOW": 60,
+    "BUYER_COOKIE": BUYER_COOKIE,
+    "BUYER_COOKIE_MAX_AGE": 60 * 60 * 24 * 365,
+}
+
+
+def get_checkout_settings() -> dict:
+    """設定 STRIPE_CHECKOUT を既定値とマージ"""
+    return {**DEFAULT_STRIPE_CHECKOUT, **getattr(settings, "STRIPE_CHECKOUT", {})}
+
+
+def get_buyer_id(request) -> tuple[str, bool]:
+    """購入者の匿名 ID と、新しく発行したか（Cookie を設定する必要があるか）"""
+    buyer_id = get_buyer_id_from_cookies(request.cookies)
+    if buyer_id:
+        return buyer_id, False
+    return uuid.uuid4().hex, True
+
+
+def set_buyer_cookie(response, buyer_id: str):
+    options = get_checkout_settings()
+    response.set_cookie(
+        options["BUYER_COOKIE"],
+        buyer_id,
+        max_age=options["BUYER_COOKIE_MAX_AGE"],
+        httponly=True,
+        samesite="lax",
+        # セッション Cookie と同じく、本番では HTTPS のみで送る
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+def checkout_key(article_id: int, buyer_id: str, amount: int) -> str:
+    """（記事 ID・購入者・金額）からセッションのキーを求める"""
+    raw = f"{article_id}:{buyer_id}:{amount}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def checkout_window(key: str, now: float | None = None) -> dict:
+    """新しいセッションの expires_at と idempotency_key
+
+    同じ時間枠の要求は同じパラメータ・同じキーになり、Stripe で重複が除かれる。
+    """
+    options = get_checkout_settings()
+    window = options["IDEMPOTENCY_WINDOW"]
+    bucket = int(now if now is not None else time.time()) // window
+    return {
+        "expires_at": (bucket + 1) * window + options["SESSION_TTL"],
+        "idempotency_key": f"checkout-{key}-{bucket}",
+    }
+
+
+def idempotency_key(window: dict, params: dict) -> str:
+    """時間枠の idempotency_key に作成パラメータのハッシュを加える
+
+    Stripe は同じキーでパラメータの異なる要求をエラーにするため、リダイレクト先などが
+    異なる要求は別のキー（別のセッション）にする。
+    """
+    raw = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(raw.encode()).hexdigest()[:16]
+    return f"{window['idempotency_key']}-{digest}"
+
+
+async def get_checkout_session(key: str) -> dict | None:
+    """再利用できる作成済みのセッション（なければ None）"""
+    session = await cache.aget(f"{CACHE_KEY_PREFIX}{key}")
+    if session is None:
+        return None
+    remaining = session["expires_at"] - time.time()
+    if remaining < get_checkout_settings()["REUSE_MIN_REMAINING"]:
+        return None
+    return session
+
+
+async def remember_checkout_session(key: str, session_id: str, url: str, expires_at):
+    """作成したセッションを期限まで保持"""
+    timeout = int(expires_at - time.time())
+    if timeout <= 0:
+        return
+    await cache.aset(
+        f"{CACHE_KEY_PREFIX}{key}",
+        {"session_id": session_id, "checkout_url": url, "expires_at": expires_at},
+        timeout,
+    )
+
+
+async def get_article_price(article_id: int):
+    """販売中の記事の価格（カタログの読み直しが必要なときのみ DB を参照）"""
+    if price_catalog.needs_refresh():
+        await sync_to_async(price_catalog.maybe_refresh)()
+    return price_catalog.get(article_id)
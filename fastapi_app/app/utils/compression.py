@@ -0,0 +1,214 @@
+"""
+レスポンス圧縮の ASGI ミドルウェア（gzip・Brotli・Zstandard）
+
+Accept-Encoding の q 値とサーバー側の優先順位から圧縮方式を選び、
+許可された Content-Type かつ最小サイズ以上のレスポンスのみ圧縮する。
+秘密の値と入力の反映が同じ本文に載りうるレスポンス（HTML・Cookie を設定するもの）は
+BREACH 攻撃を避けるため圧縮しない。
+Brotli・Zstandard はそれぞれ brotli・zstandard パッケージがインストールされている
+場合のみ有効になる。
+"""
+
+import gzip
+import logging
+
+import anyio
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSION = {
+    "ENABLED": True,
+    "MINIMUM_SIZE": 1024,
+    "CONTENT_TYPES": [
+        "application/json",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+        "text/css",
+        "text/javascript",
+        "text/plain",
+    ],
+    # サーバー側の優先順位（q 値が同じ場合は先頭を選ぶ）
+    "ENCODINGS": ["br", "zstd", "gzip"],
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 5,
+    "ZSTD_LEVEL": 3,
+}
+
+
+# これより大きい本文はイベントループを止めないようスレッドで圧縮する
+THREAD_THRESHOLD = 64 * 1024
+
+
+def _compress_gzip(data: bytes, options: dict) -> bytes:
+    # mtime を固定して同じ入力から同じ出力を得る（キャッシュ・ETag のため）
+    return gzip.compress(data, compresslevel=options["GZIP_LEVEL"], mtime=0)
+
+
+CODECS = {"gzip": _compress_gzip}
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+else:
+
+    def _compress_brotli(data: bytes, options: dict) -> bytes:
+        return brotli.compress(data, quality=options["BROTLI_QUALITY"])
+
+    CODECS["br"] = _compress_brotli
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+else:
+
+    def _compress_zstd(data: bytes, options: dict) -> bytes:
+        return zstandard.ZstdCompressor(level=options["ZSTD_LEVEL"]).compress(data)
+
+    CODECS["zstd"] = _compress_zstd
+
+
+def get_compression_settings() -> dict:
+    """設定 BLOG_COMPRESSION を既定値とマージ"""
+    return {**DEFAULT_COMPRESSION, **getattr(settings, "BLOG_COMPRESSION", {})}
+
+
+def parse_accept_encoding(value: str) -> dict[str, float]:
+    """Accept-Encoding を {方式: q 値} に変換"""
+    accepted = {}
+    for part in value.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, number = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def negotiate_encoding(headers, options: dict | None = None) -> str | None:
+    """リクエストヘッダーから使用する圧縮方式を選ぶ（圧縮しない場合は None）"""
+    options = options or get_compression_settings()
+    if not options["ENABLED"]:
+        return None
+    header = next((value for name, value in headers if name == b"accept-encoding"), b"")
+    if not header:
+        return None
+
+    accepted = parse_accept_encoding(header.decode("latin-1"))
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in options["ENCODINGS"]:
+        if encoding not in CODECS:
+            continue
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, options: dict | None = None) -> bytes:
+    """指定した方式で圧縮"""
+    return CODECS[encoding](data, options or get_compression_settings())
+
+
+def is_compressible(headers, options: dict) -> bool:
+    """圧縮対象の Content-Type で、まだ圧縮されていないレスポンスか"""
+    content_type = b""
+    for name, value in headers:
+        # Cookie を設定するレスポンスは CSRF トークンなどの秘密を含みうる
+        if name in (b"content-encoding", b"set-cookie"):
+            return False
+        if name == b"content-type":
+            content_type = value
+    media_type = content_type.split(b";")[0].strip().decode("latin-1").lower()
+    return media_type in options["CONTENT_TYPES"]
+
+
+def add_vary(headers, value: bytes = b"Accept-Encoding"):
+    """Vary ヘッダーに値を追加（既に含まれていれば何もしない）"""
+    for index, (name, current) in enumerate(headers):
+        if name == b"vary":
+            tokens = [token.strip().lower() for token in current.split(b",")]
+            if value.lower() not in tokens and b"*" not in tokens:
+                headers[index] = (name, current + b", " + value)
+            return
+    headers.append((b"vary", value))
+
+
+class CompressionMiddleware:
+    """レスポンス本文をまとめて圧縮する
+
+    ストリーミングレスポンス（複数の body メッセージ）は圧縮せずにそのまま送る。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        options = get_compression_settings()
+        if not options["ENABLED"]:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(scope["headers"], options)
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                # 本文を見てから圧縮するか決めるため、送信を保留
+                start = message
+            elif message["type"] == "http.response.body":
+                headers = list(start.get("headers", []))
+                body = message.get("body", b"")
+                compressible = is_compressible(headers, options)
+                if compressible:
+                    add_vary(headers)
+                if (
+                    compressible
+                    and encoding is not None
+                    and not message.get("more_body")
+                    and start["status"] not in (204, 304)
+                    and len(body) >= options["MINIMUM_SIZE"]
+                ):
+                    if len(body) >= THREAD_THRESHOLD:
+                        compressed = await anyio.to_thread.run_sync(
+                            compress, body, encoding, options
+                        )
+                    else:
+                        compressed = compress(body, encoding, options)
+                    if len(compressed) < len(body):
+                        body = compressed
+                        headers = [
+                            (name, value)
+                            for name, value in headers
+                            if name != b"content-length"
+                        ]
+                        headers += [
+                            (b"content-encoding", encoding.encode()),
+                            (b"content-length", str(len(body)).encode()),
+                        ]
+                await send({**start, "headers": headers})
+                await send({**message, "body": body})
+                passthrough = True
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,98 @@
+"""
+パスのプレフィックスで ASGI アプリケーションを振り分ける最小限のルーター
+
+Starlette の Mount と同じく、振り分け先には ``path`` をそのまま渡し、
+``root_path`` にプレフィックスを追加する。ルーティングやミドルウェアの層を
+持たないため、Wagtail ページへのリクエストにかかるオーバーヘッドが小さい。
+"""
+
+import logging
+from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager
+
+logger = logging.getLogger(__name__)
+
+# 振り分け前に呼ばれるフック。ASGI アプリケーションを返すとそちらで処理する
+PreRoutingHook = Callable[[dict], Awaitable[Callable | None]]
+
+
+class PrefixDispatcher:
+    """プレフィックスごとの ASGI アプリケーションへ振り分ける
+
+    ``routes`` は ``(プレフィックス, アプリケーション)`` の列で、長いプレフィックスから
+    順に照合する。どれにも一致しないリクエストは ``default`` に渡す。
+    lifespan イベントは ``lifespan`` に渡したコンテキストマネージャーで処理する
+    （Django の ASGI ハンドラーは lifespan に対応していないため、振り分け先には渡さない）。
+    """
+
+    def __init__(
+        self,
+        routes,
+        default,
+        lifespan: Callable[..., AbstractAsyncContextManager] | None = None,
+        before_routing: PreRoutingHook | None = None,
+    ):
+        self.routes = sorted(
+            ((prefix.rstrip("/"), app) for prefix, app in routes),
+            key=lambda route: len(route[0]),
+            reverse=True,
+        )
+        self.default = default
+        self.lifespan = lifespan
+        self.before_routing = before_routing
+
+    def resolve(self, path: str):
+        """パスに対応するプレフィックスとアプリケーション"""
+        for prefix, app in self.routes:
+            if path.startswith(prefix) and path[len(prefix) : len(prefix) + 1] == "/":
+                return prefix, app
+        return "", self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.handle_lifespan(scope, receive, send)
+            return
+
+        if self.before_routing is not None:
+            app = await self.before_routing(scope)
+            if app is not None:
+                await app(scope, receive, send)
+                return
+
+        prefix, app = self.resolve(scope["path"])
+        if prefix:
+            root_path = scope.get("root_path", "")
+            scope = {
+                **scope,
+                "app_root_path": scope.get("app_root_path", root_path),
+                "root_path": root_path + prefix,
+            }
+        await app(scope, receive, send)
+
+    async def handle_lifespan(self, scope, receive, send):
+        """lifespan プロトコルの処理（startup から shutdown までコンテキストを保持）"""
+        message = await receive()
+        assert message["type"] == "lifespan.startup"
+        if self.lifespan is None:
+            await send({"type": "lifespan.startup.complete"})
+            await receive()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+        context = self.lifespan(self)
+        try:
+            await context.__aenter__()
+        except BaseException as e:
+            logger.exception("Application startup failed")
+            await send({"type": "lifespan.startup.failed", "message": str(e)})
+            raise
+        await send({"type": "lifespan.startup.complete"})
+
+        await receive()
+        try:
+            await context.__aexit__(None, None, None)
+        except BaseException as e:
+            logger.exception("Application shutdown failed")
+            await send({"type": "lifespan.shutdown.failed", "message": str(e)})
+            raise
+        await send({"type": "lifespan.shutdown.complete"})
@@ -0,0 +1,85 @@
+"""
+起動時の import 時間のプロファイル
+
+``python -X importtime`` の出力を集計し、累積時間の大きいモジュールを報告する。
+-X importtime は起動時にしか有効にできないため、別プロセスで対象モジュールを
+import して計測する（Django などを読み込む前に呼べるよう、このモジュールは
+標準ライブラリのみに依存する）。
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# プロジェクトルート（main_asgi.py のあるディレクトリ）
+ROOT = Path(__file__).resolve().parents[3]
+
+HEADER = "import time:"
+
+
+def parse_importtime(lines) -> list[dict]:
+    """-X importtime の出力行を {module, self_us, cumulative_us, depth} の列に変換"""
+    entries = []
+    for line in lines:
+        if not line.startswith(HEADER):
+            continue
+        fields = line[len(HEADER) :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 見出し行（self [us] | cumulative | imported package）
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        entries.append(
+            {
+                "module": module,
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+                # パッケージ名の前の空白 2 つで 1 段
+                "depth": (len(name) - len(module) - 1) // 2,
+            }
+        )
+    return entries
+
+
+def top_imports(entries: list[dict], limit: int = 20, key: str = "cumulative_us"):
+    """指定した時間の大きい順に上位のモジュールを返す"""
+    return sorted(entries, key=lambda entry: entry[key], reverse=True)[:limit]
+
+
+def total_import_time(entries: list[dict]) -> int:
+    """トップレベルの import の累積時間の合計（マイクロ秒）"""
+    return sum(entry["cumulative_us"] for entry in entries if entry["depth"] == 0)
+
+
+def format_report(entries: list[dict], limit: int = 20) -> str:
+    """累積時間の上位モジュールを表形式の文字列にする"""
+    total = total_import_time(entries)
+    lines = [
+        f"Import time: {total / 1000:.1f} ms total, top {limit} by cumulative time",
+        f"{'cumulative':>12}{'self':>10}{'share':>8}  module",
+    ]
+    for entry in top_imports(entries, limit):
+        share = entry["cumulative_us"] / total * 100 if total else 0.0
+        lines.append(
+            f"{entry['cumulative_us'] / 1000:>9.1f} ms"
+            f"{entry['self_us'] / 1000:>7.1f} ms{share:>7.1f}%  {entry['module']}"
+        )
+    return "\n".join(lines)
+
+
+def profile_imports(module: str = "main_asgi", env: dict | None = None) -> list[dict]:
+    """別プロセスで module を import し、各モジュールの import 時間を取得する"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        last_line = (result.stderr.strip().splitlines() or [""])[-1]
+        raise RuntimeError(f"Importing {module} failed: {last_line}")
+    return parse_importtime(result.stderr.splitlines())
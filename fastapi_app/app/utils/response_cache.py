@@ -0,0 +1,146 @@
+"""
+ワーカー間で共有するレスポンスキャッシュの ASGI ミドルウェア
+"""
+
+import logging
+import struct
+
+from blog.shmcache import get_shared_cache, get_shared_cache_settings
+
+from .compression import negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# ステータス・ヘッダー数・ヘッダー部のバイト数
+_RESPONSE_HEADER = struct.Struct("<HHI")
+_HEADER_LENGTHS = struct.Struct("<HH")
+
+# 共有キャッシュに載せないレスポンス
+_UNCACHEABLE_DIRECTIVES = (b"no-store", b"private")
+
+
+def encode_response(status: int, headers, body: bytes) -> bytes:
+    """ステータス・ヘッダー・本文を1つのバイト列にまとめる"""
+    encoded = b"".join(
+        _HEADER_LENGTHS.pack(len(name), len(value)) + name + value
+        for name, value in headers
+    )
+    return _RESPONSE_HEADER.pack(status, len(headers), len(encoded)) + encoded + body
+
+
+def decode_response(data: bytes):
+    """encode_response の逆変換（本文はコピーせず memoryview で返す）"""
+    view = memoryview(data)
+    status, count, length = _RESPONSE_HEADER.unpack_from(view)
+    position = _RESPONSE_HEADER.size
+    headers = []
+    for _ in range(count):
+        name_length, value_length = _HEADER_LENGTHS.unpack_from(view, position)
+        position += _HEADER_LENGTHS.size
+        name = bytes(view[position : position + name_length])
+        position += name_length
+        headers.append((name, bytes(view[position : position + value_length])))
+        position += value_length
+    return status, headers, view[_RESPONSE_HEADER.size + length :]
+
+
+def is_cacheable_request(scope, options) -> bool:
+    """共有キャッシュの対象となる GET リクエストか"""
+    if scope["type"] != "http" or scope["method"] != "GET":
+        return False
+    path = scope["path"]
+    if not any(path.startswith(prefix) for prefix in options["PATHS"]):
+        return False
+    if any(path.startswith(prefix) for prefix in options["EXCLUDE"]):
+        return False
+    return not any(name == b"authorization" for name, _ in scope["headers"])
+
+
+class SharedCacheMiddleware:
+    """GET レスポンスを共有メモリにキャッシュし、全ワーカーから返す
+
+    キャッシュ済みのレスポンスはエンコード済みのバイト列をそのまま送信する。
+    CompressionMiddleware より外側に置くと、圧縮済みの本文がキャッシュされ、
+    よく読まれるレスポンスの圧縮は方式ごとに1回で済む。
+    CORS などリクエストごとに変わるヘッダーはこのミドルウェアの外側で付与する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        shared_cache = get_shared_cache() if scope["type"] == "http" else None
+        if shared_cache is None or not is_cacheable_request(
+            scope, get_shared_cache_settings()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # 圧縮方式ごとに別エントリとし、圧縮済みの本文をそのまま再利用する
+        key = (
+            f"{scope['path']}?{scope['query_string'].decode('latin-1')}"
+            f"#{negotiate_encoding(scope['headers']) or 'identity'}"
+        )
+        cached = shared_cache.get(key)
+        if cached is not None:
+            status, headers, body = decode_response(cached)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": [*headers, (b"x-cache", b"HIT")],
+                }
+            )
+            await send({"type": "http.response.body", "body": bytes(body)})
+            return
+
+        # 生成中に無効化された場合は格納時点で失効させる
+        generation = shared_cache.generation
+        response = {"status": 0, "headers": [], "body": [], "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+                message = {
+                    **message,
+                    "headers": [*response["headers"], (b"x-cache", b"MISS")],
+                }
+            elif (
+                message["type"] == "http.response.body" and response["body"] is not None
+            ):
+                body = message.get("body", b"")
+                response["size"] += len(body)
+                if response["size"] > shared_cache.max_size:
+                    # 格納できない大きさになった時点でバッファリングをやめる
+                    response["body"] = None
+                else:
+                    response["body"].append(body)
+                    if not message.get("more_body"):
+                        self.store(shared_cache, key, response, generation)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def store(shared_cache, key, response, generation):
+        """成功したレスポンスのうち、共有してよいものだけを格納"""
+        if response["status"] != 200:
+            return
+        for name, value in response["headers"]:
+            if name == b"set-cookie":
+                return
+            if name == b"cache-control" and any(
+                directive in value for directive in _UNCACHEABLE_DIRECTIVES
+            ):
+                return
+        try:
+            shared_cache.set(
+                key,
+                encode_response(
+                    response["status"], response["headers"], b"".join(response["body"])
+                ),
+                generation=generation,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store shared cache entry {key}: {e!s}")
@@ -0,0 +1,176 @@
+"""
+イベントループを止めない Stripe API クライアント
+
+Stripe SDK の同期メソッド（stripe.checkout.Session.create など）を async のエンド
+ポイントから直接呼ぶと、Stripe との通信が終わるまでワーカーの全リクエストが止まる。
+ここでは次のどちらかで呼び出す。
+
+- async: SDK の非同期メソッド（*_async）と、キープアライブの接続プールを持つ
+  SDK の HTTPXClient を共有する StripeClient（既定）
+- thread: 同期メソッドを MAX_CONNECTIONS 本のスレッドプールで実行する
+
+どちらも 1 回の呼び出し（SDK のリトライを含む）全体に CALL_TIMEOUT の上限を設け、
+同時に実行する呼び出しを MAX_CONNECTIONS までに抑える。
+"""
+
+import asyncio
+import logging
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import anyio
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRIPE_CLIENT = {
+    # "async"・"thread"。None は httpx があれば async
+    "TRANSPORT": None,
+    # Stripe API のベース URL（ローカルのスタブ・stripe-mock 用）。None は本番の API
+    "API_BASE": None,
+    # 1 回の呼び出し全体（リトライを含む）の上限秒数
+    "CALL_TIMEOUT": 15.0,
+    # 1 回の HTTP リクエストの上限秒数
+    "TIMEOUT": 10.0,
+    "CONNECT_TIMEOUT": 3.0,
+    "MAX_RETRIES": 1,
+    # 同時に実行する呼び出し（thread ではスレッド数）の上限
+    "MAX_CONNECTIONS": 20,
+}
+
+# Stripe SDK は import に時間がかかるため、最初に使うときに読み込む
+_stripe = None
+
+# イベントループごとのクライアント（httpx の接続はループをまたいで使えないため）
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_stripe():
+    """Stripe SDK を読み込み、API キーを設定して返す"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        from dotenv import load_dotenv
+
+        # 環境変数を読み込み
+        load_dotenv()
+        # Stripe API キーを設定
+        stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+        _stripe = stripe
+    return _stripe
+
+
+def get_stripe_client_settings() -> dict:
+    """設定 STRIPE_CLIENT を既定値とマージ（API_BASE は環境変数 STRIPE_API_BASE でも指定可）"""
+    options = {**DEFAULT_STRIPE_CLIENT, **getattr(settings, "STRIPE_CLIENT", {})}
+    if options["API_BASE"] is None:
+        options["API_BASE"] = os.getenv("STRIPE_API_BASE") or None
+    return options
+
+
+def _build_http_client(options: dict):
+    """キープアライブの接続プールを持つ SDK の httpx クライアント（httpx がなければ None）
+
+    SDK は httpx の接続数の上限を指定できないため、同時に実行する呼び出しの数は
+    call_stripe の limiter で抑える。
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    import stripe
+
+    return stripe.HTTPXClient(
+        timeout=httpx.Timeout(options["TIMEOUT"], connect=options["CONNECT_TIMEOUT"])
+    )
+
+
+def _create_client(options: dict):
+    """StripeClient と、非同期呼び出しに使う HTTP クライアント（thread では None）"""
+    stripe = get_stripe()
+    http_client = None
+    if options["TRANSPORT"] != "thread":
+        http_client = _build_http_client(options)
+        if http_client is None and options["TRANSPORT"] == "async":
+            logger.warning("httpx is not installed; calling Stripe in threads instead")
+    client = stripe.StripeClient(
+        os.getenv("STRIPE_SECRET_KEY") or stripe.api_key,
+        base_addresses={"api": options["API_BASE"]} if options["API_BASE"] else {},
+        max_network_retries=options["MAX_RETRIES"],
+        http_client=http_client,
+    )
+    return client, http_client
+
+
+def _current_entry(options: dict) -> dict:
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(loop)
+    if entry is None:
+        client, http_client = _create_client(options)
+        executor = None
+        if http_client is None:
+            # 待ちきれずに戻った呼び出しもスレッドを使い続けるため、スレッド数で上限を設ける
+            executor = ThreadPoolExecutor(
+                max_workers=options["MAX_CONNECTIONS"], thread_name_prefix="stripe"
+            )
+        entry = _clients[loop] = {
+            "client": client,
+            "http_client": http_client,
+            "transport": "async" if http_client is not None else "thread",
+            "limiter": anyio.CapacityLimiter(options["MAX_CONNECTIONS"]),
+            "executor": executor,
+        }
+    return entry
+
+
+def get_stripe_client():
+    """現在のイベントループで共有する StripeClient"""
+    return _current_entry(get_stripe_client_settings())["client"]
+
+
+def _resolve(target, path: str):
+    for name in path.split("."):
+        target = getattr(target, name)
+    return target
+
+
+async def call_stripe(path: str, **kwargs):
+    """StripeClient のメソッドを呼ぶ（例: call_stripe("checkout.sessions.create", params=...)）
+
+    CALL_TIMEOUT を超えると TimeoutError を送出する。
+    """
+    options = get_stripe_client_settings()
+    entry = _current_entry(options)
+    with anyio.fail_after(options["CALL_TIMEOUT"]):
+        if entry["transport"] == "async":
+            async with entry["limiter"]:
+                return await _resolve(entry["client"], f"{path}_async")(**kwargs)
+        # 待ちきれずに戻った場合もスレッドは応答を受け取るまで続き、その間は
+        # スレッドプールの 1 本を占有する（開始前の呼び出しは取り消される）
+        return await asyncio.get_running_loop().run_in_executor(
+            entry["executor"], partial(_resolve(entry["client"], path), **kwargs)
+        )
+
+
+async def close_stripe_client():
+    """現在のイベントループのクライアントの接続を閉じる（ワーカーの終了時）"""
+    entry = _clients.pop(asyncio.get_running_loop(), None)
+    if entry is None:
+        return
+    if entry["executor"] is not None:
+        entry["executor"].shutdown(wait=False, cancel_futures=True)
+    if entry["http_client"] is not None:
+        await entry["http_client"].close_async()
+
+
+def sync_stripe_client():
+    """イベントループの外（管理コマンドなど）で同期メソッドを呼ぶ StripeClient
+
+    ループごとのクライアントとは別に作成する（HTTP クライアントは SDK の同期用の既定値）。
+    呼び出し元のスレッドで実行するため、スレッドプールは作らない。
+    """
+    options = {**get_stripe_client_settings(), "TRANSPORT": "thread"}
+    client, _ = _create_client(options)
+    return client
@@ -1,9 +1,14 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.asgi import get_asgi_application
-from fastapi import FastAPI
+from django.utils.module_loading import import_string
 from fastapi.staticfiles import StaticFiles
 
 # Django 設定を先に初期化
@@ -24,34 +29,117 @@ django.setup()
 django_asgi_app = get_asgi_application()
 
 # FastAPI アプリケーションをインポート（Django 設定初期化後）
-from fastapi_app.app.main import app as fastapi_app  # noqa: E402
-
-# メイン ASGI アプリケーションの作成
-app = FastAPI(
-    title="totonoe_template Main App",
-    description="Django (Wagtail) + FastAPI 統合アプリケーション",
-    version="0.1.0",
+from blog.dbpool import (
+    get_pools,
+    prewarm_pools,
+    shutdown_read_executor,
+    start_read_executor,
+)
+from blog.mail import get_mail_queue_settings, mail_worker
+from blog.pageviews import view_counter
+from blog.warmup import (
+    build_warmup_paths,
+    get_warmup_settings,
+    warm_caches,
 )
+from blog.webhooks import get_webhook_inbox_settings, worker_pool
+from fastapi_app.app.main import app as fastapi_app
+from fastapi_app.app.utils.dispatch import PrefixDispatcher
+from fastapi_app.app.utils.stripe_client import close_stripe_client
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_caches_on_startup(app):
+    """起動直後にバックグラウンドでキャッシュを温める（設定の上限内で実行）"""
+    warmup = get_warmup_settings()
+    paths = await sync_to_async(build_warmup_paths)(
+        warmup["LIST_PAGES"], warmup["PAGE_SIZE"], warmup["TOP_POSTS"]
+    )
+    await warm_caches(
+        app,
+        paths,
+        concurrency=warmup["CONCURRENCY"],
+        budget_seconds=warmup["BUDGET_SECONDS"],
+        host=warmup["HOST"],
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """起動時の初期化（振り分け先のアプリには lifespan を渡さないためここで行う）"""
+    if await sync_to_async(get_pools)():
+        # 記事 API の読み取りを最大接続数と同じ数のスレッドで実行し、事前に接続しておく
+        start_read_executor()
+        await sync_to_async(prewarm_pools)()
+
+    if getattr(settings, "BLOG_READ_MODEL_ENABLED", False):
+        from blog.readmodel import get_read_model
+
+        # 最初のリクエストを待たずに記事一覧のリードモデルを構築
+        await sync_to_async(get_read_model)()
+
+    # 前回の終了時に残った Stripe Webhook のイベント・送信待ちのメールを処理する
+    if get_webhook_inbox_settings()["POLL_INTERVAL"] > 0:
+        worker_pool.start()
+    if get_mail_queue_settings()["POLL_INTERVAL"] > 0:
+        mail_worker.start()
+
+    # 起動完了（リクエスト受付）を遅らせないよう、ウォームアップは別タスクで実行
+    warmup_task = None
+    if get_warmup_settings()["ON_STARTUP"]:
+        warmup_task = asyncio.create_task(warm_caches_on_startup(app))
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    # 終了するワーカーに残っている閲覧数を書き出す
+    try:
+        await sync_to_async(view_counter.flush)()
+    except Exception as e:
+        logger.error(f"Post view flush failed on shutdown: {e!s}")
+    # 処理中の Webhook・メールのバッチが終わるのを待つ（残りは次の起動時に処理される）
+    await sync_to_async(worker_pool.stop, thread_sensitive=False)()
+    await sync_to_async(mail_worker.stop, thread_sensitive=False)()
+    # Stripe API とのキープアライブ接続を閉じる
+    await close_stripe_client()
+    await sync_to_async(shutdown_read_executor, thread_sensitive=False)()
 
-# FastAPI ルーターを /api パスにマウント
-app.mount("/api", fastapi_app)
 
 # 開発時の静的ファイル配信（本番では Nginx などで処理）
 BASE_DIR = Path(__file__).resolve().parent
 # 静的ファイル用のディレクトリパス
 static_dir = BASE_DIR / "django_project" / "static"  # 開発時
-staticfiles_dir = BASE_DIR / "django_project" / "staticfiles"  # collectstaticで収集されたファイル
+staticfiles_dir = (
+    BASE_DIR / "django_project" / "staticfiles"
+)  # collectstaticで収集されたファイル
 media_dir = BASE_DIR / "django_project" / "media"
 
+# FastAPI ルーターを /api パスに振り分け
+routes = [("/api", fastapi_app)]
+
 # collectstaticで収集されたファイルを優先
 if staticfiles_dir.exists():
-    app.mount("/static", StaticFiles(directory=str(staticfiles_dir)), name="static")
+    routes.append(("/static", StaticFiles(directory=str(staticfiles_dir))))
 elif static_dir.exists():
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+    routes.append(("/static", StaticFiles(directory=str(static_dir))))
 
 if media_dir.exists():
-    app.mount("/media", StaticFiles(directory=str(media_dir)), name="media")
+    routes.append(("/media", StaticFiles(directory=str(media_dir))))
 
-# Django アプリケーションをルートパスにマウント
-# 注意: これは最後に行う必要がある（他のパターンがキャッチされる前に）
-app.mount("/", django_asgi_app)
+# 振り分け前のフック（設定 ASGI_PRE_ROUTING_HOOK にドット区切りのパスで指定）
+before_routing = (
+    import_string(settings.ASGI_PRE_ROUTING_HOOK)
+    if getattr(settings, "ASGI_PRE_ROUTING_HOOK", None)
+    else None
+)
+
+# メイン ASGI アプリケーションの作成
+# プレフィックスで振り分けるだけの軽量なルーターで、それ以外のパスは Django（Wagtail）へ
+app = PrefixDispatcher(
+    routes,
+    # Wagtail ページ・管理画面は CSRF トークンを含むため圧縮しない（BREACH 対策）。
+    # 圧縮は FastAPI 側の API レスポンスのみ
+    default=django_asgi_app,
+    lifespan=lifespan,
+    before_routing=before_routing,
+)
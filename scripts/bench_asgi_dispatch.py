@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Benchmark per-request routing overhead of the top-level ASGI application.
+
+Usage:
+    python scripts/bench_asgi_dispatch.py [--requests 20000]
+
+main_asgi の振り分け層だけを比較するため、振り分け先を空のレスポンスを返す
+ASGI アプリケーションに差し替え、以前の構成（外側の FastAPI に mount）と
+PrefixDispatcher で 1 リクエストあたりの所要時間を計測する。
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+
+# プロジェクトルートを import パスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi_app.app.utils.dispatch import PrefixDispatcher
+
+PATHS = {
+    "wagtail page": "/blog/my-first-post/",
+    "api": "/api/posts/?limit=20",
+    "static": "/static/css/site.css",
+}
+
+
+async def empty_app(scope, receive, send):
+    """ルーティング以外のコストを含めないための空のアプリケーション"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def build_fastapi_composition():
+    """以前の main_asgi と同じ構成（外側の FastAPI に各アプリを mount）"""
+    app = FastAPI(title="totonoe_template Main App")
+    app.mount("/api", empty_app)
+    app.mount("/static", empty_app)
+    app.mount("/media", empty_app)
+    app.mount("/", empty_app)
+    return app
+
+
+def build_dispatcher():
+    return PrefixDispatcher(
+        [("/api", empty_app), ("/static", empty_app), ("/media", empty_app)],
+        default=empty_app,
+    )
+
+
+def make_scope(path: str) -> dict:
+    path, _, query = path.partition("?")
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+
+
+async def measure(app, path: str, requests: int) -> float:
+    """1 リクエストあたりの平均所要時間（マイクロ秒）"""
+    scope = make_scope(path)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # ウォームアップ（ミドルウェアスタックの構築など）
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def run(requests: int):
+    apps = {
+        "FastAPI mount": build_fastapi_composition(),
+        "PrefixDispatcher": build_dispatcher(),
+    }
+    print(f"{'path':<16}" + "".join(f"{name:>20}" for name in apps) + f"{'saved':>12}")
+    for label, path in PATHS.items():
+        results = [await measure(app, path, requests) for app in apps.values()]
+        print(
+            f"{label:<16}"
+            + "".join(f"{result:>17.2f} µs" for result in results)
+            + f"{results[0] - results[1]:>9.2f} µs"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""Benchmark response compression for post list payloads.
+
+Usage:
+    python scripts/bench_compression.py [--posts 20 100] [--repeat 50]
+
+合成した記事一覧 API のレスポンス（本文 HTML を含む JSON）を各方式で圧縮し、
+1リクエストあたりの CPU 時間（中央値）と削減バイト数を計測する。
+あわせて、共有レスポンスキャッシュに格納した圧縮済みエントリを読む場合の
+コストを計測し、リクエストごとに圧縮する場合と比較する。DB にはアクセスしない。
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import django
+
+# プロジェクトルートを import パスに追加して Django を初期化
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "django_project.totonoe_template.settings.dev"
+)
+django.setup()
+
+from blog.shmcache import SharedResponseCache
+from fastapi_app.app.utils.compression import (
+    CODECS,
+    compress,
+    get_compression_settings,
+)
+
+WORDS = [
+    "wagtail",
+    "django",
+    "fastapi",
+    "blog",
+    "post",
+    "page",
+    "cache",
+    "query",
+    "index",
+    "template",
+    "response",
+    "request",
+    "worker",
+    "memory",
+    "async",
+    "python",
+    "deploy",
+    "server",
+    "content",
+]
+
+LEVELS = {
+    "gzip": ("GZIP_LEVEL", [1, 6, 9]),
+    "br": ("BROTLI_QUALITY", [1, 5, 9]),
+    "zstd": ("ZSTD_LEVEL", [1, 3, 10]),
+}
+
+
+def synthetic_list_response(posts: int, rng: random.Random) -> bytes:
+    """記事一覧 API と同じ形の JSON"""
+
+    def sentence(count):
+        return " ".join(rng.choice(WORDS) for _ in range(count)).capitalize() + "."
+
+    items = [
+        {
+            "id": index,
+            "title": sentence(6),
+            "intro": sentence(20),
+            "date": "2024-01-01",
+            "slug": f"post-{index}",
+            "first_published_at": "2024-01-01T00:00:00+00:00",
+            "body": "".join(f"<p>{sentence(40)}</p>" for _ in range(12)),
+            "excerpt": sentence(30),
+            "word_count": 480,
+            "reading_time": 3,
+            "prev_post": None,
+            "next_post": None,
+        }
+        for index in range(posts)
+    ]
+    return json.dumps(
+        {
+            "posts": items,
+            "pagination": {"limit": posts, "offset": 0, "total_count": 1000},
+            "meta": {"execution_time": 0.01, "search_query": None},
+        }
+    ).encode()
+
+
+def cpu_time(func, repeat: int) -> float:
+    """CPU 時間の中央値（マイクロ秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time_ns()
+        func()
+        samples.append((time.process_time_ns() - start) / 1000)
+    return statistics.median(samples)
+
+
+def bench(posts: int, repeat: int, rng: random.Random, shared_cache):
+    payload = synthetic_list_response(posts, rng)
+    print(f"\n## {posts} posts per page ({len(payload):,} bytes uncompressed)")
+    print(f"{'encoding':<14}{'CPU/request':>14}{'bytes':>12}{'saved':>10}")
+
+    for encoding, (option, levels) in LEVELS.items():
+        if encoding not in CODECS:
+            print(f"{encoding:<14}{'(not installed)':>14}")
+            continue
+        for level in levels:
+            options = {**get_compression_settings(), option: level}
+            compressed = compress(payload, encoding, options)
+            elapsed = cpu_time(
+                lambda encoding=encoding, options=options: compress(
+                    payload, encoding, options
+                ),
+                repeat,
+            )
+            saved = 1 - len(compressed) / len(payload)
+            print(
+                f"{f'{encoding} {level}':<14}{elapsed:>11.1f} µs"
+                f"{len(compressed):>12,}{saved:>9.1%}"
+            )
+
+    # 圧縮済みエントリをキャッシュから返す場合（圧縮はエントリごとに1回）
+    options = get_compression_settings()
+    for encoding in options["ENCODINGS"]:
+        if encoding not in CODECS:
+            continue
+        key = f"/api/posts/?limit={posts}#{encoding}"
+        shared_cache.set(key, compress(payload, encoding, options))
+        elapsed = cpu_time(lambda key=key: shared_cache.get(key), repeat)
+        print(f"{f'cached {encoding}':<14}{elapsed:>11.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    shared_cache = SharedResponseCache(
+        f"bench-compression-{uuid.uuid4().hex[:8]}", [(1024 * 1024, 16)]
+    )
+    try:
+        rng = random.Random(42)
+        for posts in args.posts:
+            bench(posts, args.repeat, rng, shared_cache)
+    finally:
+        shared_cache.close(unlink=True)
+
+
+if __name__ == "__main__":
+    main()
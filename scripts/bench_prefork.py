@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Benchmark per-worker memory and cold start of the preforking server.
+
+Usage:
+    python scripts/bench_prefork.py [--workers 4] [--requests 200]
+
+次の3構成を起動し、全ワーカーの起動完了までの時間と、リクエストを処理した後の
+各プロセスのメモリ（RSS・PSS・USS）を比較する。
+
+- server.py（マスターで読み込み、gc.freeze() してから fork）
+- server.py --no-freeze
+- N 個の独立した uvicorn プロセス（それぞれが読み込みを行う）
+
+PSS は共有ページをプロセス数で按分した値で、合計がホスト全体の実使用量になる。
+Linux の /proc/<pid>/smaps_rollup が必要。
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+READY_MESSAGE = "Application startup complete"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory(pid: int) -> dict[str, int]:
+    """smaps_rollup から RSS・PSS・USS（KB）を取得"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                values[name] = int(rest.split()[0])
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "uss": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def launch(command: list[str], ready: threading.Semaphore):
+    """ログの起動完了メッセージごとに ready を解放する"""
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        text=True,
+    )
+
+    def watch():
+        for line in process.stderr:
+            if READY_MESSAGE in line:
+                ready.release()
+
+    threading.Thread(target=watch, daemon=True).start()
+    return process
+
+
+def wait_ready(ready: threading.Semaphore, count: int, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    for _ in range(count):
+        if not ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise RuntimeError("Workers did not start in time")
+
+
+def send_requests(ports: list[int], requests: int):
+    for index in range(requests):
+        url = f"http://127.0.0.1:{ports[index % len(ports)]}/api/"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+
+
+def bench_prefork(workers: int, requests: int, freeze: bool) -> dict:
+    port = free_port()
+    ready = threading.Semaphore(0)
+    command = [sys.executable, "server.py", "--port", str(port)]
+    command += ["--workers", str(workers)] + ([] if freeze else ["--no-freeze"])
+    start = time.perf_counter()
+    master = launch(command, ready)
+    try:
+        wait_ready(ready, workers)
+        cold_start = time.perf_counter() - start
+        send_requests([port], requests)
+        return {
+            "cold_start": cold_start,
+            "master": memory(master.pid),
+            "workers": [memory(pid) for pid in children(master.pid)],
+        }
+    finally:
+        master.terminate()
+        master.wait(timeout=60)
+
+
+def bench_independent(workers: int, requests: int) -> dict:
+    ports = [free_port() for _ in range(workers)]
+    ready = threading.Semaphore(0)
+    start = time.perf_counter()
+    processes = [
+        launch(
+            [sys.executable, "-m", "uvicorn", "main_asgi:app", "--port", str(port)],
+            ready,
+        )
+        for port in ports
+    ]
+    try:
+        wait_ready(ready, workers)
+        cold_start = time.perf_counter() - start
+        send_requests(ports, requests)
+        return {
+            "cold_start": cold_start,
+            "master": None,
+            "workers": [memory(process.pid) for process in processes],
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=60)
+
+
+def report(name: str, result: dict):
+    workers = result["workers"]
+    processes = workers + ([result["master"]] if result["master"] else [])
+
+    def average(key):
+        return sum(worker[key] for worker in workers) / len(workers) / 1024
+
+    total_pss = sum(process["pss"] for process in processes) / 1024
+    print(
+        f"{name:<22}{result['cold_start']:>10.2f} s"
+        f"{average('rss'):>12.1f}{average('pss'):>12.1f}{average('uss'):>12.1f}"
+        f"{total_pss:>14.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "django_project.totonoe_template.settings.dev"
+    )
+    print(f"{args.workers} workers, {args.requests} requests (memory in MB)")
+    print(
+        f"{'':<22}{'cold start':>12}{'RSS/worker':>12}{'PSS/worker':>12}"
+        f"{'USS/worker':>12}{'total PSS':>14}"
+    )
+    report("prefork + gc.freeze", bench_prefork(args.workers, args.requests, True))
+    report("prefork", bench_prefork(args.workers, args.requests, False))
+    report("independent uvicorn", bench_independent(args.workers, args.requests))
+
+
+if __name__ == "__main__":
+    main()
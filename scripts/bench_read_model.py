@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Benchmark the in-memory post read model at 10k, 100k and 1M posts.
+
+Usage:
+    python scripts/bench_read_model.py [--sizes 10000 100000 1000000] [--repeat 20]
+
+合成データでスナップショットを構築し、代表的な一覧クエリと差分適用の
+所要時間（中央値）を計測する。DB にはアクセスしない。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import django
+import numpy as np
+
+# プロジェクトルートを import パスに追加して Django を初期化
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "django_project.totonoe_template.settings.dev"
+)
+django.setup()
+
+from blog.readmodel import PostReadModel, apply_delta, build_snapshot
+
+TAG_COUNT = 200
+PARENT_COUNT = 20
+TAGS_PER_POST = 3
+
+QUERIES = {
+    "latest page": {},
+    "deep page (offset 5000)": {"offset": 5000},
+    "date range": {"date_from": date(2023, 1, 1), "date_to": date(2023, 12, 31)},
+    "parent": {"parent": 7},
+    "tag any (2)": {"tags": ["tag-1", "tag-2"]},
+    "tag all (2)": {"tags": ["tag-1", "tag-2"], "tag_mode": "all"},
+    "parent + tag + date": {
+        "parent": 3,
+        "tags": ["tag-5"],
+        "date_from": date(2022, 1, 1),
+    },
+    "order=published": {"order": "published"},
+}
+
+
+def synthetic_columns(size: int, rng: np.random.Generator) -> dict:
+    """合成した記事の列データ"""
+    start = date(2015, 1, 1).toordinal()
+    end = date(2025, 12, 31).toordinal()
+    tag_ids = rng.integers(0, TAG_COUNT, size=(size, TAGS_PER_POST))
+    return {
+        "ids": np.arange(1, size + 1),
+        "dates": rng.integers(start, end, size=size),
+        "published": rng.integers(1_400_000_000, 1_800_000_000, size=size) * 10**6,
+        "parents": rng.integers(0, PARENT_COUNT, size=size),
+        "page_tags": [[f"tag-{tag}" for tag in row] for row in tag_ids.tolist()],
+    }
+
+
+def timed(func, repeat: int) -> float:
+    """中央値（ミリ秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench(size: int, repeat: int, rng: np.random.Generator):
+    columns = synthetic_columns(size, rng)
+
+    start = time.perf_counter()
+    snapshot = build_snapshot(**columns)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    model = PostReadModel()
+    model._snapshot = snapshot
+
+    print(f"\n## {size:,} posts")
+    print(f"{'build snapshot':<28}{build_ms:>10.2f} ms")
+    for name, params in QUERIES.items():
+        elapsed = timed(lambda params=params: model.query(**params), repeat)
+        total = model.query(**params)[1]
+        print(f"{name:<28}{elapsed:>10.3f} ms  ({total:,} matches)")
+
+    # 1記事の公開（差分適用＝行の差し替えと並び替え配列の再計算）
+    delta = synthetic_columns(1, rng)
+    delta["ids"] = np.array([size // 2])
+    elapsed = timed(
+        lambda: apply_delta(snapshot, {size // 2}, delta, token=1), max(3, repeat // 4)
+    )
+    print(f"{'apply 1-post delta':<28}{elapsed:>10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    for size in args.sizes:
+        bench(size, args.repeat, rng)
+
+
+if __name__ == "__main__":
+    main()
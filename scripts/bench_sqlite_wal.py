@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""Benchmark concurrent reads while an editor publishes, with and without WAL.
+
+Usage:
+    python scripts/bench_sqlite_wal.py [--readers 8] [--duration 5] [--posts 100]
+
+マイグレーション済みの SQLite データベースを一時ディレクトリに作り、次の 2 通りで
+同じ負荷をかける。
+
+- rollback journal: 以前の設定（BLOG_SQLITE_PROFILE 無効、journal_mode=DELETE）
+- WAL profile: blog.sqlite の PRAGMA（WAL・synchronous=NORMAL など）
+
+負荷は、管理画面で記事を公開し続ける編集者 1 人（save_revision().publish()、
+公開時のシグナル処理を含む）と、記事一覧を読み続ける --readers 個のプロセス。
+読み取りのスループット・レイテンシと公開の所要時間を比較する。
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "rollback journal": {"ENABLED": False},
+    "WAL profile": {"ENABLED": True},
+}
+
+
+def setup_django(path: str, profile: dict):
+    """一時データベースを使うよう設定を書き換えてから Django を初期化"""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "django_project.totonoe_template.settings.dev"
+    )
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = path
+    settings.BLOG_SQLITE_PROFILE = {**settings.BLOG_SQLITE_PROFILE, **profile}
+    settings.RELATED_POSTS_AUTO_UPDATE = False
+
+    import django
+
+    django.setup()
+
+
+def prepare(path: str, posts: int):
+    """マイグレーションを実行し、ブログ記事を作成（ロールバックジャーナルのまま）"""
+    setup_django(path, MODES["rollback journal"])
+    from datetime import date, timedelta
+
+    from django.core.management import call_command
+    from wagtail.models import Page
+
+    from blog.models import BlogIndexPage, BlogPage
+
+    call_command("migrate", verbosity=0)
+    root = Page.get_first_root_node()
+    index = root.add_child(
+        instance=BlogIndexPage(title="Bench", slug="bench", intro="Benchmark")
+    )
+    for number in range(posts):
+        page = BlogPage(
+            title=f"Post {number}",
+            slug=f"post-{number}",
+            intro="Benchmark post",
+            date=date(2024, 1, 1) + timedelta(days=number),
+            live=False,
+        )
+        index.add_child(instance=page)
+        page.save_revision().publish()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(path: str, mode: str, readers: int, duration: float) -> dict:
+    """編集者 1 人と読み取りプロセスを同時に動かし、結果を集計
+
+    GIL の影響を受けないよう、プリフォークのワーカーと同じく別プロセスで動かす。
+    """
+    setup_django(path, MODES[mode])
+    import multiprocessing
+
+    from django.db import connection
+
+    from blog.models import BlogPage
+
+    page_ids = list(BlogPage.objects.values_list("id", flat=True))
+    connection.close()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    deadline = time.monotonic() + duration
+
+    def reader():
+        latencies, errors = [], []
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                list(
+                    BlogPage.objects.live()
+                    .public()
+                    .order_by("-date", "-id")
+                    .values("id", "title", "date", "intro")[:20]
+                )
+                BlogPage.objects.live().public().count()
+                latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"read: {e!s}")
+        results.put(("read", latencies, errors))
+
+    def editor():
+        latencies, errors = [], []
+        try:
+            while time.monotonic() < deadline:
+                page = BlogPage.objects.get(id=random.choice(page_ids))
+                page.intro = f"Edited at {time.time()}"
+                start = time.perf_counter()
+                page.save_revision().publish()
+                latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"publish: {e!s}")
+        results.put(("publish", latencies, errors))
+
+    processes = [context.Process(target=editor)] + [
+        context.Process(target=reader) for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = [
+        value for kind, values, _ in collected if kind == "read" for value in values
+    ]
+    publishes = [
+        value for kind, values, _ in collected if kind == "publish" for value in values
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+    return {
+        "journal_mode": journal_mode,
+        "reads_per_second": len(reads) / duration,
+        "read_p50": percentile(reads, 0.5),
+        "read_p99": percentile(reads, 0.99),
+        "read_max": max(reads, default=0.0),
+        "publishes": len(publishes),
+        "publish_p50": statistics.median(publishes) if publishes else 0.0,
+        "errors": [error for _, _, errors in collected for error in errors],
+    }
+
+
+def report(mode: str, result: dict):
+    ms = 1000
+    print(
+        f"{mode:<18}{result['journal_mode']:>8}{result['reads_per_second']:>10.0f}"
+        f"{result['read_p50'] * ms:>10.2f}{result['read_p99'] * ms:>10.2f}"
+        f"{result['read_max'] * ms:>10.1f}{result['publishes']:>10}"
+        f"{result['publish_p50'] * ms:>12.1f}"
+    )
+    for error in result["errors"]:
+        print(f"  error: {error}")
+
+
+def subprocess_json(*args) -> dict:
+    """Django の設定をモードごとに分けるため、別プロセスで実行"""
+    output = subprocess.run(
+        [sys.executable, __file__, *args],
+        cwd=ROOT,
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1]) if output.strip() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--prepare", metavar="PATH", help=argparse.SUPPRESS)
+    parser.add_argument("--run", metavar="PATH", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare, args.posts)
+        return
+    if args.run:
+        print(json.dumps(run(args.run, args.mode, args.readers, args.duration)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        template = str(Path(directory) / "template.sqlite3")
+        print(f"Preparing database with {args.posts} posts...")
+        subprocess_json("--prepare", template, "--posts", str(args.posts))
+
+        print(
+            f"1 editor publishing, {args.readers} readers, {args.duration:.0f} s "
+            "(latency in ms)"
+        )
+        print(
+            f"{'':<18}{'journal':>8}{'reads/s':>10}{'read p50':>10}{'read p99':>10}"
+            f"{'read max':>10}{'publishes':>10}{'publish p50':>12}"
+        )
+        for mode in MODES:
+            path = str(Path(directory) / f"{mode.replace(' ', '-')}.sqlite3")
+            shutil.copyfile(template, path)
+            result = subprocess_json(
+                "--run",
+                path,
+                "--mode",
+                mode,
+                "--readers",
+                str(args.readers),
+                "--duration",
+                str(args.duration),
+            )
+            report(mode, result)
+
+
+if __name__ == "__main__":
+    main()
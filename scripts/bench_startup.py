@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Benchmark time-to-first-request of the ASGI application.
+
+Usage:
+    python scripts/bench_startup.py [--runs 5] [--target 25] [--profile 20]
+
+uvicorn で main_asgi を起動してから /api/ が最初に 200 を返すまでの時間を計測し、
+Stripe SDK を起動時に読み込んでいた以前の構成（main_asgi の前に stripe を import）と
+比較する。中央値の短縮率が --target（%）に届かない場合は終了コード 1 を返す。
+--profile N を指定すると、累積 import 時間の上位 N モジュールも表示する。
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fastapi_app.app.utils.importtime import (
+    format_report,
+    profile_imports,
+)
+
+LAUNCHER = (
+    "import sys, uvicorn\n"
+    "{preload}"
+    "uvicorn.run('main_asgi:app', port=int(sys.argv[1]), log_level='warning')\n"
+)
+
+CONFIGURATIONS = {
+    "eager stripe (before)": "import stripe\n",
+    "lazy stripe": "",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(preload: str, timeout: float = 60.0) -> float:
+    """プロセス起動から最初のレスポンスまでの秒数"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", LAUNCHER.format(preload=preload), str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/api/", timeout=1
+                ) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("Server did not respond in time")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=25.0, help="percent")
+    parser.add_argument("--profile", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "django_project.totonoe_template.settings.dev"
+    )
+    if args.profile:
+        print(format_report(profile_imports("main_asgi"), args.profile))
+        print()
+
+    medians = {}
+    print(f"{'':<24}{'median':>10}{'min':>10}{'max':>10}  ({args.runs} runs)")
+    for name, preload in CONFIGURATIONS.items():
+        timings = [time_to_first_request(preload) for _ in range(args.runs)]
+        medians[name] = statistics.median(timings)
+        print(
+            f"{name:<24}{medians[name]:>8.2f} s"
+            f"{min(timings):>8.2f} s{max(timings):>8.2f} s"
+        )
+
+    before, after = medians.values()
+    reduction = (before - after) / before * 100
+    print(f"reduction: {reduction:.1f}% (target {args.target:.1f}%)")
+    return 0 if reduction >= args.target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
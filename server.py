@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""本番用のプリフォーク ASGI サーバー
+
+Usage:
+    python server.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+                     [--max-requests 10000] [--max-requests-jitter 1000]
+                     [--max-rss 512] [--graceful-timeout 30]
+                     [--profile-imports 20]
+
+マスタープロセスで Django・Wagtail・FastAPI（main_asgi）を一度だけ読み込み、
+gc.freeze() してから N 個のワーカーを fork する。ワーカーは読み込み済みの
+モジュールやリードモデルをコピーオンライトで共有し、それぞれ uvicorn で
+同じリスニングソケットからリクエストを受け付ける。
+
+シグナル:
+    SIGTERM / SIGINT  ワーカーを順に終了させてからマスターを終了
+    SIGHUP            新しいワーカーを起動し、古いワーカーを順に終了（ローリング再起動）。
+                      コードは読み込み直さない
+
+ワーカーは処理したリクエスト数（--max-requests）または RSS（--max-rss、MB）が
+上限を超えると終了し、マスターが新しいワーカーを fork し直す。
+コードの変更を反映するにはマスターごと再起動する（読み込みはマスターで行うため）。
+
+--profile-imports N を指定すると、起動前に main_asgi の import 時間を計測し、
+累積時間の上位 N モジュールを表示する。
+"""
+
+import argparse
+import gc
+import logging
+import os
+import random
+import resource
+import signal
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("server")
+
+# uvicorn の on_tick は 0.1 秒ごと。RSS は 5 秒ごとに確認する
+RSS_CHECK_TICKS = 50
+# 起動直後に終了したワーカーが続いた場合は設定・コードの誤りとみなして停止
+FAST_FAILURE_SECONDS = 5.0
+MAX_FAST_FAILURES = 5
+STARTUP_FAILURE = 3
+
+
+def current_rss() -> int:
+    """現在のプロセスの RSS（バイト）"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # /proc がない環境では最大 RSS で代用（Linux は KB 単位）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class WorkerServer(uvicorn.Server):
+    """RSS が上限を超えるか、マスターが終了したら新しいリクエストの受け付けをやめて
+    終了する uvicorn サーバー"""
+
+    def __init__(self, config, max_rss: int | None = None, master_pid: int = 0):
+        super().__init__(config)
+        self.max_rss = max_rss
+        self.master_pid = master_pid
+
+    async def on_tick(self, counter: int) -> bool:
+        # マスターが SIGKILL・OOM で落ちると親が init などに変わる。残ったワーカーが
+        # 継承したソケットで受け付け続けないよう終了する
+        if self.master_pid and os.getppid() != self.master_pid:
+            if not self.should_exit:
+                logger.warning(f"Worker {os.getpid()} lost its master, exiting")
+            self.should_exit = True
+        if self.max_rss and counter % RSS_CHECK_TICKS == 0:
+            rss = current_rss()
+            if rss > self.max_rss:
+                logger.info(
+                    f"Worker {os.getpid()} exceeded max RSS "
+                    f"({rss // 2**20} MB > {self.max_rss // 2**20} MB), recycling"
+                )
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def preload_application():
+    """マスタープロセスでアプリケーションを読み込む"""
+    from django.conf import settings
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from blog.dbpool import close_pools
+    from main_asgi import app
+
+    # URLconf（Wagtail 管理画面などのモジュール）も読み込んでおく
+    url_patterns = get_resolver().url_patterns
+    logger.debug(f"Preloaded {len(url_patterns)} URL patterns")
+    if getattr(settings, "BLOG_READ_MODEL_ENABLED", False):
+        from blog.readmodel import get_read_model
+
+        # 構築したスナップショットは全ワーカーで共有される
+        get_read_model()
+    # DB 接続・接続プールは fork 先で共有できないため閉じておく
+    connections.close_all()
+    close_pools()
+    return app
+
+
+class Arbiter:
+    """ワーカープロセスの起動・監視・再起動を行うマスター"""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        max_requests: int | None = None,
+        max_requests_jitter: int = 0,
+        max_rss: int | None = None,
+        graceful_timeout: float = 30.0,
+    ):
+        self.config = config
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_rss = max_rss
+        self.graceful_timeout = graceful_timeout
+        self.workers: dict[int, float] = {}  # pid -> 起動時刻
+        self.retiring: set[int] = set()
+        self.fast_failures = 0
+        self.should_exit = False
+        self.should_restart = False
+        self.socket = None
+
+    def run(self) -> int:
+        self.socket = self.config.bind_socket()
+        self.install_signal_handlers()
+        logger.info(
+            f"Master {os.getpid()} listening on {self.config.host}:{self.config.port} "
+            f"with {self.worker_count} workers"
+        )
+        try:
+            while not self.should_exit:
+                self.reap_workers()
+                if self.fast_failures >= MAX_FAST_FAILURES:
+                    logger.error("Workers keep failing on startup, shutting down")
+                    return STARTUP_FAILURE
+                if self.should_restart:
+                    self.should_restart = False
+                    self.rolling_restart()
+                self.spawn_workers()
+                time.sleep(0.2)
+            return 0
+        finally:
+            self.stop_workers()
+            self.socket.close()
+
+    def install_signal_handlers(self):
+        def handle_exit(signum, frame):
+            self.should_exit = True
+
+        def handle_restart(signum, frame):
+            self.should_restart = True
+
+        signal.signal(signal.SIGTERM, handle_exit)
+        signal.signal(signal.SIGINT, handle_exit)
+        signal.signal(signal.SIGHUP, handle_restart)
+
+    def spawn_workers(self):
+        while len(self.workers) - len(self.retiring) < self.worker_count:
+            self.spawn_worker()
+
+    def spawn_worker(self) -> int:
+        master_pid = os.getpid()
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        # ワーカープロセス
+        code = 1
+        try:
+            code = self.run_worker(master_pid)
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} crashed")
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def run_worker(self, master_pid: int) -> int:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        # マスターで freeze したオブジェクトは GC の対象外のまま共有される
+        gc.enable()
+        # 乱数の状態はマスターから複製されるため、ワーカーごとに初期化し直す
+        random.seed()
+        if self.max_requests:
+            # 全ワーカーが同時に再起動しないよう上限をずらす
+            self.config.limit_max_requests = self.max_requests + random.randint(
+                0, self.max_requests_jitter
+            )
+        server = WorkerServer(self.config, max_rss=self.max_rss, master_pid=master_pid)
+        server.run(sockets=[self.socket])
+        return 0 if server.started else STARTUP_FAILURE
+
+    def reap_workers(self):
+        """終了したワーカーを回収（上限到達・異常終了したワーカーは次のループで補充）"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            started = self.workers.pop(pid, None)
+            retired = pid in self.retiring
+            self.retiring.discard(pid)
+            code = os.waitstatus_to_exitcode(status)
+            logger.info(f"Worker {pid} exited with code {code}")
+            # 再起動で終了させたワーカー・シグナルで止めたワーカーは失敗に数えない
+            if started is not None and not retired and not self.should_exit:
+                failed = code not in (0, -signal.SIGTERM, -signal.SIGINT)
+                if failed and time.monotonic() - started < FAST_FAILURE_SECONDS:
+                    self.fast_failures += 1
+                else:
+                    self.fast_failures = 0
+
+    def rolling_restart(self):
+        """新しいワーカーを起動してから古いワーカーに終了を指示する（コードは読み込み直さない）"""
+        old = [pid for pid in self.workers if pid not in self.retiring]
+        logger.info(f"Rolling restart of {len(old)} workers")
+        self.retiring.update(old)
+        self.spawn_workers()
+        for pid in old:
+            self.kill(pid, signal.SIGTERM)
+
+    def stop_workers(self):
+        """全ワーカーに終了を指示し、猶予時間を過ぎても残るものは強制終了"""
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap_workers()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not exit in time, killing")
+            self.kill(pid, signal.SIGKILL)
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.workers.pop(pid, None)
+
+    def kill(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+            self.retiring.discard(pid)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Preforking ASGI server")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+    )
+    parser.add_argument("--max-requests", type=int, default=0)
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--max-rss", type=int, default=0, help="MB per worker")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--no-freeze", action="store_true", help="Do not call gc.freeze() before fork"
+    )
+    parser.add_argument(
+        "--profile-imports",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Report the N slowest modules by cumulative import time at boot",
+    )
+    args = parser.parse_args(argv)
+
+    if args.profile_imports:
+        from fastapi_app.app.utils.importtime import format_report, profile_imports
+
+        print(
+            format_report(profile_imports("main_asgi"), args.profile_imports),
+            file=sys.stderr,
+        )
+
+    # 読み込み中に解放された領域が共有ページを汚さないよう、先に GC を止める
+    if not args.no_freeze:
+        gc.disable()
+    app = preload_application()
+
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        lifespan="on",
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    config.load()
+    logging.basicConfig(level=args.log_level.upper(), format="%(message)s")
+
+    if not args.no_freeze:
+        gc.freeze()
+    arbiter = Arbiter(
+        config,
+        workers=args.workers,
+        max_requests=args.max_requests or None,
+        max_requests_jitter=args.max_requests_jitter,
+        max_rss=args.max_rss * 2**20 or None,
+        graceful_timeout=args.graceful_timeout,
+    )
+    return arbiter.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
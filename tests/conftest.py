@@ -1,13 +1,20 @@
 """Test configuration and fixtures."""
 
+import json
 import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
 
 import django
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from django.test import override_settings
 from fastapi.testclient import TestClient
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 
 # Django設定の初期化
 os.environ.setdefault(
@@ -18,9 +25,36 @@ os.environ.setdefault(
 if not settings.configured:
     django.setup()
 
+from blog.models import ArticlePrice
+from blog.prices import price_catalog
+from blog.purge import reset_purger
+from fastapi_app.app.routers import payments
+from fastapi_app.app.utils.stripe_client import close_stripe_client
 from main_asgi import app as fastapi_app
 
 
+@pytest.fixture(autouse=True)
+def disable_background_workers(settings):
+    """バックグラウンド処理を無効化（テスト間でスレッドが残らないように）"""
+    settings.RELATED_POSTS_AUTO_UPDATE = False
+    settings.BLOG_VIEW_FLUSH_INTERVAL = 0
+    # Stripe Webhook のイベントはテストから process_batch で処理する
+    settings.STRIPE_WEBHOOK_INBOX = {"POLL_INTERVAL": 0}
+    # 送信キューのメールもテストから send_pending で送る
+    settings.BLOG_MAIL_QUEUE = {"POLL_INTERVAL": 0}
+    # 変更フィードはテスト内で記録した直後の変更も返す
+    settings.BLOG_CHANGE_FEED_SAFETY_SECONDS = 0
+    # テスト間で ID が再利用されるため記事詳細キャッシュを持ち越さない
+    cache.clear()
+    # パージ要求の記録もテストごとに作り直す
+    reset_purger()
+    # 価格カタログはテストのデータから読み直す
+    price_catalog.reset()
+    # 関連記事のインデックスもテストのデータから構築し直す（NumPy は読み込ませない）
+    if "blog.related" in sys.modules:
+        sys.modules["blog.related"].reset_index()
+
+
 @pytest.fixture
 def client():
     """FastAPI test client."""
@@ -63,3 +97,130 @@ def sample_blog_data():
         "success_url": "http://localhost:8000/success/",
         "cancel_url": "http://localhost:8000/cancel/",
     }
+
+
+class StripeStub(ThreadingHTTPServer):
+    """Stripe API の代わりに Checkout セッション・Product・Price を返す HTTP サーバー"""
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StripeStubHandler)
+        self.delay = 0.0
+        # clear() すると set() されるまで POST への応答を保留する
+        self.release = threading.Event()
+        self.release.set()
+        # 応答を返していない POST の数
+        self.in_flight = 0
+        self.requests = []
+        self.params = []
+        self.idempotency_keys = []
+        self.responses = {}
+        self.counts = {}
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def create(self, path, params):
+        """パスに応じたオブジェクトを作成（ID はオブジェクトの種類ごとの連番）"""
+        kind = path.removeprefix("/v1/")
+        if kind.startswith("prices/"):
+            return {"id": kind.removeprefix("prices/"), "object": "price", **params}
+        prefix, obj = {
+            "checkout/sessions": ("cs_test", "checkout.session"),
+            "products": ("prod_test", "product"),
+            "prices": ("price_test", "price"),
+        }[kind]
+        number = self.counts[prefix] = self.counts.get(prefix, 0) + 1
+        data = {"id": f"{prefix}_{number}", "object": obj, **params}
+        if obj == "checkout.session":
+            data["url"] = f"https://checkout.stripe.com/c/pay/{data['id']}"
+        return data
+
+
+class StripeStubHandler(BaseHTTPRequestHandler):
+    # キープアライブで接続を再利用できるようにする
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections.add(self.client_address)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        params = dict(parse_qsl(body.decode()))
+        self.server.requests.append(self.path)
+        self.server.params.append(params)
+        key = self.headers.get("Idempotency-Key")
+        self.server.idempotency_keys.append(key)
+        with self.server.lock:
+            self.server.in_flight += 1
+        time.sleep(self.server.delay)
+        # 保留したまま解放されなくてもテストが止まらないよう上限を設ける
+        self.server.release.wait(10)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        # 同じ idempotency_key の要求には同じオブジェクトを返す
+        with self.server.lock:
+            data = self.server.responses.get((self.path, key)) if key else None
+            if data is None:
+                data = self.server.create(self.path, params)
+                if key:
+                    self.server.responses[(self.path, key)] = data
+        self.respond(data)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.respond({"id": "acct_stub", "object": "account", "country": "JP"})
+
+    def respond(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stripe_stub(settings, monkeypatch, mock_stripe_key):
+    """Local HTTP stub of the Stripe API used by the payments router."""
+    stub = StripeStub()
+    thread = threading.Thread(target=stub.serve_forever, daemon=True)
+    thread.start()
+    settings.STRIPE_CLIENT = {"API_BASE": stub.url, "MAX_RETRIES": 0}
+    monkeypatch.setattr(payments, "rate_limit_check", lambda *args, **kwargs: None)
+    yield stub
+    stub.release.set()
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def article_prices(transactional_db):
+    """Price catalog entries for articles 1 (500 yen) and 2 (800 yen)."""
+    return [
+        ArticlePrice.objects.create(
+            page_id=page_id,
+            amount=amount,
+            stripe_product_id=f"prod_test_{page_id}",
+            stripe_price_id=f"price_test_{page_id}",
+        )
+        for page_id, amount in ((1, 500), (2, 800))
+    ]
+
+
+@pytest.fixture
+async def asgi_client():
+    """Async client calling the ASGI app on the test's event loop."""
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+    await close_stripe_client()
@@ -0,0 +1,184 @@
+"""Integration tests for the preforking production server."""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.slow,
+    pytest.mark.skipif(
+        not Path("/proc/self/task").exists(), reason="requires Linux /proc"
+    ),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> set[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(child) for child in f.read().split()}
+
+
+def wait_for(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError("condition not met in time")
+
+
+class Server:
+    def __init__(self, *args):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "server.py",
+                "--port",
+                str(self.port),
+                "--log-level",
+                "warning",
+                *args,
+            ],
+            cwd=ROOT,
+            env={**os.environ, "TESTING": "true"},
+        )
+
+    def get(self, path="/api/"):
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{self.port}{path}", timeout=5
+            ) as response:
+                return response.status
+        except OSError:
+            return None
+
+    def workers(self) -> set[int]:
+        return children(self.process.pid)
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+        return self.process.wait(timeout=30)
+
+
+@pytest.fixture
+def server_factory():
+    servers = []
+
+    def start(*args):
+        server = Server(*args)
+        servers.append(server)
+        wait_for(lambda: server.get() == 200)
+        return server
+
+    yield start
+    for server in servers:
+        # マスターを先に SIGKILL するとワーカーが残るため、まず正常に停止させる
+        try:
+            server.stop()
+        except subprocess.TimeoutExpired:
+            server.process.kill()
+            server.process.wait()
+
+
+def test_forks_workers_and_serves_requests(server_factory):
+    """The master forks the requested number of workers."""
+    server = server_factory("--workers", "2")
+
+    assert len(wait_for(lambda: len(server.workers()) == 2 and server.workers())) == 2
+    assert all(server.get() == 200 for _ in range(5))
+
+
+def test_workers_are_recycled_after_max_requests(server_factory):
+    """Workers exit after their request limit and are replaced."""
+    server = server_factory("--workers", "1", "--max-requests", "3")
+    first = wait_for(server.workers)
+
+    for _ in range(6):
+        server.get()
+
+    replaced = wait_for(lambda: (workers := server.workers()) - first and workers)
+    assert len(replaced) == 1
+    assert server.get() == 200
+
+
+def test_sighup_replaces_workers(server_factory):
+    """SIGHUP starts new workers and retires the old ones."""
+    server = server_factory("--workers", "2")
+    old = wait_for(lambda: len(server.workers()) == 2 and server.workers())
+
+    server.process.send_signal(signal.SIGHUP)
+
+    new = wait_for(
+        lambda: (
+            (workers := server.workers()).isdisjoint(old)
+            and len(workers) == 2
+            and workers
+        )
+    )
+    assert len(new) == 2
+    assert server.get() == 200
+
+
+def test_repeated_sighup_does_not_count_as_startup_failure(server_factory):
+    """Workers retired by quick successive rolling restarts do not stop the master."""
+    server = server_factory("--workers", "2")
+    wait_for(lambda: len(server.workers()) == 2)
+
+    for _ in range(6):
+        server.process.send_signal(signal.SIGHUP)
+        time.sleep(0.3)
+
+    wait_for(lambda: len(server.workers()) == 2 and server.get() == 200)
+    assert server.process.poll() is None
+
+
+def test_workers_exit_when_master_is_killed(server_factory):
+    """Workers notice that the master died and stop serving."""
+    server = server_factory("--workers", "2")
+    workers = wait_for(lambda: len(server.workers()) == 2 and server.workers())
+
+    server.process.kill()
+    server.process.wait()
+
+    wait_for(lambda: all(_is_gone(pid) for pid in workers))
+    assert server.get() is None
+
+
+def test_sigterm_stops_gracefully(server_factory):
+    """SIGTERM stops the workers and the master exits cleanly."""
+    server = server_factory("--workers", "2")
+    workers = wait_for(lambda: len(server.workers()) == 2 and server.workers())
+
+    assert server.stop() == 0
+    for pid in workers:
+        assert _is_gone(pid)
+
+
+def _is_gone(pid: int) -> bool:
+    return not Path(f"/proc/{pid}").exists() or _is_zombie(pid)
+
+
+def _is_zombie(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] == "Z"
+    except OSError:
+        return True
@@ -0,0 +1,128 @@
+"""Unit tests for the top-level prefix dispatcher."""
+
+from contextlib import asynccontextmanager
+
+import pytest
+from django.test import SimpleTestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from fastapi_app.app.utils.dispatch import PrefixDispatcher
+from main_asgi import app as main_app
+
+
+def echo(name):
+    """振り分け先の path と root_path を返すアプリケーション"""
+
+    async def app(scope, receive, send):
+        response = JSONResponse(
+            {"app": name, "path": scope["path"], "root_path": scope["root_path"]}
+        )
+        await response(scope, receive, send)
+
+    return app
+
+
+@pytest.mark.unit
+class TestPrefixDispatcher(SimpleTestCase):
+    """Test routing, hooks and lifespan handling."""
+
+    def setUp(self):
+        """Build a dispatcher over echo apps."""
+        self.dispatcher = PrefixDispatcher(
+            [("/api", echo("api")), ("/api/v2/", echo("v2")), ("/static", echo("s"))],
+            default=echo("django"),
+        )
+        self.client = TestClient(self.dispatcher)
+
+    def test_prefix_routing(self):
+        """Requests under a prefix keep their path and gain a root_path."""
+        assert self.client.get("/api/posts/").json() == {
+            "app": "api",
+            "path": "/api/posts/",
+            "root_path": "/api",
+        }
+        assert self.client.get("/static/css/site.css").json()["app"] == "s"
+
+    def test_longest_prefix_wins(self):
+        """More specific prefixes are matched first."""
+        assert self.client.get("/api/v2/posts").json()["app"] == "v2"
+
+    def test_default_app(self):
+        """Unmatched paths, including bare or partial prefixes, go to the default."""
+        for path in ("/", "/blog/post/", "/api", "/apikeys/"):
+            data = self.client.get(path).json()
+            assert data["app"] == "django", path
+            assert data["root_path"] == ""
+
+    def test_pre_routing_hook(self):
+        """A hook can answer a request before routing or let it through."""
+
+        async def hook(scope):
+            if scope["path"] == "/maintenance":
+                return PlainTextResponse("down", status_code=503)
+            return None
+
+        client = TestClient(
+            PrefixDispatcher([], default=echo("django"), before_routing=hook)
+        )
+
+        assert client.get("/maintenance").status_code == 503
+        assert client.get("/other").json()["app"] == "django"
+
+    def test_lifespan(self):
+        """Startup and shutdown run the lifespan context."""
+        events = []
+
+        @asynccontextmanager
+        async def lifespan(app):
+            events.append(("startup", app))
+            yield
+            events.append(("shutdown", app))
+
+        dispatcher = PrefixDispatcher([], default=echo("django"), lifespan=lifespan)
+        with TestClient(dispatcher):
+            assert events == [("startup", dispatcher)]
+
+        assert events[-1] == ("shutdown", dispatcher)
+
+    def test_lifespan_startup_failure(self):
+        """A failing startup is reported to the server."""
+
+        @asynccontextmanager
+        async def lifespan(app):
+            raise RuntimeError("boom")
+            yield
+
+        dispatcher = PrefixDispatcher([], default=echo("django"), lifespan=lifespan)
+
+        with pytest.raises(RuntimeError), TestClient(dispatcher):
+            pass
+
+    def test_without_lifespan(self):
+        """Lifespan events are acknowledged when no context is configured."""
+        with TestClient(self.dispatcher) as client:
+            assert client.get("/").json()["app"] == "django"
+
+
+@pytest.mark.unit
+class TestMainApplication(TransactionTestCase):
+    """Test the composed application in main_asgi."""
+
+    def setUp(self):
+        """Create a client for the main application."""
+        self.client = TestClient(main_app)
+
+    def test_api_is_routed_to_fastapi(self):
+        """/api requests reach the FastAPI app."""
+        response = self.client.get("/api/posts/health")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+    def test_other_paths_are_routed_to_django(self):
+        """Other paths are served by Django."""
+        response = self.client.get("/admin/login/")
+
+        assert response.status_code == 200
+        assert "csrftoken" in response.cookies
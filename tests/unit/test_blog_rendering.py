@@ -0,0 +1,83 @@
+"""Unit tests for pre-rendered BlogPage bodies."""
+
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.models import Page
+from wagtail.rich_text import RichText
+
+from blog.models import BlogPage
+from blog.rendering import compute_rendered_fields, count_words, make_excerpt
+
+
+@pytest.mark.unit
+class TestRenderingHelpers:
+    """Test pure rendering helpers."""
+
+    def test_count_words_mixed_japanese_and_english(self):
+        """Japanese is counted per character, English per word."""
+        assert count_words("日本語 and English") == 5
+
+    def test_make_excerpt_truncates(self):
+        """Long text is truncated with an ellipsis."""
+        excerpt = make_excerpt("a" * 300, length=10)
+        assert excerpt == "a" * 9 + "…"
+
+    def test_compute_rendered_fields(self):
+        """HTML, excerpt, word count and reading time are computed together."""
+        fields = compute_rendered_fields("<p>Hello <b>world</b></p><p>次の段落</p>")
+
+        assert fields["body_html"] == "<p>Hello <b>world</b></p><p>次の段落</p>"
+        assert fields["excerpt"] == "Hello world 次の段落"
+        assert fields["word_count"] == 6
+        assert fields["reading_time"] == 1
+
+    def test_empty_body(self):
+        """An empty body yields empty values."""
+        assert compute_rendered_fields("") == {
+            "body_html": "",
+            "excerpt": "",
+            "word_count": 0,
+            "reading_time": 0,
+        }
+
+
+@pytest.mark.unit
+class TestBlogPageRenderedFields(TestCase):
+    """Test the save hook and backfill command."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+        self.blog_page = BlogPage(
+            title="Rendered Post",
+            intro="Test intro",
+            body=RichText("<p>This is rendered content</p>"),
+            slug="rendered-post",
+            date=date.today(),
+        )
+        self.root_page.add_child(instance=self.blog_page)
+
+    def test_save_populates_rendered_fields(self):
+        """Saving a page stores the rendered body."""
+        self.blog_page.refresh_from_db()
+
+        assert self.blog_page.body_html == "<p>This is rendered content</p>"
+        assert self.blog_page.excerpt == "This is rendered content"
+        assert self.blog_page.word_count == 4
+        assert self.blog_page.reading_time == 1
+
+    def test_backfill_command(self):
+        """The backfill command re-renders pages with empty columns."""
+        BlogPage.objects.filter(pk=self.blog_page.pk).update(body_html="", excerpt="")
+
+        out = StringIO()
+        call_command("render_blog_bodies", workers=1, only_missing=True, stdout=out)
+
+        self.blog_page.refresh_from_db()
+        assert self.blog_page.body_html == "<p>This is rendered content</p>"
+        assert self.blog_page.excerpt == "This is rendered content"
+        assert "Rendered 1 pages" in out.getvalue()
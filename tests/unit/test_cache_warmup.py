@@ -0,0 +1,193 @@
+"""Unit tests for cache warming."""
+
+import asyncio
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from wagtail.models import Locale, Page, Site
+
+from blog.models import BlogIndexPage, BlogPage, PostViewCount
+from blog.warmup import build_warmup_paths, warm_caches
+
+
+class SlowApp:
+    """Minimal ASGI app that records concurrent requests."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.paths = []
+
+    async def __call__(self, scope, receive, send):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.paths.append(scope["path"])
+        try:
+            await asyncio.sleep(self.delay)
+            status = 404 if scope["path"] == "/missing" else 200
+            await send({"type": "http.response.start", "status": status, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            self.in_flight -= 1
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Answers every GET with 200 and records the path and Host header."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers["Host"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def http_server():
+    """Local HTTP server standing in for a running deployment."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+class TestWarmCaches:
+    """Test bounded concurrency, time budget and progress reporting."""
+
+    async def test_concurrency_is_bounded(self):
+        """No more than the configured number of requests run at once."""
+        app = SlowApp(delay=0.01)
+        progress = []
+
+        report = await warm_caches(
+            app,
+            [f"/p/{i}" for i in range(10)] + ["/missing"],
+            concurrency=3,
+            progress=lambda **kwargs: progress.append(kwargs),
+        )
+
+        assert app.max_in_flight == 3
+        assert (report.succeeded, report.failed, report.skipped) == (10, 1, 0)
+        assert report.failures == [("/missing", 404)]
+        assert [item["done"] for item in progress] == list(range(1, 12))
+
+    async def test_budget_skips_remaining_paths(self):
+        """Paths not reached within the time budget are skipped."""
+        app = SlowApp(delay=0.2)
+
+        report = await warm_caches(
+            app, [f"/p/{i}" for i in range(10)], concurrency=2, budget_seconds=0.3
+        )
+
+        assert report.succeeded == 2
+        assert report.skipped == 8
+        assert report.elapsed < 1
+
+    async def test_url_sends_requests_over_http(self, http_server):
+        """With a URL the paths are requested from the running server."""
+        port = http_server.server_address[1]
+
+        report = await warm_caches(
+            None,
+            ["/api/posts/health", "/api/posts/?limit=20&offset=0"],
+            host=None,
+            url=f"http://127.0.0.1:{port}",
+        )
+
+        assert (report.succeeded, report.failed) == (2, 0)
+        assert sorted(http_server.requests) == [
+            ("/api/posts/?limit=20&offset=0", f"127.0.0.1:{port}"),
+            ("/api/posts/health", f"127.0.0.1:{port}"),
+        ]
+
+
+@pytest.mark.unit
+class TestWarmupCommand(TransactionTestCase):
+    """Test warm-up targets and the management command against the real app."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        site = Site.objects.filter(is_default_site=True).first()
+        if site is None:
+            home = root_page.add_child(instance=Page(title="Home", slug="home"))
+            Site.objects.create(
+                hostname="localhost", root_page=home, is_default_site=True
+            )
+        else:
+            home = site.root_page
+        self.index = home.add_child(instance=BlogIndexPage(title="Blog", slug="blog"))
+        self.posts = [
+            self.index.add_child(
+                instance=BlogPage(
+                    title=f"Post {i}",
+                    intro="Test intro",
+                    slug=f"post-{i}",
+                    date=date(2024, 1, i + 1),
+                )
+            )
+            for i in range(3)
+        ]
+        PostViewCount.objects.create(page_id=self.posts[0].id, views=50)
+
+    def test_paths_include_every_target(self):
+        """Counts, listing pages, index pages and top posts are all targeted."""
+        paths = build_warmup_paths(list_pages=2, page_size=10, top_posts=2)
+
+        assert "/api/posts/health" in paths
+        assert "/api/posts/?limit=10&offset=10" in paths
+        assert "/blog/" in paths
+        # 閲覧数の多い記事、次に新しい記事
+        assert paths[-2:] == [
+            f"/api/posts/{self.posts[0].id}",
+            f"/api/posts/{self.posts[2].id}",
+        ]
+
+    def test_command_warms_through_the_app(self):
+        """The command requests every path through the ASGI app."""
+        stdout = StringIO()
+        call_command(
+            "warm_caches",
+            "--list-pages",
+            "1",
+            "--top-posts",
+            "3",
+            "--concurrency",
+            "2",
+            stdout=stdout,
+        )
+
+        output = stdout.getvalue()
+        assert "200 /blog/" in output
+        assert f"200 /api/posts/{self.posts[1].id}" in output
+        assert "Cache warmup: 8 ok, 0 failed, 0 skipped" in output
+
+    def test_command_warns_that_locmem_warms_only_itself(self):
+        """Without --url a per-process cache backend triggers a warning."""
+        stderr = StringIO()
+        with self.settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            }
+        ):
+            call_command(
+                "warm_caches", "--list-pages", "0", "--top-posts", "0", stderr=stderr
+            )
+
+        assert "Pass --url to warm a running server" in stderr.getvalue()
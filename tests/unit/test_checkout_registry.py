@@ -0,0 +1,165 @@
+"""Unit tests for reusing Stripe Checkout sessions."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from blog.models import ArticlePrice
+from blog.prices import price_catalog
+from blog.webhooks import process_batch
+from fastapi_app.app.utils.checkout import (
+    checkout_key,
+    checkout_window,
+    get_checkout_session,
+    remember_checkout_session,
+)
+
+BUYER = "0123456789abcdef0123456789abcdef"
+
+
+def checkout(client, article_id=1, amount=500, success_url="/success/"):
+    return client.post(
+        "/api/payments/create-checkout-session",
+        json={
+            "article_id": article_id,
+            "amount": amount,
+            "article_title": "Test Article Title",
+            "success_url": f"http://localhost:8000{success_url}",
+            "cancel_url": "http://localhost:8000/cancel/",
+        },
+    )
+
+
+@pytest.mark.unit
+async def test_repeated_clicks_reuse_session(stripe_stub, asgi_client, article_prices):
+    """Repeated clicks by the same buyer return the first session."""
+    first = await checkout(asgi_client)
+    assert first.status_code == 200
+    assert "blog_buyer" in first.cookies
+    assert first.json()["reused"] is False
+
+    for _ in range(3):
+        again = await checkout(asgi_client)
+        assert again.json() == {**first.json(), "reused": True}
+
+    assert len(stripe_stub.requests) == 1
+
+
+@pytest.mark.unit
+async def test_new_session_per_article_amount_and_buyer(
+    stripe_stub, asgi_client, article_prices
+):
+    """A different article, price or buyer gets its own session."""
+    asgi_client.cookies.set("blog_buyer", BUYER)
+    sessions = {
+        (await checkout(asgi_client)).json()["session_id"],
+        (await checkout(asgi_client, article_id=2, amount=800)).json()["session_id"],
+    }
+    # 価格が変更された
+    await ArticlePrice.objects.filter(page_id=1).aupdate(
+        amount=600, stripe_price_id="price_test_new"
+    )
+    price_catalog.reset()
+    sessions.add((await checkout(asgi_client, amount=600)).json()["session_id"])
+    asgi_client.cookies.set("blog_buyer", "f" * 32)
+    sessions.add((await checkout(asgi_client, amount=600)).json()["session_id"])
+
+    assert len(sessions) == 4
+    assert len(stripe_stub.requests) == 4
+
+
+@pytest.mark.unit
+async def test_concurrent_requests_share_idempotency_key(
+    stripe_stub, asgi_client, article_prices
+):
+    """Requests racing the registry send one idempotency key to Stripe."""
+    asgi_client.cookies.set("blog_buyer", BUYER)
+    stripe_stub.delay = 0.2
+
+    responses = await asyncio.gather(*(checkout(asgi_client) for _ in range(3)))
+
+    assert len({response.json()["session_id"] for response in responses}) == 1
+    assert len(set(stripe_stub.idempotency_keys)) == 1
+    assert stripe_stub.idempotency_keys[0].startswith("checkout-")
+    # 要求ごとの値（クライアントの IP）は送らない
+    assert "metadata[client_ip]" not in stripe_stub.params[0]
+
+
+@pytest.mark.unit
+async def test_different_params_use_different_idempotency_keys(
+    stripe_stub, asgi_client, article_prices
+):
+    """Racing requests with different redirect URLs do not reuse one key."""
+    asgi_client.cookies.set("blog_buyer", BUYER)
+    stripe_stub.delay = 0.2
+
+    responses = await asyncio.gather(
+        checkout(asgi_client, success_url="/success/"),
+        checkout(asgi_client, success_url="/thanks/"),
+    )
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert len(set(stripe_stub.idempotency_keys)) == 2
+
+
+@pytest.mark.unit
+async def test_expiring_session_is_replaced(stripe_stub, asgi_client, article_prices):
+    """A session close to its expires_at is not handed out again."""
+    asgi_client.cookies.set("blog_buyer", BUYER)
+    key = checkout_key(1, BUYER, 500)
+    await remember_checkout_session(
+        key, "cs_test_old", "https://checkout.stripe.com/old", time.time() + 60
+    )
+
+    response = await checkout(asgi_client)
+
+    assert response.json()["session_id"] != "cs_test_old"
+    assert len(stripe_stub.requests) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.django_db(transaction=True)
+async def test_completed_session_is_forgotten(stripe_stub, asgi_client):
+    """Processing the completion webhook drops the session from the registry."""
+    key = checkout_key(1, BUYER, 500)
+    await remember_checkout_session(
+        key, "cs_test_paid", "https://checkout.stripe.com/paid", time.time() + 1800
+    )
+    event = {
+        "id": "evt_test_paid",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": "cs_test_paid",
+                "metadata": {"article_id": "1", "checkout_key": key},
+            }
+        },
+    }
+
+    with patch("stripe.Webhook.construct_event", return_value=event):
+        response = await asgi_client.post(
+            "/api/payments/webhook",
+            content=b"{}",
+            headers={"stripe-signature": "t=1,v1=test"},
+        )
+
+    assert response.status_code == 200
+    # 受信箱のイベントが処理されるまでは残る
+    assert await get_checkout_session(key) is not None
+    await sync_to_async(process_batch)()
+    assert await get_checkout_session(key) is None
+
+
+@pytest.mark.unit
+def test_checkout_window():
+    """Requests in the same window share the key and the expiry."""
+    now = 1_700_000_040  # 時間枠の先頭
+    window = checkout_window("abc", now)
+
+    assert checkout_window("abc", now + 30) == window
+    assert checkout_window("abc", now + 60) != window
+    assert window["expires_at"] - now >= 1800
+    assert window["idempotency_key"] == f"checkout-abc-{now // 60}"
@@ -0,0 +1,269 @@
+"""Unit tests for response compression."""
+
+import uuid
+from datetime import date
+
+import pytest
+from django.test import TestCase, TransactionTestCase
+from fastapi import FastAPI
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+from wagtail.rich_text import RichText
+
+from blog.models import BlogPage
+from blog.shmcache import get_shared_cache, reset_shared_cache
+from fastapi_app.app.utils.compression import (
+    CODECS,
+    CompressionMiddleware,
+    negotiate_encoding,
+    parse_accept_encoding,
+)
+from main_asgi import app as fastapi_app
+
+LARGE_TEXT = "blog post body " * 200
+
+
+def accept(value):
+    return [(b"accept-encoding", value.encode())]
+
+
+def build_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse(LARGE_TEXT)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/binary")
+    async def binary():
+        return PlainTextResponse(LARGE_TEXT, media_type="application/octet-stream")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield LARGE_TEXT.encode()
+            yield LARGE_TEXT.encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/json")
+    async def json_response():
+        return JSONResponse({"text": LARGE_TEXT}, headers={"Vary": "Origin"})
+
+    @app.get("/html")
+    async def html():
+        return HTMLResponse(f"<p>{LARGE_TEXT}</p>")
+
+    @app.get("/cookie")
+    async def cookie():
+        response = JSONResponse({"text": LARGE_TEXT})
+        response.set_cookie("session", "secret")
+        return response
+
+    return app
+
+
+@pytest.mark.unit
+class TestNegotiation(TestCase):
+    """Test Accept-Encoding negotiation."""
+
+    def test_parse_q_values(self):
+        """Quality values default to 1 and invalid ones to 0."""
+        assert parse_accept_encoding("gzip;q=0.5, br, zstd;q=x") == {
+            "gzip": 0.5,
+            "br": 1.0,
+            "zstd": 0.0,
+        }
+
+    def test_highest_quality_wins(self):
+        """The client's q-values take precedence over server order."""
+        assert negotiate_encoding(accept("gzip;q=1, br;q=0.1")) == "gzip"
+
+    def test_server_order_breaks_ties(self):
+        """Equal q-values fall back to the configured preference."""
+        with self.settings(BLOG_COMPRESSION={"ENCODINGS": ["gzip", "br"]}):
+            assert negotiate_encoding(accept("br, gzip")) == "gzip"
+
+    def test_wildcard_and_exclusions(self):
+        """A wildcard accepts any codec not explicitly refused."""
+        with self.settings(BLOG_COMPRESSION={"ENCODINGS": ["br", "gzip"]}):
+            assert negotiate_encoding(accept("*, br;q=0")) == "gzip"
+
+    def test_no_acceptable_encoding(self):
+        """Identity-only and disabled configurations do not compress."""
+        assert negotiate_encoding(accept("identity")) is None
+        assert negotiate_encoding([]) is None
+        with self.settings(BLOG_COMPRESSION={"ENABLED": False}):
+            assert negotiate_encoding(accept("gzip")) is None
+
+    def test_unavailable_codecs_are_skipped(self):
+        """Encodings without an installed library are never chosen."""
+        with self.settings(BLOG_COMPRESSION={"ENCODINGS": ["deflate", "gzip"]}):
+            assert negotiate_encoding(accept("deflate, gzip;q=0.5")) == "gzip"
+
+
+@pytest.mark.unit
+class TestCompressionMiddleware(TestCase):
+    """Test compressing responses."""
+
+    def setUp(self):
+        """Create a client for a small app."""
+        self.client = TestClient(build_app())
+
+    def get(self, path, encoding):
+        return self.client.get(path, headers={"Accept-Encoding": encoding})
+
+    def test_gzip(self):
+        """Large allowed responses are compressed."""
+        response = self.get("/text", "gzip")
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert int(response.headers["Content-Length"]) < len(LARGE_TEXT)
+        assert response.text == LARGE_TEXT
+
+    def test_brotli(self):
+        """Brotli is used when available and accepted."""
+        if "br" not in CODECS:
+            pytest.skip("brotli is not installed")
+        response = self.get("/text", "gzip, br")
+
+        assert response.headers["Content-Encoding"] == "br"
+        assert response.text == LARGE_TEXT
+
+    def test_zstd(self):
+        """Zstandard is used when available and accepted."""
+        if "zstd" not in CODECS:
+            pytest.skip("zstandard is not installed")
+        response = self.get("/text", "zstd")
+
+        assert response.headers["Content-Encoding"] == "zstd"
+        assert response.text == LARGE_TEXT
+
+    def test_minimum_size(self):
+        """Small bodies are sent as-is."""
+        response = self.get("/small", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+
+    def test_content_type_allow_list(self):
+        """Content types outside the allow-list are not compressed."""
+        response = self.get("/binary", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+        assert "Vary" not in response.headers
+
+    def test_streaming_passthrough(self):
+        """Streaming responses are passed through uncompressed."""
+        response = self.get("/stream", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+        assert response.text == LARGE_TEXT * 2
+
+    def test_html_is_not_compressed(self):
+        """HTML may carry CSRF tokens next to reflected input (BREACH)."""
+        response = self.get("/html", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+
+    def test_responses_setting_cookies_are_not_compressed(self):
+        """Responses that set cookies are sent as-is."""
+        response = self.get("/cookie", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+        assert response.cookies["session"] == "secret"
+
+    def test_existing_vary_is_extended(self):
+        """Accept-Encoding is appended to an existing Vary header."""
+        response = self.get("/json", "gzip")
+
+        assert response.headers["Vary"] == "Origin, Accept-Encoding"
+
+    def test_identity_client_still_gets_vary(self):
+        """Caches learn that the response varies even when not compressed."""
+        response = self.get("/text", "identity")
+
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["Vary"] == "Accept-Encoding"
+
+    def test_disabled(self):
+        """Compression can be switched off."""
+        with self.settings(BLOG_COMPRESSION={"ENABLED": False}):
+            response = self.get("/text", "gzip")
+
+        assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.unit
+class TestCompressedCacheEntries(TransactionTestCase):
+    """Test that the shared cache keeps compressed variants."""
+
+    def setUp(self):
+        """Publish a post with a large body and enable the shared cache."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        post = BlogPage(
+            title="Large",
+            intro="Intro",
+            body=RichText(f"<p>{LARGE_TEXT}</p>"),
+            slug="large",
+            date=date(2024, 1, 1),
+        )
+        root_page.add_child(instance=post)
+        post.save_revision().publish()
+        self.post = post
+
+        settings_override = self.settings(
+            BLOG_SHARED_CACHE={
+                "ENABLED": True,
+                "NAME": f"test-cache-{uuid.uuid4().hex[:12]}",
+                "CLASSES": [(64 * 1024, 16)],
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_shared_cache()
+        self.addCleanup(reset_shared_cache, unlink=True)
+        self.client = TestClient(fastapi_app)
+
+    def test_django_pages_are_not_compressed(self):
+        """Pages served by Django, such as forms with CSRF tokens, are sent as-is."""
+        with self.settings(BLOG_COMPRESSION={"CONTENT_TYPES": ["text/html"]}):
+            response = self.client.get(
+                "/admin/login/", headers={"Accept-Encoding": "gzip"}
+            )
+
+        assert "csrfmiddlewaretoken" in response.text
+        assert "Content-Encoding" not in response.headers
+
+    def test_variants_are_cached_compressed(self):
+        """Each encoding is compressed once and then served from the cache."""
+        path = f"/api/posts/{self.post.id}"
+        gzip_miss = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+        gzip_hit = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+        identity = self.client.get(path, headers={"Accept-Encoding": "identity"})
+
+        assert gzip_miss.headers["X-Cache"] == "MISS"
+        assert gzip_hit.headers["X-Cache"] == "HIT"
+        assert gzip_hit.headers["Content-Encoding"] == "gzip"
+        assert gzip_hit.json() == gzip_miss.json()
+        assert identity.headers["X-Cache"] == "MISS"
+        assert "Content-Encoding" not in identity.headers
+
+        cached = get_shared_cache().get(f"{path}?#gzip")
+        assert cached is not None
+        assert len(cached) < len(identity.content)
@@ -0,0 +1,196 @@
+"""Unit tests for database connection pool management."""
+
+import asyncio
+import threading
+
+import pytest
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from fastapi.testclient import TestClient
+
+from blog import dbpool
+from fastapi_app.app.main import app
+
+
+class FakePool:
+    """get_stats() だけを持つプール"""
+
+    min_size = 2
+    max_size = 4
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def get_stats(self):
+        return self.stats
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+
+@pytest.mark.unit
+class TestPoolStats(SimpleTestCase):
+    """Test pool discovery and metrics."""
+
+    def test_no_pools_for_sqlite(self):
+        """Databases without a pool are ignored."""
+        assert dbpool.get_pools() == {}
+        assert dbpool.pool_stats() == {}
+        assert dbpool.prewarm_pools() == {}
+
+    def test_pool_stats_mapping(self):
+        """Raw psycopg_pool counters are mapped to in-use, idle, wait and timeouts."""
+        pool = FakePool(
+            {
+                "pool_min": 2,
+                "pool_max": 4,
+                "pool_size": 3,
+                "pool_available": 1,
+                "requests_waiting": 2,
+                "requests_num": 10,
+                "requests_wait_ms": 250,
+                "requests_errors": 1,
+            }
+        )
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(dbpool, "connections", {"default": FakeConnection(pool)})
+            stats = dbpool.pool_stats()
+
+        assert stats == {
+            "default": {
+                "min_size": 2,
+                "max_size": 4,
+                "size": 3,
+                "in_use": 2,
+                "idle": 1,
+                "waiting": 2,
+                "requests": 10,
+                "wait_ms_total": 250,
+                "wait_ms_avg": 25.0,
+                "timeouts": 1,
+                "connections_lost": 0,
+            }
+        }
+
+    def test_pool_stats_before_any_request(self):
+        """Counters that psycopg_pool has not reported yet default to zero."""
+        pool = FakePool({"pool_min": 2, "pool_max": 4, "pool_size": 0})
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(dbpool, "connections", {"default": FakeConnection(pool)})
+            stats = dbpool.pool_stats()["default"]
+
+        assert stats["requests"] == 0
+        assert stats["wait_ms_avg"] == 0.0
+        assert stats["in_use"] == 0
+
+
+@pytest.mark.unit
+class TestReadExecutor(SimpleTestCase):
+    """Test running pooled reads on a thread pool sized to the pool."""
+
+    def setUp(self):
+        self.addCleanup(dbpool.shutdown_read_executor)
+
+    @override_settings(
+        DATABASE_CONNECTION_POOL_SIZE=6, DATABASE_CONNECTION_MAX_OVERFLOW=2
+    )
+    def test_executor_matches_pool_size(self):
+        """The read executor gets one thread per pooled connection."""
+        assert dbpool.start_read_executor() == 8
+        assert dbpool._read_executor._max_workers == 8
+
+    def test_reads_run_concurrently_on_the_executor(self):
+        """Pooled reads are not serialized on the single sync_to_async thread."""
+        dbpool.start_read_executor()
+        barrier = threading.Barrier(2, timeout=5)
+
+        @dbpool.pooled_sync_to_async
+        def read():
+            barrier.wait()
+            return threading.current_thread().name
+
+        async def run():
+            return await asyncio.gather(read(), read())
+
+        names = asyncio.run(run())
+
+        assert len(set(names)) == 2
+        assert all(name.startswith("db") for name in names)
+
+    def test_without_executor_reads_are_thread_sensitive(self):
+        """Without a pool, reads keep using sync_to_async's shared thread."""
+
+        @dbpool.pooled_sync_to_async
+        def read():
+            return threading.current_thread().name
+
+        async def run():
+            return await asyncio.gather(read(), read())
+
+        first, second = asyncio.run(run())
+
+        assert first == second
+        assert not first.startswith("db")
+
+
+@pytest.mark.unit
+class TestPostgresPool(SimpleTestCase):
+    """Test prewarm and close against a real psycopg_pool pool."""
+
+    def setUp(self):
+        pytest.importorskip("psycopg_pool")
+        self.handler = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+                "pooled": {
+                    "ENGINE": "django.db.backends.postgresql",
+                    "NAME": "blog",
+                    # 接続できないポート
+                    "HOST": "127.0.0.1",
+                    "PORT": "1",
+                    "CONN_MAX_AGE": 0,
+                    "OPTIONS": {"pool": {"min_size": 1, "max_size": 2}},
+                },
+            }
+        )
+        self.monkeypatch = pytest.MonkeyPatch()
+        self.monkeypatch.setattr(dbpool, "connections", self.handler)
+        self.addCleanup(self.monkeypatch.undo)
+        self.addCleanup(dbpool.close_pools)
+
+    def test_prewarm_failure_does_not_block_startup(self):
+        """An unreachable database is logged and the pool is still discoverable."""
+        pools = dbpool.get_pools()
+        assert list(pools) == ["pooled"]
+
+        with self.assertLogs("blog.dbpool", level="WARNING"):
+            assert dbpool.prewarm_pools(timeout=0.2) == {}
+
+        stats = dbpool.pool_stats()["pooled"]
+        assert stats["max_size"] == 2
+        assert stats["idle"] == 0
+
+    def test_close_pools(self):
+        """Closing removes the pool so a forked worker creates its own."""
+        pool = dbpool.get_pools()["pooled"]
+
+        dbpool.close_pools()
+
+        assert pool.closed
+        assert dbpool.get_pools()["pooled"] is not pool
+
+
+@pytest.mark.unit
+class TestPoolStatsEndpoint(TransactionTestCase):
+    """Test that pool metrics are exposed by the API."""
+
+    def test_stats_include_database_pool(self):
+        """The stats endpoint reports pools (none for SQLite)."""
+        client = TestClient(app)
+
+        data = client.get("/posts/stats").json()
+
+        assert data["database_pool"] == {}
+        assert client.get("/posts/health").json()["database_pool"] == {}
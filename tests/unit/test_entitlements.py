@@ -0,0 +1,213 @@
+"""Unit tests for purchase records and cached entitlement checks."""
+
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.entitlements import can_read, get_purchased_articles, record_purchase
+from blog.models import ArticlePrice, BlogPage, Purchase
+from blog.pageviews import view_counter
+from blog.webhooks import process_batch, store_event
+from main_asgi import app as fastapi_app
+
+BUYER = "0123456789abcdef0123456789abcdef"
+OTHER_BUYER = "f" * 32
+# 抜粋（先頭 200 文字）には含まれない位置に本文の続きを置く
+BODY = f"<p>{'Teaser text. ' * 30}</p><p>The full story</p>"
+
+
+def publish_post(parent, slug, is_paid=False):
+    blog_page = BlogPage(
+        title=slug.title(),
+        intro="Test intro",
+        slug=slug,
+        date=date(2024, 1, 1),
+        body=BODY,
+        is_paid=is_paid,
+        live=False,
+    )
+    parent.add_child(instance=blog_page)
+    blog_page.save_revision().publish()
+    blog_page.refresh_from_db()
+    return blog_page
+
+
+def completed_event(number, session_id, article_id, buyer_id=BUYER, **session):
+    return {
+        "id": f"evt_paid_{number}",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": "paid",
+                "amount_total": 500,
+                "currency": "jpy",
+                "metadata": {"article_id": str(article_id), "buyer_id": buyer_id},
+                **session,
+            }
+        },
+    }
+
+
+def serve(page, buyer_id=None):
+    request = RequestFactory().get("/")
+    if buyer_id:
+        request.COOKIES["blog_buyer"] = buyer_id
+    response = page.serve(request)
+    response.render()
+    return response
+
+
+@pytest.mark.unit
+class TestPurchaseRecords(TestCase):
+    """Test purchases recorded from webhook events and the entitlement cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        root_page = Page.objects.get(title="Root")
+        self.paid = publish_post(root_page, "paid", is_paid=True)
+        self.free = publish_post(root_page, "free")
+
+    def tearDown(self):
+        # 記録した閲覧数をこのテストのトランザクション内で書き出し、次のテストに残さない
+        view_counter.flush()
+
+    def test_completed_event_records_purchase(self):
+        """Processing checkout.session.completed grants access once."""
+        store_event(completed_event(1, "cs_test_1", self.paid.id))
+        # 同じセッションの別イベント（async_payment_succeeded など）
+        store_event(completed_event(2, "cs_test_1", self.paid.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assert process_batch() == (2, 0)
+
+        purchase = Purchase.objects.get()
+        assert (purchase.buyer_id, purchase.article_id) == (BUYER, self.paid.id)
+        assert (purchase.amount, purchase.currency) == (500, "jpy")
+        assert can_read(BUYER, self.paid.id, True)
+        assert not can_read(OTHER_BUYER, self.paid.id, True)
+
+    def test_unpaid_or_anonymous_sessions_are_skipped(self):
+        """Sessions without payment or buyer do not grant access."""
+        store_event(
+            completed_event(1, "cs_test_1", self.paid.id, payment_status="unpaid")
+        )
+        store_event(completed_event(2, "cs_test_2", self.paid.id, buyer_id=""))
+
+        assert process_batch() == (2, 0)
+        assert not Purchase.objects.exists()
+
+    def test_entitlements_are_cached_and_invalidated(self):
+        """Checks are served from the per-buyer set until a new purchase."""
+        assert get_purchased_articles(BUYER) == frozenset()
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(100):
+                assert not can_read(BUYER, self.paid.id, True)
+                assert can_read(BUYER, self.free.id, False)
+                assert not can_read(None, self.paid.id, True)
+        assert len(queries) == 0
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assert record_purchase(BUYER, self.paid.id, "cs_test_1")
+        assert not record_purchase(BUYER, self.paid.id, "cs_test_1")
+
+        assert can_read(BUYER, self.paid.id, True)
+
+    def test_paid_page_is_gated(self):
+        """Only buyers see the body of a paid page, which is kept private."""
+        ArticlePrice.objects.create(
+            page_id=self.paid.id,
+            amount=800,
+            stripe_product_id="prod_test_1",
+            stripe_price_id="price_test_1",
+        )
+        locked = serve(self.paid)
+        assert b"The full story" not in locked.content
+        assert b'id="purchase-btn"' in locked.content
+        assert b'data-amount="800"' in locked.content
+        assert "private" in locked["Cache-Control"]
+        assert "Surrogate-Key" not in locked
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_purchase(BUYER, self.paid.id, "cs_test_1")
+        unlocked = serve(self.paid, BUYER)
+        assert b"The full story" in unlocked.content
+        assert b'id="purchase-btn"' not in unlocked.content
+
+        free = serve(self.free)
+        assert b"The full story" in free.content
+        assert b'id="purchase-btn"' not in free.content
+        assert "Surrogate-Key" in free
+
+    def test_gating_needs_no_queries(self):
+        """Serving a paid page to a known buyer does not query purchases."""
+        record_purchase(BUYER, self.paid.id, "cs_test_1")
+        get_purchased_articles(BUYER)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = serve(self.paid, BUYER)
+
+        assert b"The full story" in response.content
+        assert not [q for q in queries.captured_queries if "blog_purchase" in q["sql"]]
+
+
+@pytest.mark.unit
+class TestEntitlementAPI(TransactionTestCase):
+    """Test content gating in the posts API."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.paid = publish_post(root_page, "paid", is_paid=True)
+        self.free = publish_post(root_page, "free")
+        self.client = TestClient(fastapi_app)
+
+    def test_detail_is_locked_for_non_buyers(self):
+        """Non-buyers get the post without its body, marked private."""
+        for cookies in ({}, {"blog_buyer": OTHER_BUYER}):
+            self.client.cookies.clear()
+            self.client.cookies.update(cookies)
+            response = self.client.get(f"/api/posts/{self.paid.id}")
+
+            assert response.status_code == 200
+            data = response.json()
+            assert data["is_paid"] is True
+            assert data["locked"] is True
+            assert data["body"] == ""
+            assert data["excerpt"]
+            assert response.headers["Cache-Control"] == "private, no-cache"
+            assert "Surrogate-Key" not in response.headers
+
+    def test_detail_is_unlocked_for_buyers(self):
+        """Buyers get the full body of the articles they purchased."""
+        record_purchase(BUYER, self.paid.id, "cs_test_1")
+        self.client.cookies.set("blog_buyer", BUYER)
+
+        data = self.client.get(f"/api/posts/{self.paid.id}").json()
+
+        assert data["locked"] is False
+        assert "The full story" in data["body"]
+
+    def test_list_never_includes_paid_bodies(self):
+        """The shared list omits paid bodies even for buyers."""
+        record_purchase(BUYER, self.paid.id, "cs_test_1")
+        self.client.cookies.set("blog_buyer", BUYER)
+
+        posts = {
+            post["id"]: post for post in self.client.get("/api/posts/").json()["posts"]
+        }
+
+        assert posts[self.paid.id]["body"] == ""
+        assert posts[self.paid.id]["is_paid"] is True
+        assert "The full story" in posts[self.free.id]["body"]
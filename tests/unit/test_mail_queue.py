@@ -0,0 +1,275 @@
+"""Unit tests for the mail queue and its pooled SMTP delivery."""
+
+import re
+import socket
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
+from wagtail.models import Page
+
+from blog.mail import queue_mail, send_pending
+from blog.models import OutgoingEmail
+from blog.webhooks import process_batch, store_event
+from blog.workers import BatchWorkerPool
+from tests.unit.test_entitlements import completed_event, publish_post
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: enough for smtplib and Django's SMTP backend."""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        # 接続・TLS・認証にかかる時間の代わり
+        time.sleep(server.connect_delay)
+        self.reply("220 localhost ESMTP stub")
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb in ("MAIL", "RSET"):
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(re.search(r"<(.*)>", command).group(1))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b"".join(iter(self.rfile.readline, b".\r\n"))
+                with server.lock:
+                    if server.drop_next:
+                        server.drop_next -= 1
+                        return
+                    rejected = server.reject_next > 0
+                    if rejected:
+                        server.reject_next -= 1
+                    else:
+                        server.messages.append((recipients, data.decode()))
+                self.reply("451 Try again later" if rejected else "250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connect_delay = 0.0
+        self.connections = 0
+        self.messages = []
+        # 次の N 件を一時的なエラーで拒否する・接続を切る
+        self.reject_next = 0
+        self.drop_next = 0
+
+
+@pytest.fixture
+def smtp_server(settings):
+    server = SMTPStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    settings.EMAIL_HOST = "127.0.0.1"
+    settings.EMAIL_PORT = server.server_address[1]
+    settings.EMAIL_HOST_USER = ""
+    settings.EMAIL_HOST_PASSWORD = ""
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_TIMEOUT = 5
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def queue_messages(count: int, prefix: str = "user"):
+    for number in range(count):
+        queue_mail(f"Message {number}", "Hello", [f"{prefix}{number}@example.com"])
+
+
+def statuses() -> dict[str, int]:
+    return {
+        status: OutgoingEmail.objects.filter(status=status).count()
+        for status, _ in OutgoingEmail.STATUS_CHOICES
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_batches_share_one_connection(smtp_server, settings):
+    """Each batch is delivered over a single SMTP connection."""
+    settings.BLOG_MAIL_QUEUE = {"POLL_INTERVAL": 0, "BATCH_SIZE": 50}
+    queue_messages(120)
+
+    assert send_pending() == (120, 0)
+
+    assert smtp_server.connections == 3
+    assert len(smtp_server.messages) == 120
+    assert smtp_server.messages[0][0] == ["user0@example.com"]
+    assert statuses()["sent"] == 120
+    assert not OutgoingEmail.objects.filter(sent_at__isnull=True).exists()
+
+
+@pytest.mark.unit
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_pooled_connections_are_reused(smtp_server, settings):
+    """Batching opens one connection per batch instead of one per message."""
+    smtp_server.connect_delay = 0.01
+    for batch_size in (1, 50):
+        settings.BLOG_MAIL_QUEUE = {"POLL_INTERVAL": 0, "BATCH_SIZE": batch_size}
+        queue_messages(100, prefix=f"batch{batch_size}-")
+        assert send_pending() == (100, 0)
+
+    assert smtp_server.connections == 100 + 2
+    assert len(smtp_server.messages) == 200
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_rejected_messages_retry_with_backoff(smtp_server):
+    """A temporary rejection is retried later without dropping the connection."""
+    smtp_server.reject_next = 1
+    queue_messages(3)
+    now = timezone.now()
+
+    assert send_pending(now=now) == (2, 1)
+    assert smtp_server.connections == 1
+    rejected = OutgoingEmail.objects.get(status=OutgoingEmail.STATUS_PENDING)
+    assert rejected.attempts == 1
+    assert "Try again later" in rejected.last_error
+    assert rejected.next_attempt_at > now + timedelta(seconds=20)
+    # 再試行の時刻までは送らない
+    assert send_pending(now=now + timedelta(seconds=1)) == (0, 0)
+
+    assert send_pending(now=now + timedelta(seconds=31)) == (1, 0)
+    rejected.refresh_from_db()
+    assert (rejected.status, rejected.attempts) == (OutgoingEmail.STATUS_SENT, 2)
+    assert len(smtp_server.messages) == 3
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_dropped_connection_is_reopened(smtp_server):
+    """The rest of the batch is sent over a new connection after a disconnect."""
+    smtp_server.drop_next = 1
+    queue_messages(3)
+
+    assert send_pending() == (2, 1)
+
+    assert smtp_server.connections == 2
+    assert statuses()["pending"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_unreachable_server_gives_up(settings):
+    """Connection failures count as attempts until MAX_ATTEMPTS."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    settings.EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    settings.EMAIL_HOST = "127.0.0.1"
+    settings.EMAIL_PORT = port
+    settings.BLOG_MAIL_QUEUE = {"POLL_INTERVAL": 0, "MAX_ATTEMPTS": 2}
+    queue_messages(2)
+    now = timezone.now()
+
+    assert send_pending(now=now) == (0, 2)
+    assert statuses()["pending"] == 2
+    assert send_pending(now=now + timedelta(hours=1)) == (0, 2)
+    assert statuses()["failed"] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_purchase_queues_confirmation_mail(smtp_server):
+    """A completed checkout queues one confirmation mail for the buyer."""
+    paid = publish_post(Page.objects.get(title="Root"), "paid", is_paid=True)
+    details = {"customer_details": {"email": "buyer@example.com"}}
+    store_event(completed_event(1, "cs_test_1", paid.id, **details))
+    store_event(completed_event(2, "cs_test_1", paid.id, **details))
+    store_event(completed_event(3, "cs_test_2", paid.id, buyer_id="f" * 32))
+
+    assert process_batch() == (3, 0)
+
+    email = OutgoingEmail.objects.get()
+    assert email.to == ["buyer@example.com"]
+    assert "Paid" in email.body
+    assert "500円" in email.body
+    assert send_pending() == (1, 0)
+    assert smtp_server.messages[0][0] == ["buyer@example.com"]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_send_command(smtp_server):
+    """The management command sends due mail and prunes old sent mail."""
+    queue_messages(2)
+    old = queue_mail("Old", "Hello", ["old@example.com"])
+    OutgoingEmail.objects.filter(id=old.id).update(
+        status=OutgoingEmail.STATUS_SENT,
+        sent_at=timezone.now() - timedelta(days=31),
+    )
+    out = StringIO()
+
+    call_command("send_queued_mail", once=True, prune=True, stdout=out)
+
+    assert "Pruned 1 sent messages" in out.getvalue()
+    assert "Sent 2 messages, 0 failed" in out.getvalue()
+    assert len(smtp_server.messages) == 2
+
+
+class FailingPool(BatchWorkerPool):
+    """Worker pool whose batches always fail, as when the database is down."""
+
+    thread_name = "failing-worker"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def get_settings(self):
+        return {"WORKERS": 1, "POLL_INTERVAL": 0.1}
+
+    def process_batch(self):
+        self.calls += 1
+        raise OperationalError("database is unavailable")
+
+
+@pytest.mark.unit
+def test_worker_backs_off_on_consecutive_errors(caplog):
+    """Repeated failures are retried at growing intervals, not every poll."""
+    pool = FailingPool()
+
+    assert [pool.error_delay(errors) for errors in (1, 2, 3)] == [0.1, 0.2, 0.4]
+    assert pool.error_delay(20) == pool.ERROR_BACKOFF_MAX
+
+    pool.start()
+    time.sleep(1.0)
+    # 新しい行の通知ではバックオフを短縮しない
+    pool.wake()
+    pool.stop()
+
+    # 0.1 秒ごとなら 10 回、倍々なら 0・0.1・0.3・0.7 秒の 4 回
+    assert 2 <= pool.calls <= 5
+    assert not pool.running
+    assert "failed (2 in a row), retrying in 0.2s" in caplog.text
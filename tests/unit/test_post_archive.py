@@ -0,0 +1,120 @@
+"""Unit tests for the year/month archive rollup."""
+
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page, PageViewRestriction
+
+from blog.models import BlogPage, PostArchiveMonth
+from main_asgi import app as fastapi_app
+
+
+def archive_counts():
+    return {
+        (row.year, row.month): row.count
+        for row in PostArchiveMonth.objects.filter(count__gt=0)
+    }
+
+
+@pytest.mark.unit
+class TestPostArchiveRollup(TestCase):
+    """Test incremental maintenance of the archive rollup."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+
+    def _publish_post(self, slug, post_date):
+        blog_page = BlogPage(
+            title=slug, intro="Test intro", slug=slug, date=post_date, live=False
+        )
+        self.root_page.add_child(instance=blog_page)
+        blog_page.save_revision().publish()
+        blog_page.refresh_from_db()
+        return blog_page
+
+    def test_publish_increments_month(self):
+        """Publishing counts the post under its year/month."""
+        self._publish_post("a", date(2024, 5, 1))
+        self._publish_post("b", date(2024, 5, 20))
+        self._publish_post("c", date(2024, 6, 1))
+
+        assert archive_counts() == {(2024, 5): 2, (2024, 6): 1}
+
+    def test_republish_with_new_date_moves_post(self):
+        """Re-dating a post moves it between months."""
+        blog_page = self._publish_post("a", date(2024, 5, 1))
+        blog_page.save_revision().publish()  # 日付変更なしの再公開
+        assert archive_counts() == {(2024, 5): 1}
+
+        blog_page.date = date(2023, 12, 24)
+        blog_page.save_revision().publish()
+        assert archive_counts() == {(2023, 12): 1}
+
+    def test_unpublish_and_delete_decrement(self):
+        """Unpublishing or deleting removes the post from the rollup."""
+        first = self._publish_post("a", date(2024, 5, 1))
+        second = self._publish_post("b", date(2024, 5, 2))
+
+        first.unpublish()
+        assert archive_counts() == {(2024, 5): 1}
+
+        second.delete()
+        assert archive_counts() == {}
+
+    def test_rebuild_command(self):
+        """The rebuild command recomputes the rollup from live pages."""
+        self._publish_post("a", date(2024, 5, 1))
+        PostArchiveMonth.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_post_archive", stdout=out)
+
+        assert archive_counts() == {(2024, 5): 1}
+        assert "1 posts in 1 months" in out.getvalue()
+
+    def test_restricted_posts_match_rebuild(self):
+        """View-restricted posts are skipped both incrementally and on rebuild."""
+        self._publish_post("a", date(2024, 5, 1))
+        restricted = BlogPage(
+            title="b", intro="Test intro", slug="b", date=date(2024, 5, 2), live=False
+        )
+        self.root_page.add_child(instance=restricted)
+        PageViewRestriction.objects.create(
+            page=restricted, restriction_type=PageViewRestriction.PASSWORD, password="x"
+        )
+        restricted.save_revision().publish()
+        incremental = archive_counts()
+
+        call_command("rebuild_post_facets", stdout=StringIO())
+
+        assert incremental == archive_counts() == {(2024, 5): 1}
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPostArchiveAPI(TransactionTestCase):
+    """Test the /api/posts/archive endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        PostArchiveMonth.objects.create(year=2024, month=5, count=2)
+        PostArchiveMonth.objects.create(year=2025, month=1, count=1)
+        PostArchiveMonth.objects.create(year=2023, month=1, count=0)
+
+    def test_archive_endpoint(self):
+        """Months are returned newest first and empty months are hidden."""
+        response = TestClient(fastapi_app).get("/api/posts/archive")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "archive": [
+                {"year": 2025, "month": 1, "count": 1},
+                {"year": 2024, "month": 5, "count": 2},
+            ]
+        }
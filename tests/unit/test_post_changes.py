@@ -0,0 +1,115 @@
+"""Unit tests for the incremental post change feed."""
+
+from datetime import date, timedelta
+
+import pytest
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+from wagtail.rich_text import RichText
+
+from blog.models import BlogPage, PostChange
+from main_asgi import app as fastapi_app
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPostChangeFeed(TransactionTestCase):
+    """Test change log recording and the since-token API."""
+
+    def setUp(self):
+        """Set up test data."""
+        # TransactionTestCase はマイグレーションデータも消去するため再作成
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            self.root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            self.root_page = Page.add_root(title="Root", slug="root")
+
+    def _create_post(self, slug):
+        blog_page = BlogPage(
+            title=f"Post {slug}",
+            intro="Test intro",
+            body=RichText("<p>Test content</p>"),
+            slug=slug,
+            date=date.today(),
+            live=False,
+        )
+        self.root_page.add_child(instance=blog_page)
+        return blog_page
+
+    def test_publish_and_unpublish_record_changes(self):
+        """Publishing and unpublishing append upsert/delete events."""
+        blog_page = self._create_post("feed-1")
+        blog_page.save_revision().publish()
+        blog_page.refresh_from_db()
+        blog_page.unpublish()
+
+        actions = list(
+            PostChange.objects.filter(page_id=blog_page.id).values_list(
+                "action", flat=True
+            )
+        )
+        assert actions == [PostChange.ACTION_UPSERT, PostChange.ACTION_DELETE]
+
+    def test_delete_records_change(self):
+        """Deleting a page appends a delete event."""
+        blog_page = self._create_post("feed-2")
+        page_id = blog_page.id
+        blog_page.delete()
+
+        assert PostChange.objects.filter(
+            page_id=page_id, action=PostChange.ACTION_DELETE
+        ).exists()
+
+    def test_changes_endpoint_resumes_from_token(self):
+        """The API returns ordered events and a resumable token."""
+        first = self._create_post("feed-3")
+        second = self._create_post("feed-4")
+        first.save_revision().publish()
+        second.save_revision().publish()
+
+        client = TestClient(fastapi_app)
+
+        response = client.get("/api/posts/changes?since=0&limit=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert [c["post_id"] for c in data["changes"]] == [first.id]
+        assert data["has_more"] is True
+
+        response = client.get(f"/api/posts/changes?since={data['next_token']}")
+        data = response.json()
+        assert [c["post_id"] for c in data["changes"]] == [second.id]
+        assert data["changes"][0]["action"] == "upsert"
+        assert data["has_more"] is False
+
+        # 新しい変更がなければトークンはそのまま
+        response = client.get(f"/api/posts/changes?since={data['next_token']}")
+        assert response.json() == {
+            "changes": [],
+            "next_token": data["next_token"],
+            "has_more": False,
+        }
+
+    @override_settings(BLOG_CHANGE_FEED_SAFETY_SECONDS=5)
+    def test_token_does_not_pass_recent_changes(self):
+        """Changes that may still be committing hold back later tokens."""
+        older = PostChange.objects.create(page_id=1, action=PostChange.ACTION_UPSERT)
+        recent = PostChange.objects.create(page_id=2, action=PostChange.ACTION_UPSERT)
+        later = PostChange.objects.create(page_id=3, action=PostChange.ACTION_UPSERT)
+        settled = timezone.now() - timedelta(seconds=10)
+        # recent のトランザクションだけがまだ確定していない可能性がある
+        PostChange.objects.filter(id__in=[older.id, later.id]).update(
+            created_at=settled
+        )
+
+        client = TestClient(fastapi_app)
+        data = client.get("/api/posts/changes?since=0").json()
+
+        assert [c["token"] for c in data["changes"]] == [older.id]
+        assert data["next_token"] == older.id
+
+        PostChange.objects.filter(id=recent.id).update(created_at=settled)
+        data = client.get(f"/api/posts/changes?since={data['next_token']}").json()
+        assert [c["token"] for c in data["changes"]] == [recent.id, later.id]
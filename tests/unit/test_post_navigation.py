@@ -0,0 +1,186 @@
+"""Unit tests for precomputed prev/next post navigation."""
+
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpRequest
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page, Site
+
+from blog.models import BlogIndexPage, BlogPage
+from main_asgi import app as fastapi_app
+
+
+def publish_post(parent, slug, post_date):
+    blog_page = BlogPage(
+        title=slug.title(), intro="Test intro", slug=slug, date=post_date, live=False
+    )
+    parent.add_child(instance=blog_page)
+    blog_page.save_revision().publish()
+    blog_page.refresh_from_db()
+    return blog_page
+
+
+def link_ids(slug):
+    page = BlogPage.objects.get(slug=slug)
+    return (
+        page.prev_post["id"] if page.prev_post else None,
+        page.next_post["id"] if page.next_post else None,
+    )
+
+
+@pytest.mark.unit
+class TestPostNavigation(TestCase):
+    """Test incremental maintenance of prev/next links."""
+
+    def setUp(self):
+        """Set up test data."""
+        root_page = Page.objects.get(title="Root")
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        root_page.add_child(instance=self.index)
+        self.march = publish_post(self.index, "march", date(2024, 3, 1))
+        self.january = publish_post(self.index, "january", date(2024, 1, 1))
+
+    def test_publish_inserts_between_neighbors(self):
+        """Publishing a post links it to its date neighbors and vice versa."""
+        assert link_ids("january") == (None, self.march.id)
+
+        february = publish_post(self.index, "february", date(2024, 2, 1))
+
+        assert link_ids("january") == (None, february.id)
+        assert link_ids("february") == (self.january.id, self.march.id)
+        assert link_ids("march") == (february.id, None)
+
+        page = BlogPage.objects.get(id=february.id)
+        assert page.prev_post["title"] == "January"
+        assert page.prev_post["url"] == self.january.get_url()
+
+    def test_redate_moves_post(self):
+        """Changing the date relinks both the old and new neighbors."""
+        february = publish_post(self.index, "february", date(2024, 2, 1))
+
+        february.date = date(2024, 4, 1)
+        february.save_revision().publish()
+
+        assert link_ids("january") == (None, self.march.id)
+        assert link_ids("march") == (self.january.id, february.id)
+        assert link_ids("february") == (self.march.id, None)
+
+    def add_index(self, parent, slug):
+        return parent.add_child(instance=BlogIndexPage(title=slug.title(), slug=slug))
+
+    def test_index_slug_change_updates_links(self):
+        """Renaming the parent index rewrites stored links to its posts."""
+        home = Site.objects.get(is_default_site=True).root_page
+        news = self.add_index(home, "news")
+        february = publish_post(news, "february", date(2024, 2, 1))
+
+        news.slug = "articles"
+        with self.captureOnCommitCallbacks(execute=True):
+            news.save_revision().publish()
+
+        january = BlogPage.objects.get(slug="january")
+        assert january.next_post["url"] == february.get_url().replace(
+            "/news/", "/articles/"
+        )
+        assert (
+            BlogPage.objects.get(slug="march")
+            .prev_post["url"]
+            .endswith("/articles/february/")
+        )
+
+    def test_index_move_updates_links(self):
+        """Moving the parent index rewrites stored links to its posts."""
+        home = Site.objects.get(is_default_site=True).root_page
+        news = self.add_index(home, "news")
+        section = self.add_index(home, "section")
+        february = publish_post(news, "february", date(2024, 2, 1))
+
+        news.move(section, pos="last-child")
+
+        assert (
+            BlogPage.objects.get(slug="january")
+            .next_post["url"]
+            .endswith("/section/news/february/")
+        )
+        assert BlogPage.objects.get(id=february.id).next_post["id"] == self.march.id
+
+    def test_unpublish_closes_gap(self):
+        """Unpublishing a post links its neighbors to each other."""
+        february = publish_post(self.index, "february", date(2024, 2, 1))
+
+        february.unpublish()
+
+        assert link_ids("january") == (None, self.march.id)
+        assert link_ids("march") == (self.january.id, None)
+        assert link_ids("february") == (None, None)
+
+    def test_title_change_updates_neighbor_links(self):
+        """Republishing with a new title refreshes the neighbors' link text."""
+        self.january.title = "New Year"
+        self.january.save_revision().publish()
+
+        assert BlogPage.objects.get(id=self.march.id).prev_post["title"] == "New Year"
+
+    def test_republish_keeps_links_from_stale_revision(self):
+        """Publishing an older revision does not restore stale links."""
+        revision = self.january.latest_revision
+        publish_post(self.index, "february", date(2024, 2, 1))
+
+        revision.publish()
+
+        assert link_ids("january")[1] == BlogPage.objects.get(slug="february").id
+
+    def test_context_needs_no_queries(self):
+        """The page context exposes the links without querying other posts."""
+        page = BlogPage.objects.get(id=self.january.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            context = page.get_context(HttpRequest())
+            next_post = context["next_post"]
+
+        assert next_post["id"] == self.march.id
+        assert context["prev_post"] is None
+        assert not [q for q in queries.captured_queries if "blog_blogpage" in q["sql"]]
+
+    def test_rebuild_command(self):
+        """The rebuild command recomputes every link."""
+        BlogPage.objects.update(prev_post=None, next_post=None)
+
+        stdout = StringIO()
+        call_command("rebuild_post_navigation", stdout=stdout)
+
+        assert "Navigation rebuilt: 2 posts" in stdout.getvalue()
+        assert link_ids("january") == (None, self.march.id)
+        assert link_ids("march") == (self.january.id, None)
+
+
+@pytest.mark.unit
+class TestPostNavigationAPI(TransactionTestCase):
+    """Test prev/next links in the post detail API."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.first = publish_post(root_page, "first", date(2024, 1, 1))
+        self.second = publish_post(root_page, "second", date(2024, 2, 1))
+        self.client = TestClient(fastapi_app)
+
+    def test_detail_includes_links(self):
+        """The detail endpoint returns the stored prev/next links."""
+        response = self.client.get(f"/api/posts/{self.second.id}")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["prev_post"]["id"] == self.first.id
+        assert data["prev_post"]["title"] == "First"
+        assert data["next_post"] is None
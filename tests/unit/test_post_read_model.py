@@ -0,0 +1,212 @@
+"""Unit tests for the in-memory columnar read model of published posts."""
+
+from datetime import date
+
+import numpy as np
+import pytest
+from django.test import TestCase, TransactionTestCase, override_settings
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.cache import get_cached_posts
+from blog.models import BlogPage
+from blog.readmodel import (
+    PostReadModel,
+    apply_delta,
+    build_snapshot,
+    reset_read_model,
+)
+from fastapi_app.app.routers.posts import POST_ORDERINGS, build_blog_pages_queryset
+from main_asgi import app as fastapi_app
+from tests.unit.test_posts_filters import create_blog_tree
+
+
+def snapshot_model(**columns):
+    model = PostReadModel()
+    model._snapshot = build_snapshot(**columns)
+    return model
+
+
+@pytest.mark.unit
+class TestReadModelQuery:
+    """Test vectorized filtering, sorting and pagination."""
+
+    def setup_method(self):
+        self.model = snapshot_model(
+            ids=[1, 2, 3, 4],
+            dates=[
+                date(2024, 1, 1).toordinal(),
+                date(2024, 3, 1).toordinal(),
+                date(2024, 2, 1).toordinal(),
+                date(2024, 3, 1).toordinal(),
+            ],
+            published=[40, 30, 20, 10],
+            parents=[100, 100, 200, 200],
+            page_tags=[["python"], ["python", "django"], [], ["django"]],
+        )
+
+    def test_orders(self):
+        """Each ordering matches the database ordering."""
+        assert self.model.query(order="-date") == ([2, 4, 3, 1], 4)
+        assert self.model.query(order="date") == ([1, 3, 4, 2], 4)
+        assert self.model.query(order="published") == ([1, 2, 3, 4], 4)
+
+    def test_filters_and_pagination(self):
+        """Filters combine and pagination reports the filtered total."""
+        assert self.model.query(date_from=date(2024, 2, 1), limit=2) == ([2, 4], 3)
+        assert self.model.query(date_from=date(2024, 2, 1), offset=2) == ([3], 3)
+        assert self.model.query(date_to=date(2024, 2, 1)) == ([3, 1], 2)
+        assert self.model.query(parent=200) == ([4, 3], 2)
+
+    def test_tag_modes(self):
+        """Tag bitsets support any/all matching and unknown tags."""
+        assert self.model.query(tags=["python", "django"]) == ([2, 4, 1], 3)
+        assert self.model.query(tags=["python", "django"], tag_mode="all") == (
+            [2],
+            1,
+        )
+        assert self.model.query(tags=["python", "missing"], tag_mode="all") == ([], 0)
+        assert self.model.query(tags=["missing"]) == ([], 0)
+
+    def test_delta_merge_matches_full_sort(self):
+        """Inserting changed rows keeps every ordering identical to a full sort."""
+        rng = np.random.default_rng(0)
+        size = 500
+        columns = {
+            "ids": np.arange(1, size + 1),
+            "dates": rng.integers(0, 30, size=size),
+            "published": rng.integers(0, 30, size=size),
+            "parents": np.zeros(size, dtype=np.int64),
+            "page_tags": [[] for _ in range(size)],
+        }
+        snapshot = build_snapshot(**columns)
+        delta = {
+            "ids": np.array([7, 900]),
+            "dates": np.array([3, 15]),
+            "published": np.array([15, 3]),
+            "parents": np.array([0, 0]),
+            "page_tags": [["new"], []],
+        }
+
+        merged = apply_delta(snapshot, {7, 42, 900}, delta, token=1)
+        expected = build_snapshot(
+            merged.ids, merged.dates, merged.published, merged.parents, [[]] * 499
+        )
+
+        assert len(merged) == size
+        for order, rows in expected.orders.items():
+            assert merged.orders[order].tolist() == rows.tolist()
+
+    def test_many_tags_use_multiple_words(self):
+        """More than 64 tags are spread over several bitset words."""
+        slugs = [f"tag-{i}" for i in range(130)]
+        model = snapshot_model(
+            ids=[1, 2],
+            dates=[1, 2],
+            published=[1, 2],
+            parents=[0, 0],
+            page_tags=[slugs[:70], slugs[65:]],
+        )
+
+        assert model.snapshot.tags.shape == (3, 2)
+        assert model.query(tags=["tag-129"]) == ([2], 1)
+        assert model.query(tags=["tag-66", "tag-67"], tag_mode="all") == ([2, 1], 2)
+
+
+@pytest.mark.unit
+class TestReadModelSync(TestCase):
+    """Test building from the database and applying change feed deltas."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+        self.news, self.tech = create_blog_tree(self.root_page)
+
+    def test_build_matches_database_queries(self):
+        """The read model answers the same filters as the database queryset."""
+        model = PostReadModel()
+        model.build()
+
+        filter_sets = [
+            {},
+            {"date_from": date(2024, 2, 1)},
+            {"parent": self.news.id},
+            {"parent": self.tech.id, "date_to": date(2024, 12, 31)},
+            {"tags": ["news", "tech"]},
+            {"tags": ["python", "news"], "tag_mode": "all"},
+        ]
+        for filters in filter_sets:
+            for order in ("-date", "date"):
+                expected = list(
+                    build_blog_pages_queryset(**filters)
+                    .order_by(*POST_ORDERINGS[order])
+                    .values_list("id", flat=True)
+                )
+                assert model.query(**filters, order=order) == (
+                    expected,
+                    len(expected),
+                )
+
+    def test_refresh_applies_publish_and_unpublish(self):
+        """Publish/unpublish events from the change feed are applied as deltas."""
+        model = PostReadModel()
+        model.build()
+        blog_page = BlogPage(
+            title="new", intro="x", slug="new", date=date(2026, 1, 1), live=False
+        )
+        self.news.add_child(instance=blog_page)
+        blog_page.tags.add("fresh")
+        blog_page.save_revision().publish()
+
+        assert model.refresh() == 1
+        assert model.query(limit=1) == ([blog_page.id], 5)
+        assert model.query(tags=["fresh"], parent=self.news.id) == ([blog_page.id], 1)
+
+        blog_page.refresh_from_db()
+        blog_page.unpublish()
+
+        assert model.refresh() == 1
+        assert model.query(tags=["fresh"]) == ([], 0)
+        assert model.refresh() == 0
+
+    def test_rows_hydrated_from_detail_cache(self):
+        """Rows are loaded once and then served from the detail cache."""
+        page_ids = list(BlogPage.objects.values_list("id", flat=True)[:2])
+        assert [post["id"] for post in get_cached_posts(page_ids)] == page_ids
+
+        with self.assertNumQueries(0):
+            posts = get_cached_posts(list(reversed(page_ids)))
+
+        assert [post["id"] for post in posts] == list(reversed(page_ids))
+
+
+@pytest.mark.unit
+@override_settings(BLOG_READ_MODEL_ENABLED=True)
+class TestReadModelAPI(TransactionTestCase):
+    """Test the posts list endpoint backed by the read model."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.news, self.tech = create_blog_tree(root_page)
+        reset_read_model()
+        self.client = TestClient(fastapi_app)
+
+    def tearDown(self):
+        reset_read_model()
+
+    def test_list_matches_database_path(self):
+        """Responses are identical with and without the read model."""
+        query = f"/api/posts/?parent={self.tech.id}&tag=python&limit=1&offset=1"
+        response = self.client.get(query)
+        with override_settings(BLOG_READ_MODEL_ENABLED=False):
+            expected = self.client.get(query)
+
+        assert response.status_code == 200
+        assert response.json()["posts"] == expected.json()["posts"]
+        assert response.json()["pagination"] == expected.json()["pagination"]
+        assert response.json()["pagination"]["total_count"] == 2
@@ -0,0 +1,132 @@
+"""Unit tests for BlogPage tags, tag filtering and facet counters."""
+
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.models import BlogPage, TagFacetCount
+from fastapi_app.app.routers.posts import build_blog_pages_queryset
+from main_asgi import app as fastapi_app
+
+
+def tag_counts():
+    return {
+        row.tag.slug: row.count
+        for row in TagFacetCount.objects.filter(count__gt=0).select_related("tag")
+    }
+
+
+def publish_post(root_page, slug, tags):
+    blog_page = BlogPage(
+        title=slug, intro="Test intro", slug=slug, date=date(2024, 5, 1), live=False
+    )
+    root_page.add_child(instance=blog_page)
+    blog_page.tags.add(*tags)
+    blog_page.save_revision().publish()
+    blog_page.refresh_from_db()
+    return blog_page
+
+
+@pytest.mark.unit
+class TestTagFacetCounts(TestCase):
+    """Test incremental maintenance of tag facet counters."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+
+    def test_publish_counts_tags(self):
+        """Publishing counts each tag of the post once."""
+        publish_post(self.root_page, "a", ["python", "django"])
+        publish_post(self.root_page, "b", ["python"])
+
+        assert tag_counts() == {"python": 2, "django": 1}
+
+    def test_retag_and_unpublish(self):
+        """Changing tags applies only the difference; unpublishing removes all."""
+        blog_page = publish_post(self.root_page, "a", ["python", "django"])
+
+        blog_page.tags.set(["python", "wagtail"])
+        blog_page.save_revision().publish()
+        assert tag_counts() == {"python": 1, "wagtail": 1}
+
+        blog_page.refresh_from_db()
+        blog_page.unpublish()
+        assert tag_counts() == {}
+
+    def test_draft_tags_are_not_counted(self):
+        """Tags of pages that were never published are not counted."""
+        blog_page = BlogPage(
+            title="draft", intro="x", slug="draft", date=date(2024, 5, 1), live=False
+        )
+        self.root_page.add_child(instance=blog_page)
+        blog_page.tags.add("python")
+        blog_page.save()
+
+        assert tag_counts() == {}
+
+    def test_rebuild_command(self):
+        """The rebuild command recomputes tag counters."""
+        publish_post(self.root_page, "a", ["python"])
+        TagFacetCount.objects.all().delete()
+
+        call_command("rebuild_post_facets", stdout=StringIO())
+
+        assert tag_counts() == {"python": 1}
+
+    def test_tag_filter_modes(self):
+        """tag_mode=any is OR, tag_mode=all is AND."""
+        publish_post(self.root_page, "a", ["python", "django"])
+        publish_post(self.root_page, "b", ["python"])
+        publish_post(self.root_page, "c", ["wagtail"])
+
+        def titles(**kwargs):
+            return set(
+                build_blog_pages_queryset(**kwargs).values_list("title", flat=True)
+            )
+
+        assert titles(tags=["django", "wagtail"]) == {"a", "c"}
+        assert titles(tags=["python", "django"], tag_mode="all") == {"a"}
+        assert titles(tags=["python", "missing"], tag_mode="all") == set()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestTagAPI(TransactionTestCase):
+    """Test tag filtering and the /api/posts/tags endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        publish_post(root_page, "a", ["python", "django"])
+        publish_post(root_page, "b", ["python"])
+        self.client = TestClient(fastapi_app)
+
+    def test_tags_endpoint(self):
+        """Facet counts are returned from the counter table."""
+        response = self.client.get("/api/posts/tags")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "tags": [
+                {"name": "python", "slug": "python", "count": 2},
+                {"name": "django", "slug": "django", "count": 1},
+            ]
+        }
+
+    def test_list_filter_by_tags(self):
+        """Repeated tag parameters combine with tag_mode."""
+        response = self.client.get("/api/posts/?tag=python&tag=django&tag_mode=all")
+
+        data = response.json()
+        assert [p["title"] for p in data["posts"]] == ["a"]
+        assert data["pagination"]["total_count"] == 1
@@ -0,0 +1,149 @@
+"""Unit tests for the buffered post view counter."""
+
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.models import BlogPage, PostViewBucket, PostViewCount
+from blog.pageviews import (
+    ViewCounter,
+    get_popular_posts,
+    prune_view_buckets,
+    view_counter,
+)
+from main_asgi import app as fastapi_app
+
+NOW = datetime(2024, 5, 10, 12, 30, tzinfo=UTC)
+
+
+def create_post(root_page, slug, live=True):
+    blog_page = BlogPage(
+        title=slug, intro="Test intro", slug=slug, date=date(2024, 5, 1), live=live
+    )
+    root_page.add_child(instance=blog_page)
+    return blog_page
+
+
+def total_views():
+    return dict(PostViewCount.objects.values_list("page_id", "views"))
+
+
+@pytest.mark.unit
+class TestViewCounter(TestCase):
+    """Test in-memory aggregation and batched flushing."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+        self.post_a = create_post(self.root_page, "a")
+        self.post_b = create_post(self.root_page, "b")
+        self.counter = ViewCounter(flush_interval=0)
+
+    def test_record_does_not_query(self):
+        """Recording a view only touches memory."""
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(100):
+                self.counter.record(self.post_a.id, now=NOW)
+
+        assert len(queries) == 0
+        assert self.counter.pending() == 100
+        assert total_views() == {}
+
+    def test_flush_upserts_aggregated_deltas(self):
+        """Each flush adds the aggregated deltas to the stored totals."""
+        for _ in range(3):
+            self.counter.record(self.post_a.id, now=NOW)
+        self.counter.record(self.post_b.id, now=NOW)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert self.counter.flush() == 4
+        inserts = [q for q in queries.captured_queries if "INSERT" in q["sql"]]
+        assert len(inserts) == 2  # 合計とバケットをそれぞれ1文で upsert
+
+        self.counter.record(self.post_a.id, now=NOW + timedelta(hours=1))
+        self.counter.flush()
+
+        assert total_views() == {self.post_a.id: 4, self.post_b.id: 1}
+        assert list(
+            PostViewBucket.objects.filter(page_id=self.post_a.id)
+            .order_by("bucket")
+            .values_list("views", flat=True)
+        ) == [3, 1]
+        assert self.counter.pending() == 0
+        assert self.counter.flush() == 0
+
+    def test_serve_records_view(self):
+        """Serving a post page records a view without writing to the DB."""
+        view_counter.flush()
+        response = self.post_a.serve(RequestFactory().get("/"))
+
+        assert response.status_code == 200
+        assert view_counter.pending() == 1
+        view_counter.flush()
+        assert total_views() == {self.post_a.id: 1}
+
+    def test_popular_windows(self):
+        """Rankings sum the buckets inside each window and skip unpublished posts."""
+        draft = create_post(self.root_page, "draft", live=False)
+        for _ in range(2):
+            self.counter.record(self.post_a.id, now=NOW)
+        for _ in range(5):
+            self.counter.record(self.post_b.id, now=NOW - timedelta(days=3))
+        for _ in range(9):
+            self.counter.record(draft.id, now=NOW)
+        self.counter.flush()
+
+        day = get_popular_posts("24h", now=NOW)
+        week = get_popular_posts("7d", now=NOW)
+
+        assert [(post["id"], post["views"]) for post in day] == [(self.post_a.id, 2)]
+        assert [(post["id"], post["views"]) for post in week] == [
+            (self.post_b.id, 5),
+            (self.post_a.id, 2),
+        ]
+
+    def test_prune_old_buckets(self):
+        """Buckets older than the retention period are deleted."""
+        self.counter.record(self.post_a.id, now=NOW - timedelta(days=30))
+        self.counter.record(self.post_a.id, now=NOW)
+        self.counter.flush()
+
+        assert prune_view_buckets(now=NOW) == 1
+        assert PostViewBucket.objects.count() == 1
+        assert total_views() == {self.post_a.id: 2}
+
+
+@pytest.mark.unit
+class TestPopularPostsAPI(TransactionTestCase):
+    """Test the /api/posts/popular endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.post = create_post(root_page, "popular")
+        counter = ViewCounter(flush_interval=0)
+        counter.record(self.post.id)
+        counter.flush()
+        self.client = TestClient(fastapi_app)
+
+    def test_popular_endpoint(self):
+        """The endpoint returns the ranking for the requested window."""
+        response = self.client.get("/api/posts/popular?window=7d")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["window"] == "7d"
+        assert data["posts"][0]["id"] == self.post.id
+        assert data["posts"][0]["views"] == 1
+
+        response = self.client.get("/api/posts/popular?window=1y")
+        assert response.status_code == 422
@@ -0,0 +1,138 @@
+"""Unit tests for posts list filters, orderings and their indexes."""
+
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.models import BlogIndexPage, BlogPage
+from fastapi_app.app.routers.posts import POST_ORDERINGS, build_blog_pages_queryset
+from main_asgi import app as fastapi_app
+
+
+def create_blog_tree(root_page):
+    """2つの BlogIndexPage とその子記事を作成"""
+    indexes = []
+    for name, dates in [
+        ("news", [date(2024, 1, 10), date(2024, 3, 5)]),
+        ("tech", [date(2024, 2, 1), date(2025, 1, 1)]),
+    ]:
+        index_page = root_page.add_child(instance=BlogIndexPage(title=name, slug=name))
+        for i, post_date in enumerate(dates):
+            blog_page = index_page.add_child(
+                instance=BlogPage(
+                    title=f"{name} {i}",
+                    intro="Test intro",
+                    slug=f"{name}-{i}",
+                    date=post_date,
+                )
+            )
+            blog_page.tags.add("python", name)
+            blog_page.save()
+        indexes.append(index_page)
+    return indexes
+
+
+@pytest.mark.unit
+class TestPostsFilterIndexes(TestCase):
+    """Assert via EXPLAIN that every filter/sort combination uses an index."""
+
+    def setUp(self):
+        """Set up test data."""
+        if connection.vendor != "sqlite":
+            pytest.skip("EXPLAIN assertions are written for SQLite query plans")
+        self.news, self.tech = create_blog_tree(Page.objects.get(title="Root"))
+
+    def table_accesses(self, queryset):
+        plan = queryset.explain()
+        assert plan, "expected a query plan"
+        return [
+            line
+            for line in plan.splitlines()
+            if " SCAN " in f" {line} " or " SEARCH " in f" {line} "
+        ]
+
+    def assert_searches_index(self, queryset):
+        """Every table is reached by an index lookup, never by a scan."""
+        for line in self.table_accesses(queryset):
+            # "SCAN ... USING INDEX" はインデックス全体の走査なので絞り込めていない
+            assert " SEARCH " in f" {line} ", f"scan in plan:\n{queryset.explain()}"
+            assert "USING" in line, f"search without index:\n{queryset.explain()}"
+
+    def test_filter_and_order_combinations_use_indexes(self):
+        """Each filtered combination is answered through index searches."""
+        filter_sets = [
+            {"date_from": date(2024, 2, 1)},
+            {"date_from": date(2024, 1, 1), "date_to": date(2024, 12, 31)},
+            {"parent": self.news.id},
+            {"parent": self.tech.id, "date_to": date(2024, 12, 31)},
+            {"tags": ["news", "tech"]},
+            {"tags": ["python", "news"], "tag_mode": "all"},
+        ]
+        for filters in filter_sets:
+            queryset = build_blog_pages_queryset(**filters)
+            for ordering in POST_ORDERINGS.values():
+                self.assert_searches_index(queryset.order_by(*ordering)[:20])
+            # 総件数（count）は並び順なしで実行される
+            self.assert_searches_index(queryset.order_by())
+
+    def test_unfiltered_orderings_walk_an_index(self):
+        """Without filters, each ordering reads rows in index order."""
+        queryset = build_blog_pages_queryset()
+        for ordering in POST_ORDERINGS.values():
+            first = self.table_accesses(queryset.order_by(*ordering)[:20])[0]
+            assert "USING INDEX" in first, first
+
+    def test_parent_filter_uses_path_range(self):
+        """The parent filter only returns direct children of the index page."""
+        titles = set(
+            build_blog_pages_queryset(parent=self.news.id).values_list(
+                "title", flat=True
+            )
+        )
+        assert titles == {"news 0", "news 1"}
+
+    def test_unknown_parent_returns_nothing(self):
+        """A parent that is not a BlogIndexPage yields an empty result."""
+        root = Page.objects.get(title="Root")
+        assert not build_blog_pages_queryset(parent=root.id).exists()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+class TestPostsFilterAPI(TransactionTestCase):
+    """Test the filter and order query parameters of /api/posts/."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.news, self.tech = create_blog_tree(root_page)
+        self.client = TestClient(fastapi_app)
+
+    def test_date_range_filter(self):
+        """date_from/date_to filter the list and the total count."""
+        response = self.client.get(
+            "/api/posts/?date_from=2024-02-01&date_to=2024-12-31&order=date"
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [p["date"] for p in data["posts"]] == ["2024-02-01", "2024-03-05"]
+        assert data["pagination"]["total_count"] == 2
+
+    def test_parent_filter_and_order(self):
+        """parent limits the list to one BlogIndexPage."""
+        response = self.client.get(f"/api/posts/?parent={self.tech.id}&order=-date")
+        data = response.json()
+        assert [p["title"] for p in data["posts"]] == ["tech 1", "tech 0"]
+
+    def test_invalid_order(self):
+        """Unsupported orderings are rejected."""
+        response = self.client.get("/api/posts/?order=title")
+        assert response.status_code == 422
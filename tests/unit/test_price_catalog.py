@@ -0,0 +1,137 @@
+"""Unit tests for the article price catalog and Stripe price sync."""
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from wagtail.models import Page
+
+from blog.models import ArticlePrice, BlogPage
+from blog.prices import price_catalog
+from tests.unit.test_checkout_registry import checkout
+from tests.unit.test_entitlements import publish_post
+
+
+def sync_prices() -> str:
+    out = StringIO()
+    call_command("sync_stripe_prices", stdout=out)
+    return out.getvalue()
+
+
+def catalog():
+    return {
+        row.page_id: (row.amount, row.stripe_product_id, row.stripe_price_id)
+        for row in ArticlePrice.objects.all()
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_sync_creates_products_and_prices_once(stripe_stub):
+    """Paid articles get one product and price; reruns do not call Stripe."""
+    root_page = Page.objects.get(title="Root")
+    first = publish_post(root_page, "first", is_paid=True)
+    second = publish_post(root_page, "second", is_paid=True)
+    publish_post(root_page, "free")
+    BlogPage.objects.filter(id=second.id).update(price=800)
+
+    assert "2 created (2 new products)" in sync_prices()
+
+    assert catalog() == {
+        first.id: (500, "prod_test_1", "price_test_1"),
+        second.id: (800, "prod_test_2", "price_test_2"),
+    }
+    prices = [
+        params
+        for path, params in zip(stripe_stub.requests, stripe_stub.params, strict=True)
+        if path == "/v1/prices"
+    ]
+    assert {(p["product"], p["unit_amount"], p["currency"]) for p in prices} == {
+        ("prod_test_1", "500", "jpy"),
+        ("prod_test_2", "800", "jpy"),
+    }
+
+    requests = len(stripe_stub.requests)
+    assert "0 created (0 new products), 2 unchanged" in sync_prices()
+    assert len(stripe_stub.requests) == requests
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_sync_replaces_changed_prices(stripe_stub):
+    """A changed price gets a new Stripe price and the old one is deactivated."""
+    root_page = Page.objects.get(title="Root")
+    first = publish_post(root_page, "first", is_paid=True)
+    second = publish_post(root_page, "second", is_paid=True)
+    sync_prices()
+    BlogPage.objects.filter(id=first.id).update(price=700)
+    BlogPage.objects.filter(id=second.id).update(is_paid=False)
+    del stripe_stub.requests[:]
+
+    output = sync_prices()
+
+    assert "1 created (0 new products)" in output
+    assert "1 deactivated" in output
+    assert catalog() == {
+        first.id: (700, "prod_test_1", "price_test_3"),
+        second.id: (500, "prod_test_2", ""),
+    }
+    assert stripe_stub.requests == [
+        "/v1/prices",
+        "/v1/prices/price_test_1",
+        "/v1/prices/price_test_2",
+    ]
+    assert stripe_stub.params[-1] == {"active": "false"}
+    assert price_catalog.lookup(second.id) is None
+
+
+@pytest.mark.unit
+async def test_checkout_sends_price_reference(stripe_stub, asgi_client, article_prices):
+    """Checkout references the catalog price instead of inline price data."""
+    response = await checkout(asgi_client)
+
+    assert response.status_code == 200
+    params = stripe_stub.params[0]
+    assert params["line_items[0][price]"] == "price_test_1"
+    assert params["line_items[0][quantity]"] == "1"
+    assert not [name for name in params if "price_data" in name]
+
+
+@pytest.mark.unit
+async def test_amount_is_validated_server_side(
+    stripe_stub, asgi_client, article_prices
+):
+    """Amounts that differ from the catalog and unknown articles are rejected."""
+    mismatch = await checkout(asgi_client, amount=100)
+    unknown = await checkout(asgi_client, article_id=3)
+
+    assert (mismatch.status_code, mismatch.json()["detail"]) == (400, "Price mismatch")
+    assert (unknown.status_code, unknown.json()["detail"]) == (
+        404,
+        "Article not for sale",
+    )
+    assert stripe_stub.requests == []
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_lookups_are_served_from_memory(settings):
+    """The catalog is loaded once and refreshed only after REFRESH_INTERVAL."""
+    ArticlePrice.objects.create(
+        page_id=1, amount=500, stripe_product_id="prod_1", stripe_price_id="price_1"
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(1000):
+            assert price_catalog.lookup(1).stripe_price_id == "price_1"
+            assert price_catalog.lookup(2) is None
+    assert len(queries) == 1
+
+    ArticlePrice.objects.create(
+        page_id=2, amount=800, stripe_product_id="prod_2", stripe_price_id="price_2"
+    )
+    assert price_catalog.lookup(2) is None
+    settings.BLOG_PRICE_CATALOG = {"REFRESH_INTERVAL": 0}
+    assert price_catalog.lookup(2).amount == 800
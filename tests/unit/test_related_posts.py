@@ -0,0 +1,239 @@
+"""Unit tests for precomputed related posts."""
+
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+from wagtail.rich_text import RichText
+
+from blog.models import BlogPage, PostChange, RelatedPost
+from blog.related import (
+    TfidfIndex,
+    compute_all_related,
+    tokenize,
+    update_related_for,
+)
+from main_asgi import app as fastapi_app
+
+
+def related_ids(page):
+    return list(
+        RelatedPost.objects.filter(page=page)
+        .order_by("rank")
+        .values_list("related_id", flat=True)
+    )
+
+
+def create_post(root_page, slug, title, body):
+    blog_page = BlogPage(
+        title=title,
+        intro=title,
+        body=RichText(f"<p>{body}</p>"),
+        slug=slug,
+        date=date(2024, 5, 1),
+    )
+    root_page.add_child(instance=blog_page)
+    return blog_page
+
+
+@pytest.mark.unit
+class TestTfidfIndex:
+    """Test tokenizer and similarity computation."""
+
+    def test_tokenize_latin_and_cjk(self):
+        """Latin words are kept whole and Japanese is split into bigrams."""
+        assert tokenize("Django 入門") == ["django", "入門"]
+        assert tokenize("非同期処理") == ["非同", "同期", "期処", "処理"]
+        assert tokenize("a 本") == ["本"]
+
+    def test_top_k_orders_by_similarity(self):
+        """Posts sharing more terms rank higher and self is excluded."""
+        index = TfidfIndex.from_documents(
+            [1, 2, 3, 4],
+            [
+                "django wagtail fastapi",
+                "django wagtail",
+                "django",
+                "cooking recipes",
+            ],
+        )
+
+        results = index.top_k([0, 3], k=3)
+
+        assert [related_id for related_id, _ in results[1]] == [2, 3]
+        assert results[4] == []
+
+    def test_replace_documents_matches_rebuild(self):
+        """Replacing rows keeps other vectors and scores like a full build."""
+        texts = {1: "django orm", 2: "django wagtail", 3: "cooking recipes"}
+        index = TfidfIndex.from_documents(list(texts), list(texts.values()))
+
+        updated = index.replace_documents({2: "django orm query", 3: None, 4: "orm"})
+
+        assert sorted(updated.row_of) == [1, 2, 4]
+        assert updated.changes == 3
+
+        def vector(idx, page_id):
+            row = idx.row_of[page_id]
+            start, end = idx.csr_indptr[row], idx.csr_indptr[row + 1]
+            return dict(
+                zip(
+                    idx.csr_indices[start:end].tolist(),
+                    idx.csr_data[start:end].tolist(),
+                    strict=True,
+                )
+            )
+
+        # 差し替えていない記事のベクトルはそのまま
+        assert vector(updated, 1) == vector(index, 1)
+        assert sum(w * w for w in vector(updated, 2).values()) == pytest.approx(1)
+        assert [r for r, _ in updated.top_k([updated.row_of[4]], k=2)[4]] == [1, 2]
+        # 元のインデックスは変更しない
+        assert sorted(index.row_of) == [1, 2, 3]
+
+    def test_similarities_match_dense_computation(self):
+        """Batched sparse scoring equals the dense dot product."""
+        texts = ["a1 b2 c3", "b2 c3 d4", "d4 e5", "a1 e5 e5"]
+        index = TfidfIndex.from_documents([1, 2, 3, 4], texts)
+
+        dense = [[0.0] * len(index.vocabulary) for _ in texts]
+        for row in range(len(texts)):
+            start, end = index.csr_indptr[row], index.csr_indptr[row + 1]
+            for col, weight in zip(
+                index.csr_indices[start:end], index.csr_data[start:end], strict=True
+            ):
+                dense[row][col] = weight
+        expected = [
+            [sum(x * y for x, y in zip(a, b, strict=True)) for b in dense]
+            for a in dense
+        ]
+
+        sims = index.similarities([0, 1, 2, 3])
+
+        for row, expected_row in zip(sims.tolist(), expected, strict=True):
+            assert row == pytest.approx(expected_row, abs=1e-6)
+
+
+@pytest.mark.unit
+class TestRelatedPosts(TestCase):
+    """Test storing and incrementally updating related posts."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.root_page = Page.objects.get(title="Root")
+        self.django_a = create_post(
+            self.root_page, "django-a", "Django ORM", "django orm query"
+        )
+        self.django_b = create_post(
+            self.root_page, "django-b", "Django ORM", "django orm index"
+        )
+        self.cooking = create_post(
+            self.root_page, "cooking", "Cooking", "recipe curry rice"
+        )
+
+    def test_compute_all_related(self):
+        """Every live post stores its most similar posts."""
+        assert compute_all_related(k=2) == 3
+
+        assert related_ids(self.django_a) == [self.django_b.id]
+        assert related_ids(self.cooking) == []
+
+    def test_command(self):
+        """The management command computes related posts for all posts."""
+        stdout = StringIO()
+        call_command("compute_related_posts", "--top-k", "2", stdout=stdout)
+
+        assert "Computed related posts for 3 posts" in stdout.getvalue()
+        assert related_ids(self.django_b) == [self.django_a.id]
+
+    def test_update_only_recomputes_affected_posts(self):
+        """Publishing a post updates itself and the posts it becomes related to."""
+        compute_all_related(k=2)
+        new_post = create_post(
+            self.root_page, "django-c", "Django ORM", "django orm query"
+        )
+
+        affected = update_related_for(new_post.id, k=2)
+
+        assert affected == {new_post.id, self.django_a.id, self.django_b.id}
+        assert related_ids(new_post)[0] == self.django_a.id
+        assert new_post.id in related_ids(self.django_a)
+        assert related_ids(self.cooking) == []
+
+    def test_update_does_not_revectorize_corpus(self):
+        """Updates reuse the cached index and apply only changed posts."""
+        compute_all_related(k=2)
+        new_post = create_post(
+            self.root_page, "django-c", "Django ORM", "django orm query"
+        )
+        # 別のプロセスで公開された記事は変更フィードから取り込む
+        other = create_post(self.root_page, "django-d", "Django ORM", "django orm")
+        PostChange.objects.create(page_id=other.id, action=PostChange.ACTION_UPSERT)
+
+        with mock.patch(
+            "blog.related.build_index", side_effect=AssertionError("full rebuild")
+        ):
+            affected = update_related_for(new_post.id, k=2)
+
+        assert {new_post.id, other.id} <= affected
+        assert set(related_ids(new_post)) <= {
+            self.django_a.id,
+            self.django_b.id,
+            other.id,
+        }
+
+    def test_update_removes_unpublished_post(self):
+        """An unpublished post is removed from other posts' related lists."""
+        compute_all_related(k=2)
+        BlogPage.objects.filter(id=self.django_b.id).update(live=False)
+
+        update_related_for(self.django_b.id, k=2)
+
+        assert related_ids(self.django_a) == []
+        assert related_ids(self.django_b) == []
+
+    def test_get_context_includes_related_posts(self):
+        """The page context lists related posts in rank order."""
+        from django.http import HttpRequest
+
+        compute_all_related(k=2)
+
+        context = self.django_a.get_context(HttpRequest())
+
+        assert list(context["related_posts"]) == [self.django_b]
+
+
+@pytest.mark.unit
+class TestRelatedPostsAPI(TransactionTestCase):
+    """Test the /api/posts/{post_id}/related endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            self.root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            self.root_page = Page.add_root(title="Root", slug="root")
+        self.django_a = create_post(
+            self.root_page, "django-a", "Django ORM", "django orm query"
+        )
+        self.django_b = create_post(
+            self.root_page, "django-b", "Django ORM", "django orm index"
+        )
+        compute_all_related(k=2)
+        self.client = TestClient(fastapi_app)
+
+    def test_related_endpoint(self):
+        """The API returns precomputed related posts."""
+        response = self.client.get(f"/api/posts/{self.django_a.id}/related")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["post_id"] == self.django_a.id
+        assert [item["id"] for item in data["related"]] == [self.django_b.id]
+        assert data["related"][0]["slug"] == "django-b"
@@ -0,0 +1,261 @@
+"""Unit tests for the cross-worker shared-memory response cache."""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import uuid
+from datetime import date
+
+import pytest
+from django.test import TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.models import BlogPage
+from blog.shmcache import SharedResponseCache, reset_shared_cache
+from fastapi_app.app.utils.importtime import ROOT
+from fastapi_app.app.utils.response_cache import decode_response, encode_response
+from main_asgi import app as fastapi_app
+
+SMALL_CLASSES = [(256, 2), (4096, 4)]
+
+
+def unique_name():
+    return f"test-cache-{uuid.uuid4().hex[:12]}"
+
+
+def write_from_child(name, key, value):
+    """別プロセスから同じ共有メモリに書き込む"""
+    shared_cache = SharedResponseCache(name, SMALL_CLASSES)
+    shared_cache.set(key, value)
+    shared_cache.close()
+
+
+@pytest.mark.unit
+class TestSharedResponseCache(TestCase):
+    """Test the shared-memory store."""
+
+    def setUp(self):
+        """Create a fresh segment."""
+        self.name = unique_name()
+        self.cache = SharedResponseCache(self.name, SMALL_CLASSES, ttl=60)
+        self.addCleanup(self.cache.close, unlink=True)
+
+    def test_set_and_get(self):
+        """Stored values are returned by key."""
+        assert self.cache.set("/api/posts/?limit=1", b"payload")
+
+        assert self.cache.get("/api/posts/?limit=1") == b"payload"
+        assert self.cache.get("/api/posts/?limit=2") is None
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+    def test_replace_moves_between_size_classes(self):
+        """Replacing a value with a larger one drops the old slot."""
+        self.cache.set("key", b"small")
+        self.cache.set("key", b"x" * 1000)
+        self.cache.set("key", b"small again")
+
+        assert self.cache.get("key") == b"small again"
+
+    def test_oversized_values_are_skipped(self):
+        """Values larger than the biggest class are not stored."""
+        assert not self.cache.set("key", b"x" * 5000)
+        assert self.cache.get("key") is None
+
+    def test_expired_entries_miss(self):
+        """Entries past their TTL are misses."""
+        self.cache.set("key", b"value", ttl=-1)
+
+        assert self.cache.get("key") is None
+
+    def test_invalidate_bumps_generation(self):
+        """Invalidation expires every entry at once."""
+        self.cache.set("a", b"1")
+        self.cache.set("b", b"2")
+
+        self.cache.invalidate()
+
+        assert self.cache.get("a") is None
+        assert self.cache.get("b") is None
+        self.cache.set("a", b"3")
+        assert self.cache.get("a") == b"3"
+
+    def test_stale_generation_is_not_served(self):
+        """A value computed before an invalidation is stored already stale."""
+        generation = self.cache.generation
+        self.cache.invalidate()
+
+        self.cache.set("key", b"old", generation=generation)
+
+        assert self.cache.get("key") is None
+
+    def test_lru_eviction(self):
+        """The least recently used slot of a size class is reused."""
+        self.cache.set("a", b"1")
+        self.cache.set("b", b"2")
+        assert self.cache.get("a") == b"1"
+
+        self.cache.set("c", b"3")
+
+        assert self.cache.get("a") == b"1"
+        assert self.cache.get("b") is None
+        assert self.cache.get("c") == b"3"
+
+    def test_shared_between_processes(self):
+        """A value written by another process is visible here."""
+        context = multiprocessing.get_context("fork")
+        process = context.Process(
+            target=write_from_child, args=(self.name, "key", b"from child")
+        )
+        process.start()
+        process.join(timeout=10)
+
+        assert process.exitcode == 0
+        assert self.cache.get("key") == b"from child"
+
+    def test_incompatible_layout_is_rejected(self):
+        """Attaching with different size classes fails instead of corrupting."""
+        self.cache.set("key", b"value")
+
+        with pytest.raises(RuntimeError):
+            SharedResponseCache(self.name, [(256, 1)])
+
+
+@pytest.mark.unit
+class TestLazyNumpy:
+    """Test that NumPy is loaded only when the shared cache is enabled."""
+
+    def test_disabled_cache_does_not_import_numpy(self):
+        """Booting the app and invalidating a disabled cache leave NumPy unloaded."""
+        code = (
+            "import sys, main_asgi\n"
+            "from blog.shmcache import invalidate_shared_cache\n"
+            "invalidate_shared_cache()\n"
+            "print('numpy' in sys.modules)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env={**os.environ, "TESTING": "true"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip().splitlines()[-1] == "False"
+
+
+@pytest.mark.unit
+class TestResponseEncoding(TestCase):
+    """Test the encoded response format."""
+
+    def test_round_trip(self):
+        """Status, headers and body survive encoding."""
+        headers = [(b"content-type", b"application/json"), (b"surrogate-key", b"a b")]
+
+        status, decoded, body = decode_response(
+            encode_response(200, headers, b'{"ok":true}')
+        )
+
+        assert status == 200
+        assert decoded == headers
+        assert bytes(body) == b'{"ok":true}'
+
+
+@pytest.mark.unit
+class TestSharedCacheMiddleware(TransactionTestCase):
+    """Test caching API responses across requests."""
+
+    def setUp(self):
+        """Enable the shared cache on a fresh segment."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            self.root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            self.root_page = Page.add_root(title="Root", slug="root")
+        self.post = self.publish("first")
+
+        settings_override = self.settings(
+            BLOG_SHARED_CACHE={
+                "ENABLED": True,
+                "NAME": unique_name(),
+                "CLASSES": [(64 * 1024, 16)],
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_shared_cache()
+        self.addCleanup(reset_shared_cache, unlink=True)
+        self.client = TestClient(fastapi_app)
+
+    def publish(self, slug):
+        blog_page = BlogPage(
+            title=slug.title(), intro="Intro", slug=slug, date=date(2024, 1, 1)
+        )
+        self.root_page.add_child(instance=blog_page)
+        blog_page.save_revision().publish()
+        return blog_page
+
+    def test_second_request_is_served_from_cache(self):
+        """The same GET is answered from shared memory."""
+        first = self.client.get(f"/api/posts/{self.post.id}")
+        second = self.client.get(f"/api/posts/{self.post.id}")
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+        assert second.headers["Surrogate-Key"] == f"post-{self.post.id}"
+
+    def test_query_string_is_part_of_the_key(self):
+        """Different query strings are cached separately."""
+        self.client.get("/api/posts/?limit=1")
+
+        response = self.client.get("/api/posts/?limit=2")
+
+        assert response.headers["X-Cache"] == "MISS"
+
+    def test_publish_invalidates(self):
+        """Publishing a post expires the cached list."""
+        self.client.get("/api/posts/")
+
+        self.publish("second")
+        response = self.client.get("/api/posts/")
+
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.json()["pagination"]["total_count"] == 2
+
+    def test_errors_and_excluded_paths_are_not_cached(self):
+        """Only successful responses under the configured paths are cached."""
+        self.client.get("/api/posts/999999")
+        self.client.get("/api/posts/stats")
+
+        assert self.client.get("/api/posts/999999").headers["X-Cache"] == "MISS"
+        assert "X-Cache" not in self.client.get("/api/posts/stats").headers
+
+    def test_health_and_debug_are_never_cached(self):
+        """Monitoring endpoints always reflect the current state."""
+        for path in ("/api/posts/health", "/api/posts/debug"):
+            self.client.get(path)
+            response = self.client.get(path)
+
+            assert response.status_code == 200
+            assert "X-Cache" not in response.headers
+
+    def test_authorized_requests_bypass_cache(self):
+        """Requests with credentials are never cached."""
+        self.client.get("/api/posts/")
+
+        response = self.client.get(
+            "/api/posts/", headers={"Authorization": "Bearer token"}
+        )
+
+        assert "X-Cache" not in response.headers
+
+    def test_cache_clear_endpoint(self):
+        """The cache clear endpoint invalidates every worker's entries."""
+        self.client.get("/api/posts/")
+
+        self.client.post("/api/posts/cache/clear")
+
+        assert self.client.get("/api/posts/").headers["X-Cache"] == "MISS"
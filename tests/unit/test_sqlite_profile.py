@@ -0,0 +1,134 @@
+"""Unit tests for the SQLite connection profile and WAL checkpoints."""
+
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db.utils import ConnectionHandler
+from django.test import TestCase
+
+from blog.sqlite import apply_sqlite_profile, checkpoint, profile_pragmas
+
+ALIAS = "profiled"
+
+
+def pragma(connection, name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.unit
+class TestSQLiteProfile(TestCase):
+    """Test the PRAGMAs applied when a connection is created."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / "db.sqlite3")
+
+    def connect(self, name=None):
+        handler = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+                # テストケースの DB 制限を受けないよう、既存にないエイリアスを使う
+                ALIAS: {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": name or self.path,
+                },
+            }
+        )
+        connection = handler[ALIAS]
+        self.addCleanup(connection.close)
+        connection.ensure_connection()
+        return connection
+
+    def test_profile_applied_on_connect(self):
+        """New file-based connections use WAL and the tuned PRAGMAs."""
+        connection = self.connect()
+
+        assert pragma(connection, "journal_mode") == "wal"
+        assert pragma(connection, "synchronous") == 1  # NORMAL
+        assert pragma(connection, "temp_store") == 2  # MEMORY
+        assert pragma(connection, "cache_size") == -64 * 1024
+        assert pragma(connection, "busy_timeout") == 20_000
+        assert pragma(connection, "mmap_size") == 256 * 1024 * 1024
+
+    def test_profile_can_be_disabled(self):
+        """With the profile disabled the default rollback journal is kept."""
+        with self.settings(BLOG_SQLITE_PROFILE={"ENABLED": False}):
+            connection = self.connect()
+
+        assert pragma(connection, "journal_mode") == "delete"
+
+    def test_settings_override_defaults(self):
+        """Individual PRAGMAs can be overridden or skipped with None."""
+        with self.settings(
+            BLOG_SQLITE_PROFILE={"BUSY_TIMEOUT": 5000, "MMAP_SIZE": None}
+        ):
+            connection = self.connect()
+
+        assert pragma(connection, "busy_timeout") == 5000
+        assert pragma(connection, "mmap_size") == 0
+
+    def test_memory_database_is_skipped(self):
+        """In-memory databases cannot use WAL and are left alone."""
+        connection = self.connect(":memory:")
+
+        assert apply_sqlite_profile(connection) is False
+        assert pragma(connection, "journal_mode") == "memory"
+
+    def test_profile_pragmas(self):
+        """PRAGMA statements are built in a fixed order."""
+        assert profile_pragmas(
+            {
+                "JOURNAL_MODE": "WAL",
+                "SYNCHRONOUS": "NORMAL",
+                "MMAP_SIZE": None,
+                "CACHE_SIZE": -2000,
+                "TEMP_STORE": "MEMORY",
+                "BUSY_TIMEOUT": 1000,
+            }
+        ) == [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA cache_size=-2000",
+            "PRAGMA temp_store=MEMORY",
+            "PRAGMA busy_timeout=1000",
+        ]
+
+    def test_checkpoint(self):
+        """A checkpoint writes committed WAL frames back to the database."""
+        connection = self.connect()
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (value TEXT)")
+            cursor.executemany(
+                "INSERT INTO item VALUES (%s)", [(str(n),) for n in range(100)]
+            )
+
+        result = checkpoint(connection, "truncate")
+
+        assert result["busy"] is False
+        assert result["log"] == result["checkpointed"]
+        assert Path(f"{self.path}-wal").stat().st_size == 0
+
+    def test_checkpoint_rejects_unknown_mode(self):
+        """Only SQLite's checkpoint modes are accepted."""
+        with pytest.raises(ValueError):
+            checkpoint(self.connect(), "everything")
+
+
+@pytest.mark.unit
+class TestCheckpointCommand(TestCase):
+    """Test the sqlite_checkpoint management command."""
+
+    def test_runs_once(self):
+        """The command reports the checkpoint result."""
+        out = StringIO()
+
+        call_command("sqlite_checkpoint", mode="passive", stdout=out)
+
+        # テスト用のインメモリ DB は WAL モードではない
+        assert "Checkpoint PASSIVE: not in WAL mode" in out.getvalue()
@@ -0,0 +1,113 @@
+"""Unit tests for the import-time profiler and lazy Stripe loading."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fastapi_app.app.utils import stripe_client
+from fastapi_app.app.utils.importtime import (
+    ROOT,
+    format_report,
+    parse_importtime,
+    top_imports,
+    total_import_time,
+)
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       270 |        270 |   _io
+import time:       474 |       1183 | _frozen_importlib_external
+import time:       120 |        120 |     stripe._version
+import time:      2869 |     801448 |   stripe
+import time:      4064 |     809467 | fastapi_app.app.routers.payments
+unrelated output
+"""
+
+
+@pytest.mark.unit
+class TestImportTimeReport:
+    """Test parsing and reporting of -X importtime output."""
+
+    def test_parse_importtime(self):
+        """Timing lines are parsed with their nesting depth."""
+        entries = parse_importtime(SAMPLE.splitlines())
+
+        assert [entry["module"] for entry in entries] == [
+            "_io",
+            "_frozen_importlib_external",
+            "stripe._version",
+            "stripe",
+            "fastapi_app.app.routers.payments",
+        ]
+        assert entries[3] == {
+            "module": "stripe",
+            "self_us": 2869,
+            "cumulative_us": 801448,
+            "depth": 1,
+        }
+        assert [entry["depth"] for entry in entries] == [1, 0, 2, 1, 0]
+
+    def test_top_imports_and_total(self):
+        """Top modules are ordered by cumulative time; totals use top-level rows."""
+        entries = parse_importtime(SAMPLE.splitlines())
+
+        top = top_imports(entries, limit=2)
+        assert [entry["module"] for entry in top] == [
+            "fastapi_app.app.routers.payments",
+            "stripe",
+        ]
+        assert top_imports(entries, 1, key="self_us")[0]["module"] == (
+            "fastapi_app.app.routers.payments"
+        )
+        assert total_import_time(entries) == 1183 + 809467
+
+    def test_format_report(self):
+        """The report lists the requested number of modules."""
+        report = format_report(parse_importtime(SAMPLE.splitlines()), limit=3)
+
+        lines = report.splitlines()
+        assert lines[0].startswith("Import time: 810.6 ms total, top 3")
+        assert len(lines) == 5
+        assert lines[2].endswith("fastapi_app.app.routers.payments")
+
+
+@pytest.mark.unit
+class TestLazyStripe:
+    """Test that the Stripe SDK is loaded on first use only."""
+
+    def test_main_asgi_does_not_import_stripe(self):
+        """Importing the ASGI application leaves the Stripe SDK unloaded."""
+        code = (
+            "import sys, main_asgi\n"
+            "paths = {r.path for r in main_asgi.fastapi_app.routes}\n"
+            "assert '/payments/webhook' in paths, paths\n"
+            "print('stripe' in sys.modules)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env={**os.environ, "TESTING": "true"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip().splitlines()[-1] == "False"
+
+    def test_get_stripe_configures_api_key(self, monkeypatch):
+        """The SDK is configured from the environment on first use and reused."""
+        import stripe as stripe_module
+
+        monkeypatch.setattr(stripe_client, "_stripe", None)
+        monkeypatch.setattr(stripe_module, "api_key", stripe_module.api_key)
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_lazy")
+
+        stripe = stripe_client.get_stripe()
+
+        assert stripe is sys.modules["stripe"]
+        assert stripe.api_key == "sk_test_lazy"
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_other")
+        assert stripe_client.get_stripe() is stripe
+        assert stripe.api_key == "sk_test_lazy"
@@ -0,0 +1,111 @@
+"""Unit tests for the non-blocking Stripe client against a local API stub."""
+
+import asyncio
+
+import pytest
+
+from fastapi_app.app.utils import stripe_client
+from fastapi_app.app.utils.stripe_client import call_stripe, sync_stripe_client
+
+CHECKOUT = {
+    "article_id": 1,
+    "amount": 500,
+    "article_title": "Test Article Title",
+    "success_url": "http://localhost:8000/success/",
+    "cancel_url": "http://localhost:8000/cancel/",
+}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("transport", ["async", "thread"])
+async def test_other_requests_served_during_slow_call(
+    stripe_stub, asgi_client, article_prices, settings, transport
+):
+    """A slow Stripe call does not stall other requests on the same event loop."""
+    settings.STRIPE_CLIENT = {**settings.STRIPE_CLIENT, "TRANSPORT": transport}
+    stripe_stub.release.clear()
+
+    checkout = asyncio.create_task(
+        asgi_client.post("/api/payments/create-checkout-session", json=CHECKOUT)
+    )
+    # Stripe への要求が届くまで待つ
+    while not stripe_stub.requests:
+        await asyncio.sleep(0.01)
+
+    # Stripe の応答を保留している間も他のリクエストは完了する
+    for _ in range(5):
+        response = await asgi_client.get("/api/")
+        assert response.status_code == 200
+    assert not checkout.done()
+    assert stripe_stub.in_flight == 1
+
+    stripe_stub.release.set()
+    response = await checkout
+    assert response.status_code == 200
+    assert response.json()["session_id"] == "cs_test_1"
+    assert stripe_stub.requests == ["/v1/checkout/sessions"]
+
+
+@pytest.mark.unit
+async def test_call_timeout_returns_gateway_timeout(
+    stripe_stub, asgi_client, article_prices, settings
+):
+    """A Stripe call exceeding CALL_TIMEOUT is abandoned with a 504."""
+    settings.STRIPE_CLIENT = {**settings.STRIPE_CLIENT, "CALL_TIMEOUT": 0.2}
+    stripe_stub.release.clear()
+
+    response = await asgi_client.post(
+        "/api/payments/create-checkout-session", json=CHECKOUT
+    )
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Payment provider timeout"
+    # Stripe の応答を待たずに戻った
+    assert stripe_stub.in_flight == 1
+
+
+@pytest.mark.unit
+async def test_keep_alive_connection_is_reused(stripe_stub, asgi_client):
+    """Consecutive calls share one pooled connection to the Stripe API."""
+    for _ in range(3):
+        session = await call_stripe("checkout.sessions.create", params={})
+        assert session.id.startswith("cs_test_")
+    account = await call_stripe("accounts.retrieve_current")
+
+    assert account.country == "JP"
+    assert len(stripe_stub.requests) == 4
+    assert len(stripe_stub.connections) == 1
+
+
+@pytest.mark.unit
+async def test_timed_out_thread_calls_stay_bounded(stripe_stub, asgi_client, settings):
+    """A call that timed out keeps its thread, so later calls wait for a free one."""
+    settings.STRIPE_CLIENT = {
+        **settings.STRIPE_CLIENT,
+        "TRANSPORT": "thread",
+        "MAX_CONNECTIONS": 1,
+        "CALL_TIMEOUT": 0.2,
+    }
+    stripe_stub.delay = 1.0
+
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            await call_stripe("checkout.sessions.create", params={})
+
+    # 最初の呼び出しのスレッドが応答を待っている間、後の呼び出しは送られない
+    assert stripe_stub.requests == ["/v1/checkout/sessions"]
+
+
+@pytest.mark.unit
+def test_sync_client_creates_no_thread_pool(stripe_stub, monkeypatch):
+    """The client for management commands calls Stripe in the caller's thread."""
+
+    def no_executor(*args, **kwargs):
+        raise AssertionError("sync_stripe_client must not create a thread pool")
+
+    monkeypatch.setattr(stripe_client, "ThreadPoolExecutor", no_executor)
+
+    account = sync_stripe_client().accounts.retrieve_current()
+
+    assert account.country == "JP"
+    assert stripe_stub.requests == ["/v1/account"]
@@ -0,0 +1,246 @@
+"""Unit tests for surrogate-key tagging and cache purging."""
+
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from fastapi.testclient import TestClient
+from wagtail.models import Locale, Page
+
+from blog.models import BlogIndexPage, BlogPage, RelatedPost
+from blog.purge import HTTPPurger, get_purger, set_surrogate_keys
+from main_asgi import app as fastapi_app
+
+
+def publish_post(parent, slug, post_date=date(2024, 1, 1)):
+    blog_page = BlogPage(
+        title=slug.title(), intro="Test intro", slug=slug, date=post_date, live=False
+    )
+    parent.add_child(instance=blog_page)
+    blog_page.save_revision().publish()
+    blog_page.refresh_from_db()
+    return blog_page
+
+
+def surrogate_keys(response):
+    return set(response.headers["Surrogate-Key"].split())
+
+
+@pytest.mark.unit
+class TestSurrogateKeyHeaders(TestCase):
+    """Test the headers added to responses."""
+
+    def test_set_surrogate_keys(self):
+        """Keys are deduplicated and emitted in both header formats."""
+        response = set_surrogate_keys(_Response(), ["post-2", "post-1", "post-2"])
+
+        assert response.headers["Surrogate-Key"] == "post-1 post-2"
+        assert response.headers["Cache-Tag"] == "post-1,post-2"
+        assert response.headers["Surrogate-Control"] == "max-age=86400"
+
+    def test_max_age_can_be_disabled(self):
+        """A zero max-age omits Surrogate-Control."""
+        with self.settings(BLOG_SURROGATE_MAX_AGE=0):
+            response = set_surrogate_keys(_Response(), ["post-list"])
+
+        assert response.headers["Surrogate-Key"] == "post-list"
+        assert "Surrogate-Control" not in response.headers
+
+
+class _Response:
+    def __init__(self):
+        self.headers = {}
+
+
+@pytest.mark.unit
+class TestPageSurrogateKeys(TestCase):
+    """Test the keys attached to Wagtail page responses and purged on publish."""
+
+    def setUp(self):
+        """Set up test data."""
+        root_page = Page.objects.get(title="Root")
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        root_page.add_child(instance=self.index)
+        self.first = publish_post(self.index, "first", date(2024, 1, 1))
+        self.second = publish_post(self.index, "second", date(2024, 2, 1))
+        get_purger().clear()
+
+    def test_blog_page_keys(self):
+        """A post page is tagged with its own key and its related posts."""
+        RelatedPost.objects.create(
+            page=self.first, related=self.second, rank=0, score=0.5
+        )
+
+        response = self.first.serve(RequestFactory().get("/"))
+
+        assert surrogate_keys(response) == {
+            f"post-{self.first.id}",
+            f"post-{self.second.id}",
+        }
+        response.render()
+        assert response.status_code == 200
+
+    def test_blog_index_keys(self):
+        """An index page is tagged with its own key and the post list."""
+        response = self.index.serve(RequestFactory().get("/"))
+
+        assert surrogate_keys(response) == {f"blog-index-{self.index.id}", "post-list"}
+
+    def test_publish_purges_post_neighbors_and_lists(self):
+        """Publishing purges the post, its neighbors, the index and the list."""
+        with self.captureOnCommitCallbacks(execute=True):
+            third = publish_post(self.index, "third", date(2024, 3, 1))
+
+        assert get_purger().purged_keys == {
+            f"post-{third.id}",
+            f"post-{self.second.id}",
+            f"blog-index-{self.index.id}",
+            "post-list",
+        }
+
+    def test_unpublish_purges(self):
+        """Unpublishing purges the post and its former neighbors."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.unpublish()
+
+        assert get_purger().purged_keys == {
+            f"post-{self.first.id}",
+            f"post-{self.second.id}",
+            f"blog-index-{self.index.id}",
+            "post-list",
+        }
+
+    def test_no_purge_before_commit(self):
+        """Nothing is purged until the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.second.unpublish()
+
+        assert get_purger().purged == []
+        assert callbacks
+
+
+@pytest.mark.unit
+class TestAPISurrogateKeys(TransactionTestCase):
+    """Test the keys attached to API responses."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code="en")
+        try:
+            root_page = Page.objects.get(title="Root")
+        except Page.DoesNotExist:
+            root_page = Page.add_root(title="Root", slug="root")
+        self.first = publish_post(root_page, "first", date(2024, 1, 1))
+        self.second = publish_post(root_page, "second", date(2024, 2, 1))
+        self.client = TestClient(fastapi_app)
+
+    def test_list_keys(self):
+        """The list is tagged with the list key and every listed post."""
+        response = self.client.get("/api/posts/")
+
+        assert response.status_code == 200
+        assert surrogate_keys(response) == {
+            "post-list",
+            f"post-{self.first.id}",
+            f"post-{self.second.id}",
+        }
+        assert response.headers["Surrogate-Control"] == "max-age=86400"
+
+    def test_detail_keys(self):
+        """The detail endpoint is tagged with the post key."""
+        response = self.client.get(f"/api/posts/{self.first.id}")
+
+        assert response.status_code == 200
+        assert surrogate_keys(response) == {f"post-{self.first.id}"}
+        assert response.headers["Cache-Tag"] == f"post-{self.first.id}"
+
+    def test_related_keys(self):
+        """The related endpoint is tagged with the post and related posts."""
+        RelatedPost.objects.create(
+            page=self.first, related=self.second, rank=0, score=0.5
+        )
+
+        response = self.client.get(f"/api/posts/{self.first.id}/related")
+
+        assert surrogate_keys(response) == {
+            f"post-{self.first.id}",
+            f"post-{self.second.id}",
+        }
+
+    def test_facet_keys(self):
+        """Aggregate endpoints are purged with the post list."""
+        for path in ("/api/posts/archive", "/api/posts/tags", "/api/posts/changes"):
+            response = self.client.get(path)
+            assert surrogate_keys(response) == {"post-list"}, path
+
+    def test_not_found_has_no_keys(self):
+        """Error responses are not tagged."""
+        response = self.client.get("/api/posts/999999")
+
+        assert response.status_code == 404
+        assert "Surrogate-Key" not in response.headers
+
+
+class _PurgeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.headers["Surrogate-Key"], body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.unit
+class TestHTTPPurger(TestCase):
+    """Test the HTTP purge backend against a local endpoint."""
+
+    def setUp(self):
+        """Start a local purge endpoint."""
+        self.server = HTTPServer(("127.0.0.1", 0), _PurgeHandler)
+        self.server.received = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/purge"
+
+    def test_sends_keys(self):
+        """Keys are sent as a header and a JSON body."""
+        purger = HTTPPurger(self.url, headers={"Authorization": "Bearer token"})
+
+        purger.purge({"post-1", "post-list"})
+        purger.wait()
+
+        assert self.server.received == [
+            (
+                "post-1 post-list",
+                {
+                    "surrogate_keys": ["post-1", "post-list"],
+                    "tags": ["post-1", "post-list"],
+                },
+            )
+        ]
+
+    def test_batches_large_purges(self):
+        """Large key sets are split into batches."""
+        purger = HTTPPurger(self.url, batch_size=2)
+
+        purger.purge({f"post-{i}" for i in range(5)})
+        purger.wait()
+
+        assert [len(body["tags"]) for _, body in self.server.received] == [2, 2, 1]
+
+    def test_failure_is_logged(self):
+        """An unreachable endpoint does not raise."""
+        self.server.shutdown()
+        self.server.server_close()
+        purger = HTTPPurger(self.url, timeout=0.5)
+
+        with self.assertLogs("blog.purge", level="ERROR"):
+            purger.purge({"post-1"})
+            purger.wait()
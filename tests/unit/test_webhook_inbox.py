@@ -0,0 +1,298 @@
+"""Unit tests for the Stripe webhook inbox and its worker pool."""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
+
+from blog import webhooks
+from blog.models import StripeEvent
+from blog.webhooks import (
+    WebhookWorkerPool,
+    claim_events,
+    process_batch,
+    process_pending,
+    store_event,
+)
+
+SECRET = "whsec_mock_secret"
+EVENT_TYPES = [
+    "checkout.session.completed",
+    "payment_intent.succeeded",
+    "customer.created",  # ハンドラーのない種類は処理済みにするだけ
+]
+
+
+def sign(payload: str, secret: str = SECRET) -> str:
+    """Stripe と同じ形式の署名ヘッダー"""
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def make_event(number: int, event_type: str = "checkout.session.completed") -> dict:
+    return {
+        "id": f"evt_{number:06d}",
+        "object": "event",
+        "type": event_type,
+        "data": {
+            "object": {
+                "id": f"cs_test_{number:06d}",
+                "object": "checkout.session",
+                "metadata": {"article_id": str(number % 50 + 1)},
+            }
+        },
+    }
+
+
+@pytest.fixture
+def signed_events():
+    """2,000 signed webhook deliveries followed by 200 retried duplicates."""
+    events = [
+        make_event(number, EVENT_TYPES[number % len(EVENT_TYPES)])
+        for number in range(2000)
+    ]
+    deliveries = []
+    for event in events + events[:200]:
+        payload = json.dumps(event)
+        deliveries.append((payload, sign(payload)))
+    return deliveries
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record handler calls for a test event type."""
+    seen = Counter()
+    lock = threading.Lock()
+
+    def handler(event):
+        with lock:
+            seen[event["id"]] += 1
+
+    monkeypatch.setitem(webhooks.HANDLERS, "test.event", handler)
+    return seen
+
+
+@pytest.mark.unit
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+async def test_replay_signed_events(mock_stripe_key, asgi_client, signed_events):
+    """Thousands of signed deliveries are stored once each, then processed once."""
+    responses = []
+    for offset in range(0, len(signed_events), 50):
+        chunk = signed_events[offset : offset + 50]
+        responses += await asyncio.gather(
+            *(
+                asgi_client.post(
+                    "/api/payments/webhook",
+                    content=payload,
+                    headers={"stripe-signature": signature},
+                )
+                for payload, signature in chunk
+            )
+        )
+
+    assert {response.status_code for response in responses} == {200}
+    assert sum(response.json()["duplicate"] for response in responses) == 200
+    assert await StripeEvent.objects.acount() == 2000
+
+    assert await sync_to_async(process_pending)() == (2000, 0)
+    assert not await StripeEvent.objects.exclude(
+        status=StripeEvent.STATUS_DONE
+    ).aexists()
+    # 再送されたイベントも 1 回だけ処理される
+    assert not await StripeEvent.objects.exclude(attempts=1).aexists()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db(transaction=True)
+async def test_endpoint_does_not_wait_for_handlers(
+    mock_stripe_key, asgi_client, monkeypatch
+):
+    """The 200 is returned to Stripe before any handler runs."""
+    handled = []
+    monkeypatch.setitem(webhooks.HANDLERS, "test.event", handled.append)
+    payload = json.dumps(make_event(1, "test.event"))
+
+    response = await asgi_client.post(
+        "/api/payments/webhook",
+        content=payload,
+        headers={"stripe-signature": sign(payload)},
+    )
+
+    assert response.status_code == 200
+    assert handled == []
+    event = await StripeEvent.objects.aget(event_id="evt_000001")
+    assert (event.status, event.attempts) == (StripeEvent.STATUS_PENDING, 0)
+
+    assert await sync_to_async(process_pending)() == (1, 0)
+    assert [event["id"] for event in handled] == ["evt_000001"]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db(transaction=True)
+async def test_invalid_signature_is_not_stored(mock_stripe_key, asgi_client):
+    """Deliveries that fail verification are rejected and never stored."""
+    payload = json.dumps(make_event(1))
+
+    response = await asgi_client.post(
+        "/api/payments/webhook",
+        content=payload,
+        headers={"stripe-signature": sign(payload, "whsec_other")},
+    )
+
+    assert response.status_code == 400
+    assert not await StripeEvent.objects.aexists()
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_failed_events_retry_with_backoff(monkeypatch):
+    """Failures are retried with growing delays and finally given up."""
+    attempts = Counter()
+
+    def flaky(event):
+        attempts[event["id"]] += 1
+        if attempts[event["id"]] < 3:
+            raise RuntimeError("temporary failure")
+
+    monkeypatch.setitem(webhooks.HANDLERS, "test.flaky", flaky)
+    monkeypatch.setitem(webhooks.HANDLERS, "test.broken", lambda event: 1 / 0)
+    store_event(make_event(1, "test.flaky"))
+    store_event(make_event(2, "test.broken"))
+    now = timezone.now()
+
+    assert process_batch(now=now) == (0, 2)
+    flaky_event = StripeEvent.objects.get(event_id="evt_000001")
+    assert flaky_event.status == StripeEvent.STATUS_PENDING
+    assert flaky_event.attempts == 1
+    assert "temporary failure" in flaky_event.last_error
+    # 再試行の時刻までは取り出されない
+    assert process_batch(now=now + timedelta(seconds=1)) == (0, 0)
+
+    later = now + timedelta(seconds=3)
+    assert process_batch(now=later) == (0, 2)
+    assert process_batch(now=later + timedelta(seconds=5)) == (1, 1)
+    flaky_event.refresh_from_db()
+    assert flaky_event.status == StripeEvent.STATUS_DONE
+    assert flaky_event.last_error == ""
+
+    with override_attempts(3):
+        process_batch(now=later + timedelta(hours=1))
+    broken = StripeEvent.objects.get(event_id="evt_000002")
+    assert broken.status == StripeEvent.STATUS_FAILED
+    assert broken.attempts == 4
+
+
+def override_attempts(max_attempts):
+    from django.test import override_settings
+
+    return override_settings(
+        STRIPE_WEBHOOK_INBOX={"POLL_INTERVAL": 0, "MAX_ATTEMPTS": max_attempts}
+    )
+
+
+@pytest.mark.unit
+def test_backoff_grows_and_is_capped():
+    """The retry delay doubles per attempt up to BACKOFF_MAX."""
+    options = {"BACKOFF_BASE": 2.0, "BACKOFF_MAX": 60.0}
+
+    assert 1.6 <= webhooks.backoff_seconds(1, options) <= 2.0
+    assert 12.8 <= webhooks.backoff_seconds(4, options) <= 16.0
+    assert 48.0 <= webhooks.backoff_seconds(10, options) <= 60.0
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_stale_claims_are_taken_over(calls):
+    """Events left processing by a stopped worker are claimed again."""
+    store_event(make_event(1, "test.event"))
+    now = timezone.now()
+    assert len(claim_events(10, now)) == 1
+    # 取り出したワーカーが止まった
+    assert process_batch(now=now) == (0, 0)
+
+    assert process_batch(now=now + timedelta(seconds=301)) == (1, 0)
+    assert calls == {"evt_000001": 1}
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_claims_do_not_overlap():
+    """An event claimed by one worker is not handed to another."""
+    for number in range(5):
+        store_event(make_event(number, "test.event"))
+    now = timezone.now()
+
+    first = claim_events(3, now)
+    second = claim_events(10, now)
+
+    assert len(first) == 3
+    assert len(second) == 2
+    assert not {event.id for event in first} & {event.id for event in second}
+    assert claim_events(10, now) == []
+
+
+def inbox_drained() -> bool:
+    try:
+        return not StripeEvent.objects.exclude(status=StripeEvent.STATUS_DONE).exists()
+    except OperationalError:
+        # ワーカーの書き込み中（共有キャッシュのテーブルロック）
+        return False
+
+
+@pytest.mark.unit
+@pytest.mark.django_db(transaction=True)
+def test_worker_pool_drains_inbox(calls, settings):
+    """The worker threads process every stored event and then stop cleanly."""
+    # テスト用のインメモリ DB は共有キャッシュのロックで失敗しうるため、すぐに再試行する
+    settings.STRIPE_WEBHOOK_INBOX = {
+        "POLL_INTERVAL": 0.05,
+        "BATCH_SIZE": 20,
+        "BACKOFF_BASE": 0.01,
+        "CLAIM_TIMEOUT": 1.0,
+    }
+    for number in range(300):
+        store_event(make_event(number, "test.event"))
+
+    pool = WebhookWorkerPool()
+    pool.start(workers=3)
+    try:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline and not inbox_drained():
+            time.sleep(0.05)
+    finally:
+        pool.stop()
+
+    assert len(calls) == 300
+    assert StripeEvent.objects.filter(status=StripeEvent.STATUS_DONE).count() == 300
+    assert not [
+        thread for thread in threading.enumerate() if thread.name.startswith("stripe-")
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.django_db
+def test_process_command(calls):
+    """The management command drains the inbox once."""
+    for number in range(3):
+        store_event(make_event(number, "test.event"))
+    out = StringIO()
+
+    call_command("process_stripe_events", once=True, stdout=out)
+
+    assert "Processed 3 events, 0 failed" in out.getvalue()
+    assert len(calls) == 3